@@ -4,12 +4,16 @@ Script de configuración de base de datos PostgreSQL para SmartAgent
 Conecta con Neon DB y crea las tablas necesarias
 """
 
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import json
 import logging
 from datetime import datetime
 import os
+import sys
+
+# Agregar el directorio src al path (usa el pool de conexiones compartido)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from database.connection_pool import get_pool
 
 # Configuración de la base de datos
 DATABASE_URL = "postgresql://***USUARIO_OCULTO***:***CONTRASEÑA_OCULTA***@***HOST_OCULTO***/***DB_OCULTA***?sslmode=require&channel_binding=require"
@@ -29,7 +33,7 @@ class DatabaseManager:
     def connect(self):
         """Conectar a la base de datos"""
         try:
-            self.conn = psycopg2.connect(self.database_url)
+            self.conn = get_pool(self.database_url).connect()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             logging.info("✅ Conexión a PostgreSQL establecida")
             return True
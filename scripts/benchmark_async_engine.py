@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor asíncrono de monitoreo
+Sondea N objetivos contra un servidor local con latencia simulada: tiempo por ronda, hilos y memoria por objetivo
+"""
+
+import argparse
+import asyncio
+import io
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Agregar el directorio src al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.monitors.async_engine import AsyncMonitorEngine
+from benchmark_parsing import build_order_row
+
+ROWS_PER_PAGE = 40
+
+
+class TasksPageHandler(BaseHTTPRequestHandler):
+    """Página de tareas sintética; en cada ronda cambia el estado de algunas filas y entra una orden nueva"""
+    
+    latency = 0.1
+    round_number = 0
+    
+    def do_GET(self):
+        time.sleep(self.latency)
+        first = TasksPageHandler.round_number
+        rows = ''.join(build_order_row(index + first) for index in range(ROWS_PER_PAGE))
+        body = (f'<html><body><table class="responsive-table"><thead><tr><th>#</th><th>Vendor</th><th>Customer</th>'
+                f'<th>Zone</th><th>Total</th><th>Created at</th><th>Cooking time</th><th>Delivery time</th>'
+                f'<th>Status</th><th>Rider</th><th>Actions</th></tr></thead><tbody>{rows}</tbody></table></body></html>').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+async def poll_rounds(engine, rounds, concurrent):
+    """Sondear todos los objetivos `rounds` veces; devuelve segundos por ronda"""
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        if concurrent:
+            await asyncio.gather(*(engine.poll_target(target) for target in engine.targets))
+        else:
+            for target in engine.targets:
+                await engine.poll_target(target)
+        TasksPageHandler.round_number += 1
+    return (time.perf_counter() - start_time) / rounds
+
+
+def measure(base_url, targets, rounds, concurrent, io_workers):
+    """Tiempo por ronda, hilos vivos y memoria retenida por el motor con `targets` objetivos"""
+    TasksPageHandler.round_number = 0
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    with redirect_stdout(io.StringIO()):
+        engine = AsyncMonitorEngine(
+            [{"name": f"filtro-{index}", "orders_url": f"{base_url}/tasks?status=ACTIVE&target={index}"} for index in range(targets)],
+            io_workers=io_workers
+        )
+        per_round = asyncio.run(poll_rounds(engine, rounds, concurrent))
+        threads = threading.active_count()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        engine.stop()
+    tracemalloc.stop()
+    return per_round, threads, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motor asíncrono de monitoreo")
+    parser.add_argument("--targets", type=int, nargs="+", default=[1, 10, 40], help="Objetivos a sondear")
+    parser.add_argument("--rounds", type=int, default=5, help="Rondas de sondeo")
+    parser.add_argument("--latency", type=float, default=0.1, help="Latencia simulada del servidor (segundos)")
+    parser.add_argument("--io-workers", type=int, default=8, help="Hilos de E/S del motor")
+    args = parser.parse_args()
+    
+    TasksPageHandler.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TasksPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    
+    print(f"🔎 {ROWS_PER_PAGE} filas por página, latencia {args.latency * 1000:.0f}ms, {args.rounds} rondas, "
+          f"{args.io_workers} hilos de E/S")
+    for targets in args.targets:
+        sequential, _, _ = measure(base_url, targets, args.rounds, False, args.io_workers)
+        concurrent, threads, retained = measure(base_url, targets, args.rounds, True, args.io_workers)
+        print(f"   {targets:3d} objetivos: ronda secuencial {sequential:6.2f}s, concurrente {concurrent:6.2f}s "
+              f"({sequential / concurrent:4.1f}x), hilos {threads:2d}, memoria {retained / 1024 / targets:6.0f} KiB/objetivo")
+    
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmark de parseo de la página de tareas
+Compara los backends HTML del extractor de órdenes sobre una página sintética de 200 filas
+"""
+
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Agregar el directorio src al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.monitors.html_backend import FetchedPage, available_backends
+from core.monitors.order_parser import OrderExtractor, IncrementalOrderExtractor
+from core.monitors.raw_html import compress_raw_html
+
+STATUSES = ['inpreparation', 'processed', 'readyforcollection', 'ontheway', 'atlocation']
+
+# Campos que dependen del momento de la extracción
+VOLATILE_FIELDS = ('timestamp', 'detected_at')
+
+
+def build_order_row(index):
+    """Fila de orden con la misma estructura que la tabla real (11 columnas)"""
+    status = STATUSES[index % len(STATUSES)]
+    rider = f"Repartidor {index % 9}" if status in ('ontheway', 'atlocation') else ""
+    return f"""
+        <tr class="orders-list-item {status}">
+            <td data-label="#"><div class="order-id-field"><input type="checkbox" name="order"> {50000 + index}</div></td>
+            <td data-label="Vendor"><div class="vendor-field"><a class="link" href="/vendors/{index % 12}">Restaurante {index % 12}</a></div></td>
+            <td data-label="Customer"><div class="customer-field"><a class="link" href="/customers/{index}">Cliente {index}</a><span class="phone">+52 55 0000 {index:04d}</span></div></td>
+            <td data-label="Zone"><div class="zone-field">Zona {index % 6} - Calle {index} #{index % 90}</div></td>
+            <td data-label="Total"><span class="price">$ {120 + index * 3}.50</span></td>
+            <td data-label="Created at"><span class="date">{8 + index % 12:02d}:{index % 60:02d}</span></td>
+            <td data-label="CT">{10 + index % 25} min</td>
+            <td data-label="DT">{15 + index % 30} min</td>
+            <td data-label="Rider">{rider}</td>
+            <td data-label="Actions"><a class="btn-small" href="/tasks/{index}">Ver</a></td>
+            <td data-label="Notes"><i class="icon-note"></i></td>
+        </tr>"""
+
+
+def build_tasks_page(rows=200, chrome=1):
+    """Página de tareas completa: menú, scripts y barra lateral además de la tabla"""
+    menu = "".join(f'<li><a href="/section/{i}">Sección {i}</a></li>' for i in range(150 * chrome))
+    sidebar = "".join(f'<div class="widget"><h4>Widget {i}</h4><p>{"texto " * 40}</p></div>' for i in range(30 * chrome))
+    scripts = "".join(f"<script>window.config_{i} = {{enabled: true, items: [{', '.join(str(n) for n in range(50))}]}};</script>" for i in range(20 * chrome))
+    order_rows = "".join(build_order_row(index) for index in range(rows))
+    return f"""<!DOCTYPE html>
+<html><head><title>Tasks</title>{scripts}</head>
+<body>
+    <nav class="main-menu"><ul>{menu}</ul></nav>
+    <aside class="sidebar">{sidebar}</aside>
+    <div class="toolbar">
+        <div class="btn"><span class="label">Active orders</span><span class="value">{rows}</span></div>
+    </div>
+    <table class="responsive-table">
+        <thead><tr><th>#</th><th>Vendor</th><th>Customer</th><th>Zone</th><th>Total</th><th>Created at</th><th>CT</th><th>DT</th><th>Rider</th><th></th><th></th></tr></thead>
+        <tbody>{order_rows}</tbody>
+    </table>
+    <table class="summary-table"><tbody><tr><td>Resumen</td></tr></tbody></table>
+</body></html>"""
+
+
+def extract_orders(extractor, html_content):
+    """Extraer todas las órdenes de la página (sin órdenes conocidas)"""
+    with redirect_stdout(io.StringIO()):  # El extractor registra cada orden en consola
+        new_orders, _ = extractor.extract_order_changes(html_content, {})
+    return new_orders
+
+
+def comparable(orders):
+    return [{key: value for key, value in order.items() if key not in VOLATILE_FIELDS} for order in orders]
+
+
+def benchmark_backend(backend, html_content, iterations, scoped_parsing=False, use_column_map=True):
+    """Tiempo medio de parseo y de extracción completa con un backend"""
+    extractor = OrderExtractor(html_parser=backend, scoped_parsing=scoped_parsing, use_column_map=use_column_map)
+    orders = extract_orders(extractor, html_content)  # Calentamiento
+    extractor.html_backend.stats.clear()
+    
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        extract_orders(extractor, html_content)
+    elapsed = (time.perf_counter() - start_time) / iterations
+    parse_time = extractor.html_backend.get_stats()['avg_parse_time']
+    return parse_time, elapsed, orders
+
+
+def peak_memory(extractor, html_content):
+    """Pico de memoria (MB) de una extracción"""
+    tracemalloc.start()
+    extract_orders(extractor, html_content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def benchmark_scoped(backend, rows, iterations):
+    """Parseo de solo la tabla frente al documento completo al crecer la página"""
+    print(f"\n✂️  Parseo de solo la tabla ({backend}, {rows} filas):")
+    for chrome in (1, 4, 16):
+        html_content = build_tasks_page(rows, chrome)
+        line = f"   página {len(html_content) / 1024:6.0f} KB"
+        for scoped_parsing in (False, True):
+            parse_time, _, _ = benchmark_backend(backend, html_content, iterations, scoped_parsing)
+            memory = peak_memory(OrderExtractor(html_parser=backend, scoped_parsing=scoped_parsing), html_content)
+            label = "solo tabla" if scoped_parsing else "completo"
+            line += f"  {label}: {parse_time * 1000:6.1f} ms {memory:5.1f} MB"
+        print(line)
+
+
+def time_row_parsing(backend, html_content, iterations, use_column_map):
+    """Tiempo medio de leer los campos de todas las filas ya parseadas (sin parseo de página ni raw_html)"""
+    extractor = OrderExtractor(html_parser=backend, scoped_parsing=True, use_column_map=use_column_map)
+    with redirect_stdout(io.StringIO()):
+        containers = extractor.parse_orders_page(FetchedPage(html_content, backend=extractor.html_backend))
+        for container in containers:  # Calentamiento
+            extractor.parse_row(container)
+        
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            for container in containers:
+                extractor.parse_row(container)
+    return (time.perf_counter() - start_time) / iterations
+
+
+def benchmark_column_map(backend, html_content, iterations):
+    """Filas leídas por índice de columna (mapa del <thead>) frente al parseo por posición con selectores
+    
+    El mapa solo cambia la lectura de las filas; en la extracción completa el
+    parseo de la página y la serialización de raw_html pesan mucho más, así que
+    se mide aparte la lectura de filas sobre el mismo árbol.
+    """
+    positional_rows = time_row_parsing(backend, html_content, iterations, use_column_map=False)
+    mapped_rows = time_row_parsing(backend, html_content, iterations, use_column_map=True)
+    _, positional_time, positional_orders = benchmark_backend(backend, html_content, iterations, True, use_column_map=False)
+    _, mapped_time, mapped_orders = benchmark_backend(backend, html_content, iterations, True, use_column_map=True)
+    same_output = comparable(mapped_orders) == comparable(positional_orders)
+    print(f"\n🗂️  Mapa de columnas ({backend}): lectura de filas {positional_rows * 1000:.1f} ms -> {mapped_rows * 1000:.1f} ms "
+          f"por página ({positional_rows / mapped_rows:.1f}x), mismas órdenes: {'✅ sí' if same_output else '❌ no'}")
+    print(f"   Extracción completa: {positional_time * 1000:.1f} ms -> {mapped_time * 1000:.1f} ms "
+          f"(dominada por el parseo de la página y raw_html)")
+    if not same_output:
+        sys.exit(1)
+
+
+def benchmark_incremental(backend, html_content, iterations):
+    """Ciclo estable (página sin cambios de filas) con el extractor incremental"""
+    incremental = IncrementalOrderExtractor(OrderExtractor(html_parser=backend))
+    known_orders = {}
+    with redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        first_delta = incremental.extract_delta(html_content, known_orders)
+        first_time = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            incremental.extract_delta(html_content, known_orders)
+        steady_time = (time.perf_counter() - start_time) / iterations
+    
+    print(f"\n🔁 Extracción incremental ({backend}): primer ciclo {first_time * 1000:.1f} ms "
+          f"({len(first_delta['added'])} órdenes), ciclos siguientes {steady_time * 1000:.1f} ms")
+
+
+def retained_memory(build):
+    """Memoria (bytes) que queda retenida por el resultado de build()"""
+    tracemalloc.start()
+    result = build()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return retained
+
+
+def benchmark_records(backend, html_content):
+    """Memoria por orden: OrderRecord con __slots__ frente al dict equivalente con textos"""
+    orders = extract_orders(OrderExtractor(html_parser=backend), html_content)
+    # Lo que antes guardaba el historial de analytics: dicts con montos/fechas como texto y raw_html copiado
+    dict_bytes = retained_memory(lambda: [order.to_dict() for order in orders])
+    record_bytes = retained_memory(lambda: [order.copy() for order in orders])
+    print(f"\n🧱 Memoria por orden: dict {dict_bytes / len(orders):.0f} B -> OrderRecord {record_bytes / len(orders):.0f} B "
+          f"({dict_bytes / record_bytes:.1f}x menos)")
+
+
+def benchmark_raw_html(backend, html_content, iterations):
+    """Coste de serializar raw_html en cada fila frente a no capturarlo, y tamaño comprimido"""
+    timings = {}
+    for mode in ('all', 'off'):
+        extractor = OrderExtractor(html_parser=backend, raw_html_capture=mode)
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            orders = extract_orders(extractor, html_content)
+        timings[mode] = (time.perf_counter() - start_time) / iterations
+    
+    raw_orders = extract_orders(OrderExtractor(html_parser=backend, raw_html_capture='all'), html_content)
+    text_bytes = sum(len(order.raw_html.encode('utf-8')) for order in raw_orders)
+    compressed_bytes = sum(len(compress_raw_html(order.raw_html)) for order in raw_orders)
+    print(f"\n🗜️  raw_html ({backend}): extracción {timings['all'] * 1000:.1f} ms con captura -> "
+          f"{timings['off'] * 1000:.1f} ms sin captura; {text_bytes / 1024:.0f} KB de texto -> "
+          f"{compressed_bytes / 1024:.0f} KB con zlib")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de parseo de la página de tareas")
+    parser.add_argument("--rows", type=int, default=200, help="Filas de órdenes en la página sintética")
+    parser.add_argument("--iterations", type=int, default=10, help="Repeticiones por backend")
+    args = parser.parse_args()
+    
+    html_content = build_tasks_page(args.rows)
+    print(f"📄 Página sintética: {args.rows} filas, {len(html_content) / 1024:.0f} KB")
+    
+    results = {}
+    for backend in available_backends():
+        parse_time, elapsed, orders = benchmark_backend(backend, html_content, args.iterations)
+        results[backend] = (parse_time, elapsed, orders)
+        print(f"   {backend:<12} parseo {parse_time * 1000:7.1f} ms  extracción completa {elapsed * 1000:7.1f} ms  ({len(orders)} órdenes)")
+    
+    baseline_parse, baseline_time, baseline_orders = results['html.parser']
+    for backend, (parse_time, elapsed, orders) in results.items():
+        if backend == 'html.parser':
+            continue
+        same_output = comparable(orders) == comparable(baseline_orders)
+        print(f"\n⚡ {backend}: parseo {baseline_parse / parse_time:.1f}x, extracción completa {baseline_time / elapsed:.1f}x más rápido que html.parser")
+        print(f"   Mismas órdenes que html.parser: {'✅ sí' if same_output else '❌ no'}")
+        if not same_output:
+            sys.exit(1)
+    
+    fastest = available_backends()[0]
+    _, _, scoped_orders = benchmark_backend(fastest, html_content, 1, scoped_parsing=True)
+    same_output = comparable(scoped_orders) == comparable(baseline_orders)
+    print(f"   Mismas órdenes con parseo de solo la tabla: {'✅ sí' if same_output else '❌ no'}")
+    if not same_output:
+        sys.exit(1)
+    
+    benchmark_scoped(fastest, args.rows, args.iterations)
+    benchmark_column_map(fastest, html_content, args.iterations)
+    benchmark_incremental(fastest, html_content, args.iterations)
+    benchmark_records(fastest, html_content)
+    benchmark_raw_html(fastest, html_content, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del registro de expresiones regulares
+Coste por fila de buscar el ID y el monto con re.search sobre texto de patrón frente al registro precompilado
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio src al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.monitors.html_backend import parse_html
+from core.monitors.patterns import FIELD_PATTERNS, PATTERNS
+from benchmark_parsing import build_order_row
+
+# Textos de fila de otras páginas (formatos que cubre cada alternativa)
+EXTRA_ROWS = [
+    "Task: TK-88231 Cliente Ana López Calle 5 #12 $ 230.00",
+    "Pedido 99812 - Restaurante Centro - Total 1,250.75",
+    "Tarea:T-4410 En preparación",
+    "ORD-551234 Active order pendiente",
+    "Sin identificador visible en esta fila",
+    "ID: AB-20231 Rider asignado"
+]
+
+
+def sequential_order_id(text):
+    """Búsqueda anterior: un re.search por patrón hasta el primero que coincide"""
+    for pattern in FIELD_PATTERNS['order_id']:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return match.group(1)
+    return None
+
+
+def sequential_amount(text):
+    numbers = re.findall(r'[\d,]+\.?\d*', text)
+    return numbers[0] if numbers else None
+
+
+def row_texts(rows):
+    """Texto de cada fila de la tabla sintética más filas con otros formatos"""
+    table = parse_html(f"<table>{''.join(build_order_row(index) for index in range(rows))}</table>")
+    return [row.get_text() for row in table.find_all('tr')] + EXTRA_ROWS
+
+
+def time_per_row(function, texts, iterations):
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            function(text)
+    return (time.perf_counter() - start_time) / (iterations * len(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark del registro de expresiones regulares")
+    parser.add_argument("--rows", type=int, default=200, help="Filas de la tabla sintética")
+    parser.add_argument("--iterations", type=int, default=50, help="Repeticiones sobre todas las filas")
+    args = parser.parse_args()
+    
+    texts = row_texts(args.rows)
+    print(f"🔎 {len(texts)} filas, {args.iterations} repeticiones")
+    
+    cases = [
+        ('order_id', sequential_order_id, lambda text: PATTERNS.search('order_id', text)),
+        ('amount', sequential_amount, lambda text: PATTERNS.search('amount', text))
+    ]
+    
+    for field, sequential, registry in cases:
+        same_output = [sequential(text) for text in texts] == [registry(text) for text in texts]
+        sequential_time = time_per_row(sequential, texts, args.iterations)
+        registry_time = time_per_row(registry, texts, args.iterations)
+        print(f"   {field:<9} por patrón {sequential_time * 1e6:6.2f} µs/fila  registro {registry_time * 1e6:6.2f} µs/fila "
+              f"({sequential_time / registry_time:.1f}x), mismos valores: {'✅ sí' if same_output else '❌ no'}")
+        if not same_output:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
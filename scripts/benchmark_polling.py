@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Simulación del planificador de sondeos
+Compara el intervalo fijo con el adaptativo sobre un día sintético: sondeos totales y latencia de detección
+"""
+
+import argparse
+import bisect
+import random
+import statistics
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Agregar el directorio src al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.monitors.config import TERMINAL_MONITOR_CONFIG
+from core.monitors.scheduler import AdaptivePollScheduler
+
+# Órdenes por hora del día (pico de comida 12-15 y de cena 19-22)
+ORDERS_PER_HOUR = [1, 0.5, 0.5, 0.2, 0.2, 0.5, 2, 5, 8, 8, 10, 20,
+                   55, 60, 50, 25, 15, 15, 25, 45, 50, 40, 20, 6]
+PEAK_HOURS = (12, 13, 14, 19, 20, 21)
+
+# Minutos tras la llegada en que la orden cambia de estado (preparación, listo, en camino, en ubicación)
+TRANSITION_MINUTES = (5, 15, 25, 35)
+
+
+def simulate_day(seed):
+    """Llegadas de órdenes (segundos desde medianoche) y todas las transiciones del día"""
+    rng = random.Random(seed)
+    arrivals = []
+    for hour, rate in enumerate(ORDERS_PER_HOUR):
+        t = hour * 3600 + rng.expovariate(rate / 3600)
+        while t < (hour + 1) * 3600:
+            arrivals.append(t)
+            t += rng.expovariate(rate / 3600)
+    transitions = [arrival + minutes * 60 * rng.uniform(0.7, 1.3) for arrival in arrivals for minutes in TRANSITION_MINUTES]
+    events = sorted(arrivals + [t for t in transitions if t < 86400])
+    return arrivals, events
+
+
+def run_polls(next_wait, record, arrivals, events):
+    """Sondear durante un día; devuelve el número de sondeos y la latencia de cada llegada"""
+    poll_times = []
+    t = 0.0
+    last_poll = 0.0
+    while t < 86400:
+        poll_times.append(t)
+        activity = bisect.bisect_right(events, t) - bisect.bisect_right(events, last_poll)
+        record(activity, int(t // 3600) % 24)
+        last_poll = t
+        t += next_wait()
+    
+    latencies = defaultdict(list)
+    for arrival in arrivals:
+        index = bisect.bisect_left(poll_times, arrival)
+        if index < len(poll_times):
+            latencies[int(arrival // 3600)].append(poll_times[index] - arrival)
+    return len(poll_times), latencies
+
+
+def summarize(name, polls, latencies):
+    peak = [value for hour in PEAK_HOURS for value in latencies[hour]]
+    everything = [value for values in latencies.values() for value in values]
+    print(f"   {name:<22} sondeos {polls:6d}  latencia mediana pico {statistics.median(peak):5.1f}s  "
+          f"p90 pico {sorted(peak)[int(len(peak) * 0.9)]:5.1f}s  mediana día {statistics.median(everything):5.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulación del planificador de sondeos")
+    parser.add_argument("--days", type=int, default=7, help="Días simulados")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla del primer día")
+    args = parser.parse_args()
+    
+    config = TERMINAL_MONITOR_CONFIG
+    print(f"🔎 {args.days} días, intervalo fijo {config['check_interval']}s, adaptativo "
+          f"{config['poll_min_interval']}-{config['poll_max_interval']}s")
+    
+    random.seed(args.seed)
+    history = defaultdict(int)  # Órdenes por hora de los días anteriores (OrderAnalytics.time_stats)
+    totals = defaultdict(lambda: [0, defaultdict(list)])
+    for day in range(args.days):
+        arrivals, events = simulate_day(args.seed + day)
+        
+        fixed = run_polls(lambda: config["check_interval"], lambda activity, hour: None, arrivals, events)
+        scheduler = AdaptivePollScheduler(
+            config["check_interval"],
+            min_interval=config["poll_min_interval"],
+            max_interval=config["poll_max_interval"],
+            tighten_factor=config["poll_tighten_factor"],
+            backoff_factor=config["poll_backoff_factor"],
+            jitter=config["poll_jitter"],
+            hour_profiles=config["poll_hour_profiles"],
+            time_stats=history
+        )
+        adaptive = run_polls(scheduler.next_interval, scheduler.record_poll, arrivals, events)
+        
+        for name, (polls, latencies) in (('fijo', fixed), ('adaptativo', adaptive)):
+            totals[name][0] += polls
+            for hour, values in latencies.items():
+                totals[name][1][hour].extend(values)
+        for arrival in arrivals:
+            history[int(arrival // 3600)] += 1
+    
+    for name, (polls, latencies) in totals.items():
+        summarize(name, polls // args.days, latencies)
+
+
+if __name__ == "__main__":
+    main()
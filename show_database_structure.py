@@ -3,11 +3,15 @@
 Script para mostrar la estructura completa de la base de datos mejorada
 """
 
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import logging
 from dotenv import load_dotenv
 import os
+import sys
+
+# Agregar el directorio src al path (usa el pool de conexiones compartido)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from database.connection_pool import get_pool
 
 # Cargar variables de entorno
 load_dotenv()
@@ -30,7 +34,7 @@ class DatabaseStructureViewer:
     def connect(self):
         """Conectar a la base de datos"""
         try:
-            self.conn = psycopg2.connect(self.database_url)
+            self.conn = get_pool(self.database_url).connect()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             logging.info("✅ Conexión a PostgreSQL establecida")
             return True
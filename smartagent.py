@@ -9,9 +9,12 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from datetime import datetime
 import json, time, os, threading, logging, signal, sys
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
+# Agregar el directorio src al path (usa el pool de conexiones compartido)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from database.connection_pool import get_pool
+
 # Configuración del proyecto
 CHROMEDRIVER_PATH = "chromedriver.exe"  # Actualizado para Windows
 START_URL = "https://admin.besmartdelivery.mx/"
@@ -143,7 +146,7 @@ class DatabaseManager:
     def connect(self):
         """Conectar a la base de datos"""
         try:
-            self.conn = psycopg2.connect(self.database_url)
+            self.conn = get_pool(self.database_url).connect()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             logging.info("✅ Conexión a PostgreSQL establecida")
             return True
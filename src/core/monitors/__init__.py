@@ -3,8 +3,15 @@ SmartAgent - Monitores de Órdenes
 Paquete que contiene todas las versiones de monitores de órdenes
 """
 
-from .terminal_monitor import TerminalOrderMonitor
-
 __all__ = [
     'TerminalOrderMonitor'
-] 
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    # Importación diferida: los módulos compartidos (utils, config...) pueden
+    # usarse desde otros monitores sin configurar el logging del monitor terminal
+    if name == 'TerminalOrderMonitor':
+        from .terminal_monitor import TerminalOrderMonitor
+        return TerminalOrderMonitor
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
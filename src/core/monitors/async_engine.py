@@ -0,0 +1,309 @@
+"""
+Motor asíncrono de monitoreo
+Sondea varias cuentas o filtros de estado en un solo event loop con etapas compartidas de parseo y persistencia
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from psycopg2.extras import RealDictCursor
+
+# Agregar el directorio src al path
+project_root = Path(__file__).parent.parent.parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from .config import TERMINAL_MONITOR_CONFIG, DATABASE_URL, TASKS_URL
+from .utils import BaseLogger, OrderAnalytics, NotificationManager, DatabaseManager
+from .http_client import HTTPClient
+from .order_parser import OrderExtractor, IncrementalOrderExtractor
+from .known_orders import KnownOrderStore
+from .lifecycle import OrderLifecycleTracker
+from .scheduler import AdaptivePollScheduler
+from .write_behind import WriteBehindQueue
+from database.connection_pool import get_pool
+
+
+def build_orders_url(statuses):
+    """URL de tareas filtrada por estados (["PROCESSED", ...] -> /tasks?status=PROCESSED&...)"""
+    return f"{TASKS_URL}?" + "&".join(f"status={status}" for status in statuses)
+
+
+class MonitorTarget:
+    """Una cuenta o filtro a sondear, con su sesión, su estado de deduplicación y su planificador"""
+    
+    def __init__(self, name, extractor, username=None, password=None, statuses=None, orders_url=None,
+                 check_interval=None, min_interval=None, max_interval=None, time_stats=None):
+        config = TERMINAL_MONITOR_CONFIG
+        self.name = name
+        if statuses and not orders_url:
+            orders_url = build_orders_url(statuses)
+        self.client = HTTPClient(username=username, password=password, orders_url=orders_url,
+                                 session_file=self.session_file(name))
+        self.known_orders = KnownOrderStore(max_size=config["max_known_orders"], ttl=config["order_timeout"])
+        self.extractor = IncrementalOrderExtractor(extractor, max_cached_rows=config["max_known_orders"] * 2)
+        self.lifecycle = OrderLifecycleTracker(max_orders=config["max_known_orders"] * 2) if config["lifecycle_events"] else None
+        check_interval = check_interval or config["check_interval"]
+        self.scheduler = AdaptivePollScheduler(
+            check_interval,
+            min_interval=min_interval or (config["poll_min_interval"] if config["adaptive_polling"] else check_interval),
+            max_interval=max_interval or (config["poll_max_interval"] if config["adaptive_polling"] else check_interval),
+            tighten_factor=config["poll_tighten_factor"],
+            backoff_factor=config["poll_backoff_factor"],
+            jitter=config["poll_jitter"],
+            hour_profiles=config["poll_hour_profiles"],
+            time_stats=time_stats
+        )
+        self.logged_in = False
+        self.last_refresh_time = None
+        self.stats = defaultdict(int)
+    
+    @staticmethod
+    def session_file(name):
+        """Archivo de sesión propio del objetivo (data/terminal_session.bin -> data/terminal_session_<name>.bin)"""
+        session_file = TERMINAL_MONITOR_CONFIG.get("session_store_file")
+        if not session_file:
+            return None
+        path = Path(session_file)
+        return str(path.with_name(f"{path.stem}_{name}{path.suffix}"))
+    
+    @classmethod
+    def from_config(cls, entry, extractor, time_stats=None):
+        """Crear el objetivo a partir de una entrada de monitor_targets (la contraseña sale de password_env)"""
+        return cls(
+            entry["name"],
+            extractor,
+            username=entry.get("username"),
+            password=os.getenv(entry["password_env"]) if entry.get("password_env") else None,
+            statuses=entry.get("statuses"),
+            orders_url=entry.get("orders_url"),
+            check_interval=entry.get("check_interval"),
+            min_interval=entry.get("poll_min_interval"),
+            max_interval=entry.get("poll_max_interval"),
+            time_stats=time_stats
+        )
+
+
+class AsyncMonitorEngine:
+    """Monitor de varios objetivos en un solo event loop
+    
+    Cada objetivo es una corrutina con su propio planificador. Las peticiones
+    (requests es bloqueante) van a un pool fijo de io_workers hilos y todo el
+    parseo, la clasificación y el encolado a la BD pasan por un único hilo de
+    procesamiento compartido, así que el número de hilos y de árboles HTML
+    vivos no crece con el número de objetivos.
+    """
+    
+    def __init__(self, target_configs=None, io_workers=None, db_manager=None, db_writer=None):
+        config = TERMINAL_MONITOR_CONFIG
+        self.analytics = OrderAnalytics()
+        self.order_extractor = OrderExtractor(
+            self.analytics,
+            html_parser=config["html_parser"],
+            scoped_parsing=config["scoped_parsing"],
+            raw_html_capture=config["raw_html_capture"],
+            raw_html_sample_rate=config["raw_html_sample_rate"]
+        )
+        target_configs = target_configs or config["monitor_targets"] or [{"name": "principal"}]
+        self.targets = [MonitorTarget.from_config(entry, self.order_extractor, self.analytics.time_stats)
+                        for entry in target_configs]
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers or config["async_io_workers"],
+                                              thread_name_prefix="monitor-io")
+        self.process_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="monitor-process")
+        self.db_manager = db_manager
+        self.db_writer = db_writer
+        self.is_running = False
+        self.error_count = 0
+    
+    def setup_database(self):
+        """Conexión y cola de escritura compartidas por todos los objetivos"""
+        try:
+            db_conn = get_pool(DATABASE_URL).connect()
+            db_cursor = db_conn.cursor(cursor_factory=RealDictCursor)
+            
+            self.db_manager = DatabaseManager(db_conn, db_cursor)
+            self.db_manager.create_orders_table("terminal_orders")
+            if TERMINAL_MONITOR_CONFIG["lifecycle_events"]:
+                self.db_manager.create_events_table("terminal_order_events")
+            
+            self.db_writer = WriteBehindQueue(
+                self.db_manager,
+                "terminal_orders",
+                self.analytics,
+                batch_size=TERMINAL_MONITOR_CONFIG["write_behind_batch_size"],
+                flush_interval=TERMINAL_MONITOR_CONFIG["write_behind_flush_interval"],
+                max_queue_size=TERMINAL_MONITOR_CONFIG["write_behind_max_queue"],
+                spill_file=project_root / TERMINAL_MONITOR_CONFIG["write_behind_spill_file"]
+            )
+            self.db_writer.start()
+            
+            BaseLogger.success("Conexión a base de datos establecida")
+        
+        except Exception as e:
+            logging.error(f"❌ Error conectando a la base de datos: {e}")
+            BaseLogger.error(f"Error conectando a la base de datos: {e}")
+    
+    async def _io(self, function, *args):
+        """Ejecutar una llamada bloqueante de red en el pool de E/S"""
+        return await asyncio.get_running_loop().run_in_executor(self.io_executor, function, *args)
+    
+    async def _process(self, function, *args):
+        """Ejecutar una etapa de CPU (parseo, clasificación) en el hilo de procesamiento compartido"""
+        return await asyncio.get_running_loop().run_in_executor(self.process_executor, function, *args)
+    
+    async def login_target(self, target):
+        """Iniciar sesión en la cuenta del objetivo"""
+        target.logged_in = await self._io(target.client.authenticate)
+        target.last_refresh_time = time.time()
+        if not target.logged_in:
+            BaseLogger.warning(f"[{target.name}] Login fallido")
+        return target.logged_in
+    
+    async def poll_target(self, target):
+        """Un sondeo del objetivo; devuelve las órdenes nuevas detectadas"""
+        target.stats['checks'] += 1
+        
+        if TERMINAL_MONITOR_CONFIG["enable_auto_refresh"] and target.last_refresh_time and \
+                time.time() - target.last_refresh_time > TERMINAL_MONITOR_CONFIG["refresh_interval"]:
+            target.last_refresh_time = time.time()
+            await self._io(target.client.refresh_session)
+        
+        page = await self._io(target.client.get_orders_page)
+        if not page:
+            BaseLogger.warning(f"[{target.name}] No se pudo obtener contenido de la página")
+            target.scheduler.record_poll(0)
+            return []
+        
+        if target.client.page_unchanged:
+            target.stats['unchanged_pages'] += 1
+            target.known_orders.touch_all()
+            target.scheduler.record_poll(0)
+            return []
+        
+        new_orders, activity = await self._process(self.process_page, target, page)
+        target.scheduler.record_poll(activity)
+        return new_orders
+    
+    def process_page(self, target, page):
+        """Etapa compartida: delta de filas, limpieza, eventos de ciclo de vida y encolado a la BD"""
+        delta = target.extractor.extract_delta(page, target.known_orders)
+        check_time = datetime.now()
+        
+        orders_to_save = []
+        new_orders = []
+        events = []
+        pending = [(True, order) for order in delta['added']] + [(False, order) for order in delta['changed']]
+        for is_new, order_data in pending:
+            order_data = self.order_extractor.clean_order_data(order_data)
+            if not self.order_extractor.validate_order_data(order_data):
+                continue
+            order_data['source'] = f"terminal_monitor:{target.name}"
+            target.stats['new_orders' if is_new else 'changed_orders'] += 1
+            orders_to_save.append(order_data)
+            if is_new:
+                new_orders.append(order_data)
+            if target.lifecycle:
+                events.extend(target.lifecycle.observe(order_data, check_time, is_new))
+        
+        target.stats['removed_orders'] += len(delta['removed'])
+        if target.lifecycle:
+            for order_data in delta['removed']:
+                events.extend(target.lifecycle.remove(order_data, check_time))
+        
+        if self.db_writer and (orders_to_save or events):
+            self.db_writer.submit(orders_to_save, {'target': target.name, 'poll_interval': round(target.scheduler.interval, 1)}, events)
+        
+        return new_orders, len(orders_to_save) + len(delta['removed'])
+    
+    async def run_target(self, target):
+        """Bucle de sondeo de un objetivo"""
+        while self.is_running:
+            try:
+                if not target.logged_in and not await self.login_target(target):
+                    await asyncio.sleep(target.scheduler.max_interval)
+                    continue
+                
+                new_orders = await self.poll_target(target)
+                if new_orders:
+                    print(f"\n🚨 [{target.name}] ¡{len(new_orders)} NUEVAS ÓRDENES DETECTADAS! 🚨")
+                    NotificationManager.display_orders_table(new_orders, target.name.upper())
+                    NotificationManager.play_notification_sound()
+            
+            except Exception as e:
+                logging.error(f"❌ [{target.name}] Error en monitoreo: {e}")
+                BaseLogger.error(f"[{target.name}] Error en monitoreo: {e}")
+                self.error_count += 1
+                target.scheduler.record_poll(0)
+            
+            await asyncio.sleep(target.scheduler.next_interval())
+    
+    async def run(self):
+        """Sondear todos los objetivos concurrentemente hasta detener el motor"""
+        self.is_running = True
+        BaseLogger.monitor(f"Monitoreando {len(self.targets)} objetivos en un solo event loop "
+                           f"({TERMINAL_MONITOR_CONFIG['async_io_workers']} hilos de E/S)")
+        await asyncio.gather(*(self.run_target(target) for target in self.targets))
+    
+    def display_stats(self):
+        """Estadísticas por objetivo"""
+        print(f"\n📊 ESTADÍSTICAS DEL MOTOR ASÍNCRONO ({len(self.targets)} objetivos)")
+        print("="*60)
+        for target in self.targets:
+            poll_stats = target.scheduler.get_stats()
+            print(f"   {target.name}: {target.stats['checks']} verificaciones, {target.stats['new_orders']} nuevas, "
+                  f"{target.stats['changed_orders']} actualizadas, {target.stats['removed_orders']} retiradas, "
+                  f"intervalo {poll_stats['current_interval']:.1f}s, "
+                  f"circuit breaker {target.client.circuit_breaker.get_stats()['state']}")
+        print(f"   Errores totales: {self.error_count}")
+        if self.db_writer:
+            writer_metrics = self.db_writer.get_metrics()
+            print(f"   Cola de escritura: {writer_metrics['queue_depth']} pendientes, "
+                  f"{writer_metrics['flushed_orders']} guardadas en {writer_metrics['flushes']} lotes")
+    
+    def stop(self):
+        """Cerrar sesiones, vaciar la cola de escritura y liberar los pools de hilos"""
+        self.is_running = False
+        for target in self.targets:
+            target.client.close_session()
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+        self.process_executor.shutdown(wait=True)
+        # La conexión no se cierra mientras el escritor diferido siga usándola
+        writer_stopped = self.db_writer.stop() if self.db_writer else True
+        if writer_stopped and self.db_manager and self.db_manager.db_cursor:
+            self.db_manager.db_cursor.close()
+        if writer_stopped and self.db_manager and self.db_manager.db_conn:
+            self.db_manager.db_conn.close()
+        self.display_stats()
+
+
+def main():
+    """Función principal del motor asíncrono"""
+    os.makedirs("logs", exist_ok=True)
+    logging.basicConfig(
+        level=getattr(logging, TERMINAL_MONITOR_CONFIG["log_level"]),
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("logs/order_monitor_async.log", encoding='utf-8'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    
+    engine = AsyncMonitorEngine()
+    engine.setup_database()
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        BaseLogger.info("⏹️ Detención solicitada por el usuario")
+    finally:
+        engine.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Extracción de órdenes dentro del navegador
+Un solo execute_script recorre las filas en el DOM y devuelve sus campos como JSON (sin page_source ni una llamada por celda)
+y un MutationObserver en la tabla avisa de las filas nuevas o modificadas sin recargar la página
+"""
+
+import logging
+import time
+from collections import defaultdict
+
+from .utils import BaseLogger
+
+# Campos de una lista de filas: cada campo se resuelve con su lista de selectores (el primer elemento encontrado gana).
+# El texto de un campo es el de get_text(strip=True) de BeautifulSoup: cada nodo de texto sin espacios, concatenados.
+ROW_FIELDS_FUNCTIONS = r"""
+function strippedText(node) {
+    var walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT, null, false);
+    var parts = [], current, value;
+    while ((current = walker.nextNode())) {
+        value = current.nodeValue.trim();
+        if (value) parts.push(value);
+    }
+    return parts.join('');
+}
+
+function firstMatch(row, selectors) {
+    for (var i = 0; i < selectors.length; i++) {
+        try {
+            var element = row.querySelector(selectors[i]);
+            if (element) return element;
+        } catch (error) {}  // Selector no soportado por el navegador
+    }
+    return null;
+}
+
+function rowEntries(rows, fieldSelectors, textField) {
+    window.__smartagentOrderRows = rows;  // Para pedir después el HTML de algunas filas sin volver a buscarlas
+    var result = [];
+    for (var i = 0; i < rows.length; i++) {
+        var row = rows[i], fields = {};
+        for (var field in fieldSelectors) {
+            var element = firstMatch(row, fieldSelectors[field]);
+            if (element) fields[field] = strippedText(element);
+        }
+        var entry = {index: i, classes: Array.prototype.slice.call(row.classList), fields: fields};
+        if (textField && !fields[textField]) entry.text = row.textContent;
+        result.push(entry);
+    }
+    return result;
+}
+"""
+
+# Todas las filas de órdenes de la página
+ORDER_ROWS_SCRIPT = ROW_FIELDS_FUNCTIONS + r"""
+var rows = document.querySelectorAll(arguments[0].join(','));
+return {table: document.querySelector('table.responsive-table') !== null, rows: rowEntries(rows, arguments[1], arguments[2])};
+"""
+
+# Observador de la tabla de órdenes: guarda en un buffer las filas añadidas o modificadas (texto o clase).
+# Se observa la tabla y no el tbody, porque algunas vistas reemplazan el tbody completo al actualizarse.
+OBSERVER_INSTALL_SCRIPT = r"""
+var rowSelector = arguments[0].join(',');
+var previous = window.__smartagentObserver;
+if (previous) previous.observer.disconnect();
+
+var table = document.querySelector('table.responsive-table');
+if (!table) return false;
+
+var state = {target: table, changed: [], sent: new WeakMap(), lastMutation: 0, mutations: 0};
+
+function mark(row) {
+    if (state.changed.indexOf(row) === -1) state.changed.push(row);
+}
+
+function collect(node, added) {
+    var element = node.nodeType === 1 ? node : node.parentElement;
+    if (!element) return;
+    var row = element.closest(rowSelector);
+    if (row) return mark(row);
+    if (!added) return;  // Cambio en el tbody o la tabla: las filas afectadas llegan como nodos añadidos
+    var rows = element.querySelectorAll(rowSelector);  // Un tbody o bloque nuevo trae sus filas dentro
+    for (var i = 0; i < rows.length; i++) mark(rows[i]);
+}
+
+state.observer = new MutationObserver(function (records) {
+    for (var i = 0; i < records.length; i++) {
+        collect(records[i].target, false);
+        for (var j = 0; j < records[i].addedNodes.length; j++) collect(records[i].addedNodes[j], true);
+    }
+    state.mutations += records.length;
+    state.lastMutation = Date.now();
+});
+state.observer.observe(table, {childList: true, subtree: true, characterData: true, attributes: true, attributeFilter: ['class']});
+window.__smartagentObserver = state;
+return true;
+"""
+
+# Long-poll (execute_async_script): responde cuando hay filas cuyos campos cambiaron y la tabla lleva `settle` ms
+# quieta, o al agotar `timeout` ms. Las filas que solo cambiaron en celdas no extraídas (p. ej. un contador de
+# tiempo) se descartan en el navegador. installed=false si el observador ya no existe o su tabla salió del documento.
+OBSERVER_DRAIN_SCRIPT = ROW_FIELDS_FUNCTIONS + r"""
+var fieldSelectors = arguments[0], textField = arguments[1], timeout = arguments[2], settle = arguments[3];
+var done = arguments[arguments.length - 1];
+var deadline = Date.now() + timeout;
+
+function drain() {
+    var state = window.__smartagentObserver;
+    if (!state || !document.contains(state.target)) return done({installed: false, rows: []});
+    
+    var entries = [];
+    if (state.changed.length && Date.now() - state.lastMutation >= settle) {
+        var rows = state.changed.filter(function (row) { return document.contains(row); });
+        state.changed = [];
+        entries = rowEntries(rows, fieldSelectors, textField).filter(function (entry) {
+            var signature = JSON.stringify([entry.classes, entry.fields]);
+            if (state.sent.get(rows[entry.index]) === signature) return false;
+            state.sent.set(rows[entry.index], signature);
+            return true;
+        });
+    }
+    if (entries.length || Date.now() >= deadline) return done({installed: true, rows: entries});
+    setTimeout(drain, 100);
+}
+drain();
+"""
+
+# outerHTML de filas de la última extracción, por índice
+ROW_HTML_SCRIPT = r"""
+var rows = window.__smartagentOrderRows || [];
+return arguments[0].map(function (index) { return rows[index] ? rows[index].outerHTML : null; });
+"""
+
+
+class BrowserRowExtractor:
+    """Campos de las filas de órdenes leídos en el navegador con un único execute_script
+    
+    Cada campo se resuelve con la misma lista de selectores CSS que usa el
+    parseo con BeautifulSoup, así que los datos no cambian; solo viaja un JSON
+    compacto en vez del DOM completo. El HTML de una fila se pide aparte, en
+    una sola llamada, y solo para las órdenes cuyo raw_html se va a guardar.
+    """
+    
+    def __init__(self, row_selectors, field_selectors, text_field=None):
+        self.row_selectors = list(row_selectors)
+        self.field_selectors = {field: list(selectors) for field, selectors in field_selectors.items()}
+        self.text_field = text_field  # Campo que, si falta, hace devolver el texto de la fila (búsqueda por patrón)
+        self.stats = defaultdict(float)
+    
+    def extract(self, driver):
+        """Filas como dicts (index, classes, fields, text); None si hay que usar page_source"""
+        start_time = time.perf_counter()
+        try:
+            result = driver.execute_script(ORDER_ROWS_SCRIPT, self.row_selectors, self.field_selectors, self.text_field)
+        except Exception as e:
+            logging.error(f"❌ Error extrayendo filas en el navegador: {e}")
+            BaseLogger.warning(f"Extracción en el navegador fallida, usando page_source: {e}")
+            self.stats['fallbacks'] += 1
+            return None
+        
+        self.stats['calls'] += 1
+        self.stats['extract_time'] += time.perf_counter() - start_time
+        
+        rows = result.get('rows') or []
+        if not rows and not result.get('table'):
+            # Ni filas ni tabla: la página no es la esperada, que decidan las estrategias de respaldo
+            self.stats['fallbacks'] += 1
+            return None
+        
+        self.stats['rows'] += len(rows)
+        return rows
+    
+    def row_html(self, driver, indexes):
+        """outerHTML de las filas indicadas de la última extracción ({índice: html})"""
+        indexes = list(indexes)
+        if not indexes:
+            return {}
+        
+        try:
+            self.stats['html_calls'] += 1
+            return dict(zip(indexes, driver.execute_script(ROW_HTML_SCRIPT, indexes)))
+        except Exception as e:
+            logging.error(f"❌ Error obteniendo HTML de filas: {e}")
+            return {}
+    
+    def get_stats(self):
+        """Llamadas, filas, tiempo medio por llamada y veces que se usó page_source"""
+        calls = self.stats['calls']
+        return {
+            'calls': int(calls),
+            'rows': int(self.stats['rows']),
+            'html_calls': int(self.stats['html_calls']),
+            'avg_extract_time': self.stats['extract_time'] / calls if calls else 0.0,
+            'fallbacks': int(self.stats['fallbacks'])
+        }
+
+
+class MutationWatcher:
+    """Detección por eventos: MutationObserver en la tabla y long-poll desde Python
+    
+    En vez de dormir check_interval y volver a leer la página, el monitor
+    espera dentro del navegador (execute_async_script) hasta que el
+    observador registra filas nuevas o modificadas, y recibe solo esas filas
+    con los mismos campos que BrowserRowExtractor. Si la vista se recarga y el
+    observador desaparece, wait_for_changes devuelve None y el monitor hace
+    una extracción completa y lo vuelve a instalar.
+    """
+    
+    def __init__(self, extractor, settle=0.2):
+        self.extractor = extractor
+        self.settle = settle  # Segundos sin mutaciones antes de leer las filas (la fila termina de pintarse)
+        self.installed = False
+        self.last_change_time = time.monotonic()
+        self._script_timeout = None
+        self.stats = defaultdict(int)
+    
+    def install(self, driver):
+        """Instalar (o reinstalar) el observador en la tabla de órdenes"""
+        try:
+            self.installed = bool(driver.execute_script(OBSERVER_INSTALL_SCRIPT, self.extractor.row_selectors))
+        except Exception as e:
+            logging.error(f"❌ Error instalando observador de la tabla: {e}")
+            self.installed = False
+        
+        if self.installed:
+            self.stats['installs'] += 1
+            self.last_change_time = time.monotonic()
+            BaseLogger.info("Observador de cambios instalado en la tabla de órdenes")
+        return self.installed
+    
+    def wait_for_changes(self, driver, timeout):
+        """Esperar hasta `timeout` segundos a filas nuevas o modificadas
+        
+        Devuelve las filas cambiadas (lista vacía si no hubo cambios) o None
+        si el observador no está instalado y hace falta una extracción completa.
+        """
+        if not self.installed:
+            return None
+        
+        try:
+            # El script puede esperar `timeout`; WebDriver necesita margen para no cortarlo
+            script_timeout = timeout + 10
+            if script_timeout != self._script_timeout:
+                driver.set_script_timeout(script_timeout)
+                self._script_timeout = script_timeout
+            
+            result = driver.execute_async_script(
+                OBSERVER_DRAIN_SCRIPT,
+                self.extractor.field_selectors,
+                self.extractor.text_field,
+                int(timeout * 1000),
+                int(self.settle * 1000)
+            )
+        except Exception as e:
+            logging.error(f"❌ Error esperando cambios en la tabla: {e}")
+            self.installed = False
+            return None
+        
+        self.stats['waits'] += 1
+        if not result.get('installed'):
+            self.installed = False
+            self.stats['lost'] += 1
+            BaseLogger.warning("Observador perdido (la vista se recargó), extracción completa")
+            return None
+        
+        rows = result.get('rows') or []
+        if rows:
+            self.stats['wakeups'] += 1
+            self.stats['rows'] += len(rows)
+            self.last_change_time = time.monotonic()
+        return rows
+    
+    def silent_for(self):
+        """Segundos desde el último cambio observado (o desde la instalación)"""
+        return time.monotonic() - self.last_change_time
+    
+    def get_stats(self):
+        """Instalaciones, esperas, esperas con cambios, filas recibidas y observadores perdidos"""
+        return {
+            'installed': self.installed,
+            'installs': self.stats['installs'],
+            'waits': self.stats['waits'],
+            'wakeups': self.stats['wakeups'],
+            'rows': self.stats['rows'],
+            'lost': self.stats['lost']
+        }
@@ -21,20 +21,54 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 
 # Configuración del monitor terminal
 TERMINAL_MONITOR_CONFIG = {
-    "check_interval": 10,           # Segundos entre verificaciones
+    "check_interval": 10,           # Segundos entre verificaciones (intervalo inicial si el sondeo es adaptativo)
+    "adaptive_polling": True,       # Ajustar el intervalo a la actividad observada
+    "poll_min_interval": 3,         # Intervalo mínimo con actividad (segundos)
+    "poll_max_interval": 60,        # Intervalo máximo sin actividad (segundos)
+    "poll_tighten_factor": 0.5,     # Factor aplicado al intervalo tras un sondeo con órdenes o transiciones
+    "poll_backoff_factor": 1.3,     # Factor aplicado al intervalo tras un sondeo sin actividad
+    "poll_jitter": 0.2,             # Variación aleatoria del intervalo (±20%)
+    "poll_hour_profiles": {},       # Límites por hora, p. ej. {"12-15": [3, 15], "0-6": [30, 120]}
+    "monitor_targets": [],          # Motor asíncrono: cuentas/filtros a sondear ([] = la cuenta del .env), p. ej.
+                                    # {"name": "cocina", "username": "...", "password_env": "ADMIN_PASSWORD_2",
+                                    #  "statuses": ["PROCESSED", "INPREPARATION"], "check_interval": 5}
+    "async_io_workers": 8,          # Hilos de E/S compartidos por todos los objetivos del motor asíncrono
     "order_timeout": 300,           # Segundos para considerar un pedido como "nuevo"
-    "max_retries": 3,               # Máximo de reintentos en caso de error
+    "max_retries": 3,               # Reintentos por petición GET ante timeout, error de conexión o 5xx
+    "retry_backoff_factor": 0.5,    # Backoff exponencial entre reintentos (0.5s, 1s, 2s... con jitter)
+    "retry_backoff_max": 10,        # Espera máxima entre reintentos, también para el Retry-After del servidor
+    "max_retry_time": 60,           # Segundos máximos reintentando una petición desde el primer fallo
+    "circuit_breaker_threshold": 5, # Fallos seguidos (tras reintentos) que abren el circuit breaker
+    "circuit_breaker_cooldown": 60, # Segundos sin peticiones con el circuit breaker abierto
     "notification_sound": True,     # Sonido de notificación
     "log_level": "INFO",
     "max_known_orders": 500,        # Máximo de órdenes conocidas en memoria
-    "request_timeout": 30,          # Timeout para peticiones HTTP
+    "dedup_state_file": "data/terminal_monitor_state.sqlite3", # Estado de deduplicación persistente ("" = desactivado)
+    "dedup_state_retention": 86400, # Segundos que se conserva una orden en el estado persistente
+    "connect_timeout": 5,           # Timeout de conexión (segundos)
+    "request_timeout": 30,          # Timeout de lectura de cada respuesta (segundos)
     "enable_auto_refresh": True,    # Auto-refresh de sesión
-    "refresh_interval": 600,        # Segundos entre auto-refresh (10 min)
+    "refresh_interval": 600,        # Segundos sin una respuesta autenticada antes de comprobar la sesión (10 min)
+    "session_store_file": "data/terminal_session.bin", # Cookies de sesión cifradas para reutilizarlas al arrancar ("" = desactivado)
+    "session_store_max_age": 86400, # Segundos que se reutiliza una sesión guardada
+    "enable_conditional_get": True, # If-None-Match/If-Modified-Since y hash del contenido
+    "poll_mode": "direct",          # "direct" (una petición a TASKS_URL_WITH_PARAMS) o "discovery" (botón Active orders)
+    "html_parser": "lxml",          # Backend de parseo: "lxml" (rápido) o "html.parser" (respaldo)
+    "scoped_parsing": True,         # Parsear solo la tabla de órdenes (documento completo si no hay órdenes)
+    "incremental_extraction": True, # Re-parsear solo las filas cuyo HTML cambió (delta añadidas/modificadas/retiradas)
+    "raw_html_capture": "new",      # raw_html a guardar (comprimido): "off", "new" (solo nuevas), "sampled" o "all"
+    "raw_html_sample_rate": 0.1,    # Fracción de órdenes nuevas/modificadas con raw_html en modo "sampled"
+    "lifecycle_events": True,       # Guardar eventos de transición (creada, cambio de estado, rider, retirada/completada)
     "enable_debug_mode": False,     # Modo debug para desarrollo
     "save_screenshots": False,      # No screenshots en terminal
     "enable_webhook": False,        # Habilitar webhooks para notificaciones
     "webhook_url": "",             # URL del webhook
     "enable_database_logging": True, # Logging detallado en base de datos
+    "enable_write_behind": True,    # Guardar en BD desde un hilo aparte (no bloquea el sondeo)
+    "write_behind_batch_size": 50,  # Órdenes por lote de escritura
+    "write_behind_flush_interval": 2, # Segundos máximos antes de guardar un lote incompleto
+    "write_behind_max_queue": 1000, # Tamaño máximo de la cola de escritura
+    "write_behind_spill_file": "data/terminal_orders_spill.jsonl", # Respaldo en disco si la BD no responde
     "enable_performance_monitoring": True, # Monitoreo de rendimiento
     "max_concurrent_orders": 50,    # Máximo de órdenes concurrentes
     "order_priority_levels": ["urgent", "high", "normal", "low"], # Niveles de prioridad
@@ -0,0 +1,118 @@
+"""
+Estado de deduplicación persistente para monitores
+Instantánea en SQLite de las órdenes ya vistas para que un reinicio no las vuelva a procesar
+"""
+
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+from .utils import BaseLogger
+
+
+class DedupStateStore:
+    """Instantánea en disco de órdenes conocidas (clave estable -> huella de contenido)"""
+    
+    def __init__(self, path, retention=86400):
+        self.path = Path(path)
+        self.retention = retention
+        self.conn = None
+        self.writes = 0
+        self.connect()
+    
+    def connect(self):
+        """Abrir (o crear) el archivo de estado"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            # WAL + synchronous=NORMAL: cada escritura incremental es barata
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS known_orders (
+                    order_key TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    last_seen REAL
+                )
+            """)
+            self.conn.commit()
+            return True
+        
+        except Exception as e:
+            logging.error(f"❌ Error abriendo estado de deduplicación {self.path}: {e}")
+            BaseLogger.error(f"Error abriendo estado de deduplicación: {e}")
+            self.conn = None
+            return False
+    
+    def load(self):
+        """Cargar órdenes recientes (más antiguas primero) y purgar las vencidas"""
+        if not self.conn:
+            return []
+        
+        try:
+            cutoff = time.time() - self.retention
+            self.conn.execute("DELETE FROM known_orders WHERE last_seen < ?", (cutoff,))
+            self.conn.commit()
+            
+            rows = self.conn.execute(
+                "SELECT order_key, content_hash FROM known_orders ORDER BY last_seen"
+            ).fetchall()
+            BaseLogger.info(f"Estado de deduplicación cargado: {len(rows)} órdenes conocidas")
+            return rows
+        
+        except Exception as e:
+            logging.error(f"❌ Error cargando estado de deduplicación: {e}")
+            return []
+    
+    def load_into(self, store):
+        """Sembrar un KnownOrderStore con la instantánea en disco"""
+        rows = self.load()
+        for order_key, content_hash in rows:
+            store.seed(order_key, content_hash)
+        return len(rows)
+    
+    def record(self, order_key, content_hash):
+        """Registrar una orden vista (escritura incremental)"""
+        if not self.conn:
+            return False
+        
+        try:
+            self.conn.execute("""
+                INSERT INTO known_orders (order_key, content_hash, last_seen)
+                VALUES (?, ?, ?)
+                ON CONFLICT(order_key) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    last_seen = excluded.last_seen
+            """, (order_key, content_hash, time.time()))
+            self.conn.commit()
+            self.writes += 1
+            return True
+        
+        except Exception as e:
+            logging.error(f"❌ Error guardando estado de deduplicación: {e}")
+            return False
+    
+    def touch(self, order_keys):
+        """Actualizar last_seen de órdenes que siguen en la página (una sola transacción)"""
+        if not self.conn or not order_keys:
+            return False
+        
+        try:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE known_orders SET last_seen = ? WHERE order_key = ?",
+                [(now, order_key) for order_key in order_keys]
+            )
+            self.conn.commit()
+            return True
+        
+        except Exception as e:
+            logging.error(f"❌ Error actualizando estado de deduplicación: {e}")
+            return False
+    
+    def close(self):
+        """Cerrar el archivo de estado"""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,158 @@
+"""
+Backends de parseo HTML para monitores
+lxml como ruta rápida y html.parser como respaldo para páginas malformadas
+"""
+
+import logging
+import time
+from collections import defaultdict
+from bs4 import BeautifulSoup, FeatureNotFound
+
+# Backends en orden de preferencia (el último es el respaldo de la librería estándar)
+PARSER_BACKENDS = ('lxml', 'html.parser')
+FALLBACK_BACKEND = 'html.parser'
+
+
+def available_backends():
+    """Backends instalados en este entorno"""
+    backends = []
+    for backend in PARSER_BACKENDS:
+        try:
+            BeautifulSoup("<p></p>", backend)
+            backends.append(backend)
+        except FeatureNotFound:
+            continue
+    return backends
+
+
+class ParserBackend:
+    """Parser HTML intercambiable que produce siempre un árbol BeautifulSoup
+    
+    Todo el código de extracción sigue usando la API de BeautifulSoup, así que
+    cambiar de backend no cambia los datos extraídos, solo el tiempo de parseo.
+    """
+    
+    def __init__(self, preferred='lxml'):
+        available = available_backends()
+        if preferred in available:
+            self.name = preferred
+        else:
+            self.name = FALLBACK_BACKEND
+            if preferred != FALLBACK_BACKEND:
+                logging.warning(f"⚠️ Backend HTML '{preferred}' no disponible, usando {FALLBACK_BACKEND}")
+        self.stats = defaultdict(float)
+    
+    def parse(self, markup, parse_only=None, backend=None):
+        """Parsear HTML con el backend indicado (o el preferido)"""
+        backend = backend or self.name
+        start_time = time.perf_counter()
+        
+        try:
+            soup = BeautifulSoup(markup, backend, parse_only=parse_only)
+        except Exception as e:
+            if backend == FALLBACK_BACKEND:
+                raise
+            logging.warning(f"⚠️ Error parseando con {backend}, usando {FALLBACK_BACKEND}: {e}")
+            self.stats['fallbacks'] += 1
+            return self.parse(markup, parse_only, FALLBACK_BACKEND)
+        
+        self.stats['parses'] += 1
+        self.stats['parse_time'] += time.perf_counter() - start_time
+        return soup
+    
+    def parse_with_fallback(self, markup, is_valid, parse_only=None):
+        """Parsear con el backend rápido y repetir con html.parser si el árbol no es válido
+        
+        lxml repara el HTML malformado de forma distinta a html.parser; si el
+        resultado no supera `is_valid(soup)` se vuelve a parsear con el respaldo.
+        """
+        soup = self.parse(markup, parse_only)
+        if self.name == FALLBACK_BACKEND or is_valid(soup):
+            return soup
+        
+        self.stats['fallbacks'] += 1
+        logging.info(f"Árbol de {self.name} incompleto, reintentando con {FALLBACK_BACKEND}")
+        return self.parse(markup, parse_only, FALLBACK_BACKEND)
+    
+    def get_stats(self):
+        """Número de parseos, tiempo medio y respaldos usados"""
+        parses = self.stats['parses']
+        return {
+            'backend': self.name,
+            'parses': int(parses),
+            'avg_parse_time': self.stats['parse_time'] / parses if parses else 0.0,
+            'fallbacks': int(self.stats['fallbacks'])
+        }
+
+
+_default_backend = None
+
+
+def parse_html(markup, parse_only=None):
+    """Parsear HTML con el backend por defecto (lxml si está instalado)"""
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = ParserBackend()
+    return _default_backend.parse(markup, parse_only)
+
+
+class FetchedPage:
+    """Página descargada: bytes originales, texto y árbol construidos una sola vez bajo demanda
+    
+    El cliente HTTP (validación y huella), el extractor de órdenes y cualquier
+    otra etapa del ciclo comparten la misma instancia, así que cada respuesta
+    se decodifica y se parsea como máximo una vez.
+    """
+    
+    def __init__(self, content, encoding=None, url=None, status_code=200, backend=None):
+        if isinstance(content, str):
+            self._text = content
+            content = content.encode('utf-8')
+            encoding = 'utf-8'
+        else:
+            self._text = None
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+        self.url = url
+        self.status_code = status_code
+        self.backend = backend
+        self._soup = None
+    
+    @classmethod
+    def from_response(cls, response, backend=None):
+        """Crear la página a partir de una respuesta de requests (sin decodificarla)"""
+        return cls(response.content, response.encoding, response.url, response.status_code, backend)
+    
+    def __bool__(self):
+        return bool(self.content)
+    
+    def contains(self, marker):
+        """Buscar un marcador en los bytes sin decodificar la página"""
+        if isinstance(marker, str):
+            marker = marker.encode(self.encoding, 'replace')
+        return marker in self.content
+    
+    @property
+    def text(self):
+        """Contenido decodificado (una sola vez)"""
+        if self._text is None:
+            self._text = self.content.decode(self.encoding, 'replace')
+        return self._text
+    
+    @property
+    def is_parsed(self):
+        return self._soup is not None
+    
+    def soup(self, parse=None):
+        """Árbol completo de la página (se parsea la primera vez que se pide)
+        
+        `parse` permite al primer consumidor elegir cómo parsear (p. ej. con
+        validación y respaldo); las llamadas siguientes reutilizan el árbol.
+        """
+        if self._soup is None:
+            if parse is not None:
+                self._soup = parse(self.text)
+            else:
+                backend = self.backend or ParserBackend()
+                self._soup = backend.parse(self.text)
+        return self._soup
@@ -5,17 +5,69 @@ Manejo de peticiones HTTP y sesiones para el monitor terminal
 
 import requests
 import logging
-from bs4 import BeautifulSoup
-from .config import TERMINAL_MONITOR_CONFIG, LOGIN_URL, TASKS_URL, TASKS_URL_WITH_PARAMS, ADMIN_USERNAME, ADMIN_PASSWORD
+import time
+import hashlib
+from collections import defaultdict
+from .config import project_root, TERMINAL_MONITOR_CONFIG, LOGIN_URL, TASKS_URL, TASKS_URL_WITH_PARAMS, ADMIN_USERNAME, ADMIN_PASSWORD
 from .utils import BaseLogger
-import re
+from .html_backend import ParserBackend, FetchedPage
+from .patterns import PATTERNS
+from .session_store import SessionStore
+from .transport import CircuitBreaker, ResilientHTTPAdapter, is_server_failure
 
 class HTTPClient:
     """Cliente HTTP para peticiones web"""
     
-    def __init__(self):
+    # Headers para evitar caché
+    NO_CACHE_HEADERS = {
+        'Cache-Control': 'no-cache, no-store, must-revalidate',
+        'Pragma': 'no-cache',
+        'Expires': '0',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    }
+    
+    # Marcadores que indican que la respuesta es la página de tareas
+    ORDERS_PAGE_MARKERS = (b'responsive-table', b'orders-list-item', b'Active orders')
+    
+    def __init__(self, username=None, password=None, orders_url=None, session_file=None, login_handler=None):
+        # Cuenta y URL filtrada de órdenes (por defecto las del .env)
+        self.username = username or ADMIN_USERNAME
+        self.password = password or ADMIN_PASSWORD
+        self.orders_url = orders_url or TASKS_URL_WITH_PARAMS
+        # Login alternativo (p. ej. con navegador) que entrega sus cookies con import_browser_cookies()
+        self.login_handler = login_handler
         self.session = None
         self.csrf_token = None
+        self.last_poll_path = None
+        self.poll_path_stats = defaultdict(int)
+        # Estado de sondeo condicional
+        self.etag = None
+        self.last_modified = None
+        self.last_body_hash = None
+        self.last_orders_page = None
+        self.page_unchanged = False
+        self.server_failed = False  # El último sondeo falló por timeout, conexión o 5xx
+        self.conditional_stats = defaultdict(int)
+        self.html_backend = ParserBackend(TERMINAL_MONITOR_CONFIG.get("html_parser", "lxml"))
+        # Sesión persistente: cookies cifradas en disco y re-login solo si la sesión expira
+        self.session_store = None
+        self.auth_failed = False
+        self.last_authenticated_at = None
+        self.session_stats = defaultdict(int)
+        # Un breaker por cliente: sobrevive a setup_session() y se comparte entre http y https
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=TERMINAL_MONITOR_CONFIG["circuit_breaker_threshold"],
+            cooldown=TERMINAL_MONITOR_CONFIG["circuit_breaker_cooldown"]
+        )
+        self.transport = None
+        session_file = session_file or TERMINAL_MONITOR_CONFIG.get("session_store_file")
+        if session_file:
+            self.session_store = SessionStore(
+                project_root / session_file,
+                self.username,
+                self.password,
+                max_age=TERMINAL_MONITOR_CONFIG["session_store_max_age"]
+            )
         self.setup_session()
     
     def setup_session(self):
@@ -34,8 +86,18 @@ class HTTPClient:
                 'Cache-Control': 'max-age=0'
             })
             
-            # Configurar timeout
-            self.session.timeout = TERMINAL_MONITOR_CONFIG["request_timeout"]
+            # Timeouts reales, reintentos con backoff y circuit breaker en el adaptador
+            # (requests ignora session.timeout)
+            self.transport = ResilientHTTPAdapter(
+                timeout=(TERMINAL_MONITOR_CONFIG["connect_timeout"], TERMINAL_MONITOR_CONFIG["request_timeout"]),
+                max_retries=TERMINAL_MONITOR_CONFIG["max_retries"],
+                backoff_factor=TERMINAL_MONITOR_CONFIG["retry_backoff_factor"],
+                backoff_max=TERMINAL_MONITOR_CONFIG["retry_backoff_max"],
+                max_retry_time=TERMINAL_MONITOR_CONFIG["max_retry_time"],
+                circuit_breaker=self.circuit_breaker
+            )
+            self.session.mount('http://', self.transport)
+            self.session.mount('https://', self.transport)
             
             BaseLogger.success("Sesión HTTP configurada correctamente")
             return True
@@ -45,16 +107,98 @@ class HTTPClient:
             BaseLogger.error(f"Error configurando sesión HTTP: {e}")
             return False
     
+    def authenticate(self):
+        """Reutilizar la sesión guardada si sigue siendo válida; si no, iniciar sesión"""
+        if self.restore_session():
+            return True
+        return self.start_login()
+    
+    def start_login(self):
+        """Iniciar sesión con el login alternativo si está configurado, o por HTTP"""
+        if self.login_handler:
+            return self.login_handler()
+        return self.login()
+    
+    def import_browser_cookies(self, cookies, user_agent=None):
+        """Adoptar la sesión de un navegador (driver.get_cookies()) para sondear por HTTP"""
+        try:
+            self.session.cookies.clear()
+            for cookie in cookies:
+                self.session.cookies.set(
+                    cookie['name'],
+                    cookie['value'],
+                    domain=cookie.get('domain'),
+                    path=cookie.get('path', '/'),
+                    secure=cookie.get('secure', False),
+                    expires=cookie.get('expiry')
+                )
+            # Mismo User-Agent que el navegador: algunas sesiones están ligadas a él
+            if user_agent:
+                self.session.headers['User-Agent'] = user_agent
+            
+            self.session_stats['browser_handoffs'] += 1
+            BaseLogger.success(f"Sesión del navegador transferida a HTTP ({len(cookies)} cookies)")
+            self._session_authenticated()
+            return bool(cookies)
+            
+        except Exception as e:
+            logging.error(f"❌ Error transfiriendo cookies del navegador: {e}")
+            BaseLogger.error(f"Error transfiriendo cookies del navegador: {e}")
+            return False
+    
+    def restore_session(self):
+        """Cargar las cookies guardadas y comprobarlas con una sola petición"""
+        if not self.session_store or not self.session_store.load_into(self.session):
+            return False
+        
+        if self.probe_session():
+            self.session_stats['restored'] += 1
+            BaseLogger.success("Sesión guardada reutilizada (sin login)")
+            return True
+        
+        BaseLogger.info("La sesión guardada expiró, iniciando sesión de nuevo")
+        self.session.cookies.clear()
+        self.session_store.clear()
+        return False
+    
+    def probe_session(self):
+        """Comprobar la sesión con una petición: la URL de órdenes responde 200 sin redirigir y es la página de tareas
+        
+        Un 200 no basta: algunos despliegues sirven el formulario de login sin
+        redirigir, así que el cuerpo pasa por la misma verificación de
+        marcadores que cada sondeo (sin decodificar ni parsear).
+        """
+        try:
+            self.session_stats['probes'] += 1
+            response = self.session.get(self.orders_url, allow_redirects=False)
+            if response.status_code != 200:
+                return False
+            
+            # _looks_like_orders_page actualiza last_authenticated_at si la página es válida
+            return self._looks_like_orders_page(FetchedPage.from_response(response, self.html_backend))
+            
+        except Exception as e:
+            BaseLogger.warning(f"Error comprobando la sesión: {e}")
+            return False
+    
+    def _session_authenticated(self):
+        """Login correcto: guardar la sesión cifrada para el próximo arranque"""
+        self.session_stats['logins'] += 1
+        self.auth_failed = False
+        self.last_authenticated_at = time.time()
+        if self.session_store:
+            self.session_store.save(self.session)
+    
     def login(self):
         """Iniciar sesión usando requests"""
         try:
-            BaseLogger.info(f"Intentando login con usuario: {ADMIN_USERNAME}")
+            BaseLogger.info(f"Intentando login con usuario: {self.username}")
             
             # Obtener página de login para extraer CSRF token
             login_page_response = self.session.get(LOGIN_URL)
             login_page_response.raise_for_status()
             
-            soup = BeautifulSoup(login_page_response.text, 'html.parser')
+            soup = self.html_backend.parse(login_page_response.text)
             
             # Buscar CSRF token
             csrf_token = self._extract_csrf_token(soup)
@@ -64,8 +208,8 @@ class HTTPClient:
             
             # Preparar datos de login
             login_data = {
-                'uid': ADMIN_USERNAME,
-                'password': ADMIN_PASSWORD
+                'uid': self.username,
+                'password': self.password
             }
             
             # Agregar CSRF token si existe
@@ -82,6 +226,7 @@ class HTTPClient:
             # Verificar si el login fue exitoso
             if self._is_login_successful(login_response):
                 BaseLogger.success("Login exitoso via HTTP")
+                self._session_authenticated()
                 return True
             else:
                 BaseLogger.warning("Login falló, intentando estrategia alternativa...")
@@ -147,16 +292,17 @@ class HTTPClient:
             for url in alternative_urls:
                 try:
                     login_data = {
-                        'username': ADMIN_USERNAME,
-                        'password': ADMIN_PASSWORD,
-                        'email': ADMIN_USERNAME,
-                        'user': ADMIN_USERNAME
+                        'username': self.username,
+                        'password': self.password,
+                        'email': self.username,
+                        'user': self.username
                     }
                     
                     response = self.session.post(url, data=login_data, allow_redirects=True)
                     
                     if self._is_login_successful(response):
                         BaseLogger.success(f"Login exitoso via {url}")
+                        self._session_authenticated()
                         return True
                         
                 except Exception:
@@ -169,20 +315,160 @@ class HTTPClient:
             return False
     
     def get_orders_page(self):
+        """Obtener página de órdenes (FetchedPage) según el modo de sondeo configurado"""
+        try:
+            self.page_unchanged = False
+            self.auth_failed = False
+            self.server_failed = False
+            
+            # Servidor con problemas: no sondear hasta que termine el enfriamiento
+            if self.circuit_breaker.is_open():
+                self.poll_path_stats['skipped'] += 1
+                BaseLogger.warning(f"Circuit breaker abierto, sondeo omitido ({self.poll_path_stats['skipped']} omitidos)")
+                return None
+            
+            if TERMINAL_MONITOR_CONFIG.get("poll_mode", "direct") == "direct":
+                page = self._get_orders_page_direct()
+                if page is None and self._relogin_after_auth_failure():
+                    page = self._get_orders_page_direct()
+                if page is not None:
+                    self._record_poll_path("direct")
+                    return page
+                
+                # El servidor no responde: la página de descubrimiento solo añadiría carga
+                if self.server_failed:
+                    return None
+                
+                BaseLogger.warning("Respuesta directa inválida, usando página de descubrimiento...")
+                page = self._get_orders_page_discovery()
+                if page is not None:
+                    self._record_poll_path("fallback")
+                return page
+            
+            page = self._get_orders_page_discovery()
+            if page is not None and not self._looks_like_orders_page(page) and self._relogin_after_auth_failure():
+                page = self._get_orders_page_discovery()
+            if page is not None:
+                self._record_poll_path("discovery")
+            return page
+            
+        except Exception as e:
+            logging.error(f"❌ Error obteniendo página de órdenes: {e}")
+            BaseLogger.error(f"Error obteniendo página de órdenes: {e}")
+            return None
+    
+    def _relogin_after_auth_failure(self):
+        """La respuesta fue la página de login: la sesión expiró, iniciar sesión de nuevo"""
+        if not self.auth_failed:
+            return False
+        
+        self.session_stats['auth_failures'] += 1
+        BaseLogger.warning("Sesión expirada (redirección al login), iniciando sesión de nuevo...")
+        self.session.cookies.clear()
+        return self.start_login()
+    
+    def _record_poll_path(self, path):
+        """Registrar qué ruta de sondeo usó el ciclo actual"""
+        self.last_poll_path = path
+        self.poll_path_stats[path] += 1
+        BaseLogger.info(f"Ruta de sondeo: {path} (direct={self.poll_path_stats['direct']}, "
+                        f"fallback={self.poll_path_stats['fallback']}, discovery={self.poll_path_stats['discovery']})")
+    
+    def _get_orders_page_direct(self):
+        """Obtener directamente la URL filtrada de Active orders en una sola petición"""
+        try:
+            BaseLogger.info("Obteniendo página de órdenes activas (modo directo)...")
+            
+            if TERMINAL_MONITOR_CONFIG.get("enable_conditional_get", False):
+                return self._get_orders_page_conditional()
+            
+            params_url = f"{self.orders_url}&_t={int(time.time())}"
+            response = self.session.get(params_url, headers=self.NO_CACHE_HEADERS)
+            response.raise_for_status()
+            
+            page = FetchedPage.from_response(response, self.html_backend)
+            if not self._looks_like_orders_page(page):
+                return None
+            
+            BaseLogger.success("Página de órdenes activas obtenida")
+            return page
+            
+        except Exception as e:
+            self.server_failed = is_server_failure(e)
+            BaseLogger.warning(f"Error en petición directa: {e}")
+            return None
+    
+    def _get_orders_page_conditional(self):
+        """Petición condicional (ETag/Last-Modified) con respaldo por hash del contenido"""
+        # Sin cache-buster para que el servidor pueda validar; los headers no-cache solo
+        # obligan a revalidar en intermediarios y conservan el User-Agent habitual
+        headers = dict(self.NO_CACHE_HEADERS)
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        
+        response = self.session.get(self.orders_url, headers=headers)
+        
+        if response.status_code == 304 and self.last_orders_page is not None:
+            # Un 304 de la URL de órdenes también demuestra que la sesión sigue activa
+            self.last_authenticated_at = time.time()
+            self.page_unchanged = True
+            self.conditional_stats['not_modified'] += 1
+            BaseLogger.info(f"Página sin cambios (304) - total 304: {self.conditional_stats['not_modified']}")
+            return self.last_orders_page
+        
+        response.raise_for_status()
+        
+        page = FetchedPage.from_response(response, self.html_backend)
+        if not self._looks_like_orders_page(page):
+            return None
+        
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        
+        # El servidor no ofrece validadores: comparar hash del contenido relevante
+        content_hash = self._content_fingerprint(page.content)
+        if content_hash == self.last_body_hash:
+            self.page_unchanged = True
+            self.conditional_stats['body_hash_hits'] += 1
+            BaseLogger.info(f"Página sin cambios (hash) - total aciertos hash: {self.conditional_stats['body_hash_hits']}")
+        else:
+            self.conditional_stats['changed'] += 1
+            BaseLogger.success("Página de órdenes activas obtenida")
+        
+        self.last_body_hash = content_hash
+        self.last_orders_page = page
+        return page
+    
+    def _content_fingerprint(self, content):
+        """Hash de la tabla de órdenes (o de la página completa si no se encuentra), sobre los bytes"""
+        start = content.find(b'responsive-table')
+        end = content.find(b'</table>', start) if start != -1 else -1
+        if start != -1 and end != -1:
+            content = content[start:end]
+        return hashlib.sha1(content).hexdigest()
+    
+    def _looks_like_orders_page(self, page):
+        """Verificación barata (sin decodificar ni parsear) de que la respuesta es la página de tareas"""
+        # Redirección al login: la sesión expiró
+        if (page.url or '').rstrip('/') == LOGIN_URL.rstrip('/') or page.contains(b'name="password"'):
+            self.auth_failed = True
+            return False
+        
+        if any(page.contains(marker) for marker in self.ORDERS_PAGE_MARKERS):
+            self.last_authenticated_at = time.time()
+            return True
+        return False
+    
+    def _get_orders_page_discovery(self):
         """Obtener página de órdenes y activar el botón Active orders"""
         try:
             BaseLogger.info("Obteniendo página de tareas...")
             
-            # Headers para evitar caché
-            headers = {
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
+            headers = self.NO_CACHE_HEADERS
             
             # 1. Obtener página base de tareas
-            import time
             timestamp = int(time.time())
             url_with_timestamp = f"{TASKS_URL}?_t={timestamp}"
             
@@ -191,8 +477,9 @@ class HTTPClient:
             
             BaseLogger.success(f"Página base obtenida: {TASKS_URL}")
             
-            # 2. Buscar el botón "Active orders"
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # 2. Buscar el botón "Active orders" (el árbol queda en la página para el extractor)
+            page = FetchedPage.from_response(response, self.html_backend)
+            soup = page.soup()
             active_orders_button = soup.find('div', class_='btn')
             
             if active_orders_button:
@@ -212,18 +499,18 @@ class HTTPClient:
                         
                         # Usar la URL con parámetros que simula el clic en el botón
                         active_timestamp = int(time.time())
-                        active_url = f"{TASKS_URL_WITH_PARAMS}&_t={active_timestamp}"
+                        active_url = f"{self.orders_url}&_t={active_timestamp}"
                         
                         active_response = self.session.get(active_url, headers=headers)
                         active_response.raise_for_status()
                         
                         BaseLogger.success("Filtro Active orders activado")
-                        return active_response.text
+                        return FetchedPage.from_response(active_response, self.html_backend)
                         
                     except Exception as click_error:
                         BaseLogger.warning(f"No se pudo activar el filtro: {click_error}")
                         # Continuar con la página original
-                        return response.text
+                        return page
                 else:
                     BaseLogger.info("Botón encontrado pero no es Active orders")
             else:
@@ -233,27 +520,29 @@ class HTTPClient:
             try:
                 BaseLogger.info("Intentando con URL con parámetros...")
                 params_timestamp = int(time.time())
-                params_url = f"{TASKS_URL_WITH_PARAMS}&_t={params_timestamp}"
+                params_url = f"{self.orders_url}&_t={params_timestamp}"
                 
                 params_response = self.session.get(params_url, headers=headers)
                 params_response.raise_for_status()
                 
                 BaseLogger.success("Página con parámetros obtenida")
-                return params_response.text
+                return FetchedPage.from_response(params_response, self.html_backend)
                 
             except Exception as params_error:
                 BaseLogger.warning(f"No se pudo obtener página con parámetros: {params_error}")
-                return response.text
+                return page
             
         except Exception as e:
             logging.error(f"❌ Error obteniendo página de órdenes: {e}")
             BaseLogger.error(f"Error obteniendo página de órdenes: {e}")
             return None
     
-    def _page_contains_orders(self, html_content):
-        """Verificar si la página contiene órdenes"""
+    def _page_contains_orders(self, page):
+        """Verificar si la página (FetchedPage) contiene órdenes"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            if not isinstance(page, FetchedPage):
+                page = FetchedPage(page, backend=self.html_backend)
+            soup = page.soup()
             
             # Buscar indicadores de órdenes
             order_indicators = [
@@ -274,7 +563,7 @@ class HTTPClient:
                     return True
             
             # Buscar elementos específicos
-            order_elements = soup.find_all(['tr', 'div', 'li'], class_=re.compile(r'order|task|active', re.I))
+            order_elements = soup.find_all(['tr', 'div', 'li'], class_=PATTERNS.pattern('order_class'))
             if order_elements:
                 return True
             
@@ -284,16 +573,28 @@ class HTTPClient:
             return False
     
     def refresh_session(self):
-        """Refrescar la sesión"""
+        """Refrescar la sesión solo si hace falta
+        
+        Un sondeo reciente con la página de órdenes ya demuestra que la sesión es
+        válida; si no lo hay, se comprueba con una petición y solo se vuelve a
+        iniciar sesión si la comprobación falla.
+        """
         try:
-            BaseLogger.info("Refrescando sesión...")
-            return self.login()
+            refresh_interval = TERMINAL_MONITOR_CONFIG["refresh_interval"]
+            if self.last_authenticated_at and time.time() - self.last_authenticated_at < refresh_interval:
+                return True
+            if self.probe_session():
+                return True
+            BaseLogger.info("Sesión expirada, refrescando...")
+            return self.start_login()
         except Exception as e:
             logging.error(f"❌ Error refrescando sesión: {e}")
             return False
     
     def close_session(self):
-        """Cerrar la sesión"""
+        """Cerrar la sesión (guardando sus cookies para el próximo arranque)"""
+        if self.session and self.session_store and self.last_authenticated_at:
+            self.session_store.save(self.session)
         if self.session:
             self.session.close()
             BaseLogger.info("Sesión HTTP cerrada") 
\ No newline at end of file
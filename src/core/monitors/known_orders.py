@@ -0,0 +1,169 @@
+"""
+Almacén de órdenes conocidas para monitores
+Memoria acotada con expulsión LRU y expiración por TTL compartida por los monitores
+"""
+
+import time
+from collections import OrderedDict, defaultdict
+
+
+class KnownOrderStore:
+    """Órdenes conocidas (clave estable -> huella de contenido) con LRU + TTL
+    
+    Cada consulta o escritura refresca la orden, así que una orden que sigue
+    apareciendo en la página nunca expira; solo las que dejan de verse salen
+    por TTL, y las menos recientes salen por LRU al superar max_size.
+    Inserción y búsqueda son O(1). Si se indica `persistence` (DedupStateStore)
+    cada escritura se replica en disco, y las órdenes que siguen viéndose se
+    refrescan allí por lotes cada persist_interval segundos para que la
+    retención del estado no las purgue mientras sigan en la página.
+    """
+    
+    def __init__(self, max_size=500, ttl=300, clock=time.monotonic, persistence=None, persist_interval=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self.persistence = persistence
+        self.persist_interval = persist_interval
+        self._entries = OrderedDict()  # clave -> (valor, última vez vista)
+        self._touched_all_at = None
+        self._refreshed = set()  # Claves vistas desde el último refresco en disco
+        self._refreshed_all = False
+        self._persisted_at = clock()
+        self.stats = defaultdict(int)
+    
+    def _last_seen(self, seen_at):
+        """Última vez vista teniendo en cuenta touch_all()"""
+        if self._touched_all_at is not None and self._touched_all_at > seen_at:
+            return self._touched_all_at
+        return seen_at
+    
+    def _is_expired(self, seen_at, now):
+        return self.ttl is not None and now - self._last_seen(seen_at) > self.ttl
+    
+    def get(self, key, default=None):
+        """Obtener valor de una orden conocida (cuenta acierto/fallo y la refresca)"""
+        entry = self._entries.get(key)
+        now = self._clock()
+        
+        if entry is None:
+            self.stats['misses'] += 1
+            return default
+        
+        if self._is_expired(entry[1], now):
+            del self._entries[key]
+            self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return default
+        
+        self._entries[key] = (entry[0], now)
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        if self.persistence:
+            self._refreshed.add(key)
+            self._persist_seen(now)
+        return entry[0]
+    
+    def __getitem__(self, key):
+        marker = object()
+        value = self.get(key, marker)
+        if value is marker:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key, value):
+        self.seed(key, value)
+        
+        if self.persistence:
+            self.persistence.record(key, value)
+    
+    def seed(self, key, value):
+        """Insertar una orden sin replicarla en disco (carga inicial)"""
+        now = self._clock()
+        self._entries[key] = (value, now)
+        self._entries.move_to_end(key)
+        self.purge_expired(now)
+        
+        # Expulsión LRU
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+    
+    def add(self, key):
+        """Registrar una clave sin valor asociado (uso tipo conjunto)"""
+        self[key] = True
+    
+    def __contains__(self, key):
+        """¿Orden conocida y vigente? Es una consulta más: la refresca y cuenta acierto/fallo"""
+        marker = object()
+        return self.get(key, marker) is not marker
+    
+    def __delitem__(self, key):
+        del self._entries[key]
+    
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def __iter__(self):
+        return iter(list(self._entries))
+    
+    def items(self):
+        return [(key, entry[0]) for key, entry in self._entries.items()]
+    
+    def touch_all(self):
+        """Refrescar todas las órdenes vigentes (p. ej. cuando la página no cambió)"""
+        now = self._clock()
+        # Las ya expiradas salen antes: refrescarlas las resucitaría
+        self.purge_expired(now)
+        self._touched_all_at = now
+        if self.persistence:
+            self._refreshed_all = True
+            self._persist_seen(now)
+    
+    def _persist_seen(self, now):
+        """Refrescar en disco, por lotes, las órdenes vistas desde el último refresco"""
+        if now - self._persisted_at < self.persist_interval:
+            return
+        
+        keys = list(self._entries) if self._refreshed_all else [key for key in self._refreshed if key in self._entries]
+        self._refreshed.clear()
+        self._refreshed_all = False
+        self._persisted_at = now
+        self.persistence.touch(keys)
+    
+    def purge_expired(self, now=None):
+        """Eliminar órdenes expiradas; las más antiguas están al principio"""
+        if self.ttl is None:
+            return 0
+        
+        now = self._clock() if now is None else now
+        purged = 0
+        while self._entries:
+            key, (value, seen_at) = next(iter(self._entries.items()))
+            if not self._is_expired(seen_at, now):
+                break
+            self._entries.popitem(last=False)
+            purged += 1
+        
+        self.stats['expirations'] += purged
+        return purged
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def get_stats(self):
+        """Contadores de aciertos, fallos, expulsiones y expiraciones"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'evictions': self.stats['evictions'],
+            'expirations': self.stats['expirations'],
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+        }
@@ -0,0 +1,95 @@
+"""
+Ciclo de vida de órdenes para monitores
+Máquina de estados que compara cada orden con su última instantánea y emite eventos tipados
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+from .known_orders import KnownOrderStore
+
+# Tipos de evento
+EVENT_CREATED = 'created'
+EVENT_STATUS_CHANGED = 'status_changed'
+EVENT_RIDER_ASSIGNED = 'rider_assigned'
+EVENT_REMOVED = 'removed'
+EVENT_COMPLETED = 'completed'
+
+# Estados tras los cuales una orden que sale de la página se considera entregada
+COMPLETION_STATUSES = ('En Camino', 'En Ubicación')
+
+
+class OrderLifecycleTracker:
+    """Última instantánea (estado, rider) por order_id y eventos de transición
+    
+    Solo se emiten eventos cuando algo cambia de verdad, así que el volumen de
+    escrituras en la tabla de eventos sigue a los cambios y no al número de
+    sondeos.
+    """
+    
+    def __init__(self, max_orders=1000):
+        self.snapshots = KnownOrderStore(max_size=max_orders, ttl=None)  # order_id -> (estado, rider)
+        self.stats = defaultdict(int)
+    
+    def _event(self, event_type, order_data, previous_value, new_value, occurred_at):
+        self.stats[event_type] += 1
+        return {
+            'order_id': order_data.get('order_id'),
+            'event_type': event_type,
+            'previous_value': previous_value,
+            'new_value': new_value,
+            'occurred_at': occurred_at.isoformat(),
+            'raw_data': {
+                'status': str(order_data.get('status') or '') or None,
+                'rider': order_data.get('rider'),
+                'customer_name': order_data.get('customer_name'),
+                'restaurant': order_data.get('restaurant'),
+                'total_amount': order_data.get('total_amount')
+            }
+        }
+    
+    def observe(self, order_data, occurred_at=None, is_new=True):
+        """Comparar la orden con su instantánea y devolver los eventos de transición
+        
+        Con is_new=False (orden ya conocida, p. ej. tras un reinicio) una orden
+        sin instantánea se registra en silencio en lugar de emitir 'created'.
+        """
+        order_id = order_data.get('order_id')
+        if not order_id:
+            return []
+        
+        occurred_at = occurred_at or datetime.now()
+        status = str(order_data.get('status') or '') or None  # Texto del estado (también para OrderStatus)
+        rider = order_data.get('rider') or None
+        previous = self.snapshots.get(order_id)
+        self.snapshots[order_id] = (status, rider)
+        
+        if previous is None:
+            return [self._event(EVENT_CREATED, order_data, None, status, occurred_at)] if is_new else []
+        
+        previous_status, previous_rider = previous
+        events = []
+        if status != previous_status:
+            events.append(self._event(EVENT_STATUS_CHANGED, order_data, previous_status, status, occurred_at))
+        if rider and rider != previous_rider:
+            events.append(self._event(EVENT_RIDER_ASSIGNED, order_data, previous_rider, rider, occurred_at))
+        return events
+    
+    def remove(self, order_data, occurred_at=None):
+        """La orden salió de la página: 'completed' si iba en entrega, 'removed' en otro caso"""
+        order_id = order_data.get('order_id')
+        if not order_id:
+            return []
+        
+        previous = self.snapshots.pop(order_id)
+        last_status = previous[0] if previous else str(order_data.get('status') or '') or None
+        event_type = EVENT_COMPLETED if last_status in COMPLETION_STATUSES else EVENT_REMOVED
+        return [self._event(event_type, order_data, last_status, None, occurred_at or datetime.now())]
+    
+    def forget(self, order_id):
+        """Descartar la instantánea (p. ej. si el guardado falló) para volver a emitir sus eventos"""
+        self.snapshots.pop(order_id)
+    
+    def get_stats(self):
+        """Eventos emitidos por tipo y órdenes seguidas"""
+        return dict(self.stats, tracked_orders=len(self.snapshots))
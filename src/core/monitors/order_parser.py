@@ -4,16 +4,135 @@ Funcionalidades específicas para extraer y procesar órdenes
 """
 
 import re
+import hashlib
+from collections import defaultdict
 from datetime import datetime
-from bs4 import BeautifulSoup
 from .utils import OrderParser, BaseLogger
+from .html_backend import ParserBackend, FetchedPage
+from .known_orders import KnownOrderStore
+from .order_record import OrderRecord, OrderStatus
+from .raw_html import RawHtmlCapture
+from .patterns import PATTERNS
+
+# Inicio de la tabla de órdenes y del botón "Active orders" (para recortar la página sin parsearla)
+ORDERS_TABLE_PATTERN = re.compile(
+    r'<table\b[^>]*\bclass\s*=\s*["\'][^"\']*(?<![\w-])responsive-table(?![\w-])', re.I)
+ACTIVE_ORDERS_BUTTON_PATTERN = re.compile(
+    r'<div\b[^>]*\bclass\s*=\s*["\'][^"\']*(?<![\w-])btn(?![\w-])[^>]*>\s*'
+    r'<span\b[^>]*\bclass\s*=\s*["\'][^"\']*(?<![\w-])label(?![\w-])[^>]*>\s*Active orders', re.I)
+
+# Filas de órdenes y encabezado dentro del fragmento de la tabla (recorte sin parsear)
+ORDER_ROW_PATTERN = re.compile(
+    r'<tr\b[^>]*\bclass\s*=\s*["\'][^"\']*(?<![\w-])orders-list-item(?![\w-])[^>]*>.*?</tr>', re.I | re.S)
+THEAD_PATTERN = re.compile(r'<thead\b.*?</thead>', re.I | re.S)
+
+# Encabezado de columna (en minúsculas) -> campo de la orden
+COLUMN_FIELDS = {
+    '#': 'order_id',
+    'id': 'order_id',
+    'vendor': 'restaurant',
+    'restaurant': 'restaurant',
+    'restaurante': 'restaurant',
+    'customer': 'customer_name',
+    'cliente': 'customer_name',
+    'zone': 'delivery_address',
+    'zona': 'delivery_address',
+    'total': 'total_amount',
+    'created at': 'created_at',
+    'creado': 'created_at',
+    'ct': 'cooking_time',
+    'dt': 'delivery_time',
+    'rider': 'rider',
+    'repartidor': 'rider'
+}
+
+# Columnas cuyo valor es el texto del enlace de la celda
+LINK_FIELDS = ('restaurant', 'customer_name')
+
+# Clase CSS de la fila -> estado de la orden
+STATUS_CLASSES = (
+    ('processed', OrderStatus.PROCESSED),
+    ('inpreparation', OrderStatus.IN_PREPARATION),
+    ('readyforcollection', OrderStatus.READY_FOR_COLLECTION),
+    ('ontheway', OrderStatus.ON_THE_WAY),
+    ('atlocation', OrderStatus.AT_LOCATION)
+)
 
 class OrderExtractor:
     """Extractor de órdenes con funcionalidades específicas"""
     
-    def __init__(self, analytics=None):
+    def __init__(self, analytics=None, html_parser='lxml', scoped_parsing=True, use_column_map=True,
+                 raw_html_capture='new', raw_html_sample_rate=0.1):
         self.analytics = analytics
         self.parser = OrderParser()
+        self.html_backend = ParserBackend(html_parser)
+        self.scoped_parsing = scoped_parsing
+        self.use_column_map = use_column_map
+        self.parse_stats = defaultdict(int)
+        self.raw_html_capture = RawHtmlCapture(raw_html_capture, raw_html_sample_rate)
+        # Mapa de columnas de la página actual y firma del encabezado que lo generó
+        self.column_map = None
+        self._header_signature = None
+        self._cached_column_map = None
+    
+    def extract_orders_fragment(self, html_content):
+        """Recortar la tabla de órdenes y el botón Active orders del resto de la página
+        
+        Así el árbol solo contiene lo que usa find_order_containers y su coste
+        crece con el número de órdenes, no con menús, scripts y barras laterales.
+        Devuelve None si la página no tiene la estructura esperada.
+        """
+        table_match = ORDERS_TABLE_PATTERN.search(html_content)
+        if not table_match:
+            return None
+        
+        table_end = html_content.find('</table>', table_match.start())
+        if table_end == -1:
+            return None
+        
+        table_html = html_content[table_match.start():table_end + len('</table>')]
+        if table_html.lower().count('<table') != 1:
+            return None  # Tablas anidadas: el recorte no sería fiable
+        
+        fragments = []
+        button_match = ACTIVE_ORDERS_BUTTON_PATTERN.search(html_content)
+        if button_match:
+            button_end = html_content.find('</div>', button_match.end())
+            if button_end != -1:
+                fragments.append(html_content[button_match.start():button_end + len('</div>')])
+        
+        fragments.append(table_html)
+        return "".join(fragments)
+    
+    def parse_orders_page(self, page):
+        """Parsear la página de órdenes (FetchedPage) y devolver sus contenedores
+        
+        Si otra etapa ya parseó la página se reutiliza su árbol. Si no, primero
+        se parsea solo el fragmento de la tabla; el documento completo se parsea
+        únicamente si el fragmento no contiene órdenes.
+        """
+        if page.is_parsed:
+            self.parse_stats['reused'] += 1
+            return self.find_order_containers(page.soup())
+        
+        if self.scoped_parsing:
+            fragment = self.extract_orders_fragment(page.text)
+            if fragment:
+                soup = self._parse(fragment)
+                order_containers = self.find_order_containers(soup)
+                if order_containers:
+                    self.parse_stats['scoped'] += 1
+                    return order_containers
+        
+        self.parse_stats['full'] += 1
+        return self.find_order_containers(page.soup(self._parse))
+    
+    def _parse(self, html_content):
+        # Si lxml repara mal una página malformada y pierde las filas, reintentar con html.parser
+        return self.html_backend.parse_with_fallback(
+            html_content,
+            lambda soup: 'orders-list-item' not in html_content or soup.find('tr', class_='orders-list-item') is not None
+        )
     
     def find_order_containers(self, soup):
         """Encontrar contenedores de órdenes"""
@@ -30,8 +149,10 @@ class OrderExtractor:
                     BaseLogger.info(f"Botón Active orders encontrado con {active_count} órdenes")
         
         # Estrategia 2: Buscar tabla específica de órdenes
+        self.column_map = None
         orders_table = soup.find('table', class_='responsive-table')
         if orders_table:
+            self.resolve_column_map(orders_table)
             tbody = orders_table.find('tbody')
             if tbody:
                 # Buscar filas con clase 'orders-list-item'
@@ -41,6 +162,7 @@ class OrderExtractor:
         
         # Estrategia 3: Buscar cualquier fila de tabla con datos de órdenes
         if not containers:
+            self.column_map = None  # Filas de otras tablas: parseo por posición
             tables = soup.find_all('table')
             for table in tables:
                 tbody = table.find('tbody')
@@ -68,14 +190,113 @@ class OrderExtractor:
         
         return containers
     
-    def parse_order_container(self, container):
+    def resolve_column_map(self, table):
+        """Resolver qué columna contiene cada campo a partir del <thead>
+        
+        El mapa se reutiliza mientras la firma del encabezado no cambie, de modo
+        que un reordenamiento de columnas se detecta en el primer ciclo.
+        """
+        thead = table.find('thead') if self.use_column_map else None
+        if not thead:
+            return None
+        
+        signature = tuple(th.get_text(strip=True).lower() for th in thead.find_all('th'))
+        if signature == self._header_signature:
+            self.parse_stats['column_map_hits'] += 1
+            self.column_map = self._cached_column_map
+            return self.column_map
+        
+        column_map = {}
+        for index, header in enumerate(signature):
+            field = COLUMN_FIELDS.get(header)
+            if field and field not in column_map:
+                column_map[field] = index
+        
+        # Sin columna de ID no se puede identificar la orden: usar el parseo posicional
+        if 'order_id' not in column_map:
+            column_map = None
+            BaseLogger.warning(f"Encabezado de tabla desconocido, usando parseo por posición: {signature}")
+        else:
+            BaseLogger.info(f"Mapa de columnas resuelto: {column_map}")
+        
+        self.parse_stats['column_map_builds'] += 1
+        self._header_signature = signature
+        self._cached_column_map = column_map
+        self.column_map = column_map
+        return column_map
+    
+    def parse_row(self, container, raw_html=None):
+        """Parsear una fila por índice de columna si el encabezado es conocido, o por posición
+        
+        raw_html es el marcado original de la fila si ya se tiene; si no, la orden
+        guarda una referencia al contenedor, que solo se serializa si se captura.
+        """
+        if self.column_map:
+            return self.parse_order_row(container, self.column_map, raw_html)
+        return self.parse_order_container(container, raw_html)
+    
+    def _status_from_classes(self, container):
+        """Estado de la orden según las clases CSS de la fila"""
+        order_classes = container.get('class', [])
+        for css_class, status in STATUS_CLASSES:
+            if css_class in order_classes:
+                return status
+        return OrderStatus.UNKNOWN
+    
+    def parse_order_row(self, container, column_map, raw_html=None):
+        """Parsear una fila leyendo cada campo por índice de columna (sin selectores de respaldo)"""
+        try:
+            # Hijos directos sin find_all: evita construir un filtro por fila
+            cells = [child for child in container.children if child.name == 'td']
+            if len(cells) <= max(column_map.values()):
+                return self.parse_order_container(container, raw_html)
+            
+            order_data = OrderRecord(
+                timestamp=datetime.now(),
+                raw_html=raw_html if raw_html is not None else container,  # Referencia, sin serializar
+                type='terminal_order'
+            )
+            
+            for field, index in column_map.items():
+                cell = cells[index]
+                if field in LINK_FIELDS:
+                    link = cell.find('a')
+                    text = (link or cell).get_text(strip=True)
+                else:
+                    text = cell.get_text(strip=True)
+                
+                if not text:
+                    continue
+                
+                if field == 'order_id':
+                    order_id = PATTERNS.last('number', text)
+                    if order_id:
+                        order_data['order_id'] = order_id
+                else:
+                    order_data[field] = text
+            
+            order_data['status'] = self._status_from_classes(container)
+            order_data['priority'] = self.parser.determine_priority(order_data, self.analytics)
+            
+            if order_data.get('order_id'):
+                BaseLogger.success(f"✅ Orden parseada: ID={order_data.get('order_id')}, Cliente={order_data.get('customer_name', 'N/A')}, Total=${order_data.get('total_amount', 'N/A')}")
+                return order_data
+            
+            BaseLogger.warning("⚠️ No se pudo extraer ID de orden del contenedor")
+            return None
+            
+        except Exception as e:
+            BaseLogger.error(f"Error parseando fila: {e}")
+            return None
+    
+    def parse_order_container(self, container, raw_html=None):
         """Parsear contenedor de orden"""
         try:
-            order_data = {
-                'timestamp': datetime.now().isoformat(),
-                'raw_html': str(container)[:1000],  # Limitar tamaño
-                'type': 'terminal_order'
-            }
+            order_data = OrderRecord(
+                timestamp=datetime.now(),
+                raw_html=raw_html if raw_html is not None else container,  # Referencia, sin serializar
+                type='terminal_order'
+            )
             
             # Extraer datos de la fila de tabla según la estructura específica
             cells = container.find_all('td')
@@ -88,9 +309,9 @@ class OrderExtractor:
                         # Extraer el número de orden (está después del checkbox)
                         order_text = order_id_field.get_text(strip=True)
                         # Buscar el número al final del texto
-                        numbers = re.findall(r'\d+', order_text)
-                        if numbers:
-                            order_data['order_id'] = numbers[-1]  # Último número encontrado
+                        order_id = PATTERNS.last('number', order_text)
+                        if order_id:
+                            order_data['order_id'] = order_id  # Último número encontrado
                 
                 # Columna 2: Vendor (Restaurante)
                 if len(cells) > 1:
@@ -122,11 +343,8 @@ class OrderExtractor:
                     total_cell = cells[4]
                     price_span = total_cell.find('span', class_='price')
                     if price_span:
-                        price_text = price_span.get_text(strip=True)
-                        # Extraer solo el número
-                        numbers = re.findall(r'[\d,]+\.?\d*', price_text)
-                        if numbers:
-                            order_data['total_amount'] = numbers[0]
+                        # El registro convierte el texto del precio a Decimal
+                        order_data['total_amount'] = price_span.get_text(strip=True)
                 
                 # Columna 6: Created at (Hora de creación)
                 if len(cells) > 5:
@@ -157,19 +375,7 @@ class OrderExtractor:
                         order_data['rider'] = rider_text
                 
                 # Estado de la orden (basado en las clases CSS)
-                order_classes = container.get('class', [])
-                if 'processed' in order_classes:
-                    order_data['status'] = 'Procesado'
-                elif 'inpreparation' in order_classes:
-                    order_data['status'] = 'En Preparación'
-                elif 'readyforcollection' in order_classes:
-                    order_data['status'] = 'Listo para Recoger'
-                elif 'ontheway' in order_classes:
-                    order_data['status'] = 'En Camino'
-                elif 'atlocation' in order_classes:
-                    order_data['status'] = 'En Ubicación'
-                else:
-                    order_data['status'] = 'Desconocido'
+                order_data['status'] = self._status_from_classes(container)
             
             # Si no se encontraron datos en las celdas, usar métodos de fallback
             if not order_data.get('order_id'):
@@ -218,48 +424,83 @@ class OrderExtractor:
             BaseLogger.error(f"Error parseando contenedor: {e}")
             return None
     
-    def extract_new_orders(self, html_content, known_hashes):
+    def extract_new_orders(self, html_content, known_orders):
         """Extraer nuevas órdenes de la página HTML"""
+        new_orders, _ = self.extract_order_changes(html_content, known_orders)
+        return new_orders
+    
+    def extract_order_changes(self, html_content, known_orders):
+        """Extraer órdenes nuevas y órdenes cuyo contenido cambió
+        
+        html_content puede ser el HTML o la FetchedPage del cliente HTTP.
+        known_orders mapea la clave estable de cada orden a su huella de contenido,
+        de modo que distinguir una orden nueva de una modificada es O(1).
+        """
         try:
             BaseLogger.detection("Extrayendo órdenes de la página...")
             
-            soup = BeautifulSoup(html_content, 'html.parser')
+            page = html_content if isinstance(html_content, FetchedPage) else FetchedPage(html_content, backend=self.html_backend)
             
             new_orders = []
+            changed_orders = []
             current_time = datetime.now()
             
             # Buscar contenedores de órdenes
-            order_containers = self.find_order_containers(soup)
+            order_containers = self.parse_orders_page(page)
             
             BaseLogger.detection(f"Encontrados {len(order_containers)} contenedores de órdenes")
             
-            # Procesar cada contenedor
+            # Procesar cada contenedor (por índice de columna si el encabezado es conocido)
             for container in order_containers:
-                order_data = self.parse_order_container(container)
-                if order_data:
-                    order_hash = self.parser.generate_order_hash(order_data)
-                    
-                    if order_hash not in known_hashes:
-                        # Es una orden nueva
-                        order_data['order_hash'] = order_hash
-                        order_data['detected_at'] = current_time.isoformat()
-                        order_data['source'] = 'terminal_monitor'
-                        order_data['page'] = '/tasks'
-                        
-                        new_orders.append(order_data)
-                        known_hashes.add(order_hash)
-                        
-                        # Agregar a analytics si está disponible
-                        if self.analytics:
-                            self.analytics.add_order(order_data)
-                        
-                        BaseLogger.notification(f"Nueva orden detectada: {order_data.get('order_id', 'N/A')}")
-            
-            return new_orders
+                order_data = self.parse_row(container)
+                if not order_data:
+                    continue
+                
+                change = self.classify_order(order_data, known_orders, current_time)
+                if change == 'new':
+                    new_orders.append(order_data)
+                elif change == 'changed':
+                    changed_orders.append(order_data)
+            
+            return new_orders, changed_orders
             
         except Exception as e:
             BaseLogger.error(f"Error extrayendo órdenes: {e}")
-            return []
+            return [], []
+    
+    def classify_order(self, order_data, known_orders, current_time):
+        """Comparar una orden con las conocidas: 'new', 'changed' o None si no cambió"""
+        order_key = self.parser.generate_order_key(order_data)
+        content_hash = self.parser.generate_content_fingerprint(order_data)
+        previous_hash = known_orders.get(order_key)
+        
+        if previous_hash == content_hash:
+            return None
+        
+        order_data['order_hash'] = self.parser.generate_order_hash(order_data)
+        order_data['content_hash'] = content_hash
+        order_data['detected_at'] = current_time
+        order_data['source'] = 'terminal_monitor'
+        order_data['page'] = '/tasks'
+        known_orders[order_key] = content_hash
+        
+        # raw_html solo para las órdenes que indique la política de captura
+        if self.raw_html_capture.should_capture(previous_hash is None):
+            order_data['raw_html'] = order_data.get('raw_html')  # Serializar ya, sin retener el árbol
+        else:
+            order_data['raw_html'] = None
+        
+        if previous_hash is None:
+            # Agregar a analytics si está disponible
+            if self.analytics:
+                self.analytics.add_order(order_data)
+            
+            BaseLogger.notification(f"Nueva orden detectada: {order_data.get('order_id', 'N/A')}")
+            return 'new'
+        
+        # Orden conocida con cambios (estado, rider, tiempos)
+        BaseLogger.info(f"Orden actualizada: {order_data.get('order_id', 'N/A')} - {order_data.get('status', 'N/A')}")
+        return 'changed'
     
     def validate_order_data(self, order_data):
         """Validar datos de la orden"""
@@ -274,19 +515,13 @@ class OrderExtractor:
     def clean_order_data(self, order_data):
         """Limpiar y normalizar datos de la orden"""
         try:
-            # Limpiar strings
+            # Limpiar strings (raw_html se conserva tal cual, por referencia)
             for key, value in order_data.items():
-                if isinstance(value, str):
+                if isinstance(value, str) and not isinstance(value, OrderStatus) and key != 'raw_html':
                     order_data[key] = value.strip()
             
             # Normalizar estado
-            status = order_data.get('status', '').lower()
-            if 'preparación' in status or 'preparation' in status:
-                order_data['status'] = 'En Preparación'
-            elif 'activo' in status or 'active' in status:
-                order_data['status'] = 'Activo'
-            elif 'pendiente' in status or 'pending' in status:
-                order_data['status'] = 'Pendiente'
+            order_data['status'] = OrderStatus.from_text(order_data.get('status'))
             
             # Normalizar prioridad
             priority = order_data.get('priority', 'normal').lower()
@@ -297,4 +532,137 @@ class OrderExtractor:
             
         except Exception as e:
             BaseLogger.error(f"Error limpiando datos de orden: {e}")
-            return order_data 
\ No newline at end of file
+            return order_data 
+
+
+class IncrementalOrderExtractor:
+    """Extractor incremental: solo parsea las filas cuyo HTML cambió desde el último ciclo
+    
+    Cada fila `tr.orders-list-item` se recorta del HTML sin parsear y se identifica
+    por la huella de su marcado; las filas ya vistas reutilizan la orden parseada.
+    El resultado es un delta de órdenes añadidas, modificadas y retiradas.
+    """
+    
+    def __init__(self, extractor, max_cached_rows=1000):
+        self.extractor = extractor
+        self.row_cache = KnownOrderStore(max_size=max_cached_rows, ttl=None)  # huella de fila -> orden parseada
+        self.current_orders = {}  # clave estable -> última versión vista en la página
+        self.stats = defaultdict(int)
+    
+    def split_rows(self, html_content):
+        """Recortar el encabezado y las filas de órdenes sin parsear la página
+        
+        Devuelve (None, []) si no hay recorte fiable y ('<thead>...', []) si la
+        tabla está y no tiene filas: no quedan órdenes activas.
+        """
+        fragment = self.extractor.extract_orders_fragment(html_content)
+        if not fragment:
+            return None, []
+        
+        thead = THEAD_PATTERN.search(fragment)
+        thead = thead.group(0) if thead else ''
+        rows = ORDER_ROW_PATTERN.findall(fragment)
+        if not rows and '<tr' in fragment.replace(thead, '').lower():
+            return None, []  # Filas con otro formato: que decida el parseo completo
+        return thead, rows
+    
+    def parse_rows(self, thead, rows):
+        """Parsear en un solo árbol las filas nuevas; None si el recorte no fue fiable"""
+        markup = f'<table class="responsive-table">{thead}<tbody>{"".join(rows)}</tbody></table>'
+        page = FetchedPage(markup, backend=self.extractor.html_backend)
+        containers = self.extractor.parse_orders_page(page)
+        
+        # Una fila sin </tr> habría absorbido a la siguiente
+        if len(containers) != len(rows):
+            return None
+        
+        # Cada orden guarda su fila por referencia en lugar de volver a serializar el árbol
+        return [self.extractor.parse_row(container, row) for container, row in zip(containers, rows)]
+    
+    def extract_delta(self, html_content, known_orders):
+        """Delta de órdenes {'added', 'changed', 'removed'} respecto al ciclo anterior"""
+        try:
+            page = html_content if isinstance(html_content, FetchedPage) else FetchedPage(html_content, backend=self.extractor.html_backend)
+            thead, rows = self.split_rows(page.text)
+            if thead is None:
+                return self._full_delta(page, known_orders)
+            
+            fingerprints = [hashlib.sha1(row.encode('utf-8', 'replace')).hexdigest() for row in rows]
+            
+            # Parsear solo las filas cuya huella no está en caché
+            pending = {}
+            for fingerprint, row in zip(fingerprints, rows):
+                if fingerprint not in self.row_cache and fingerprint not in pending:
+                    pending[fingerprint] = row
+            
+            if pending:
+                parsed = self.parse_rows(thead, list(pending.values()))
+                if parsed is None:
+                    BaseLogger.warning("Recorte de filas no fiable, parseando la tabla completa")
+                    return self._full_delta(page, known_orders)
+                for fingerprint, order_data in zip(pending, parsed):
+                    self.row_cache[fingerprint] = order_data or False
+            
+            self.stats['rows_total'] += len(rows)
+            self.stats['rows_parsed'] += len(pending)
+            self.stats['rows_reused'] += len(rows) - len(pending)
+            
+            # Copia: la orden en caché no debe verse afectada por etapas posteriores
+            orders = [self.row_cache.get(fingerprint) for fingerprint in fingerprints]
+            delta = self._build_delta([order_data.copy() for order_data in orders if order_data], known_orders)
+            
+            BaseLogger.detection(f"Filas: {len(rows)} ({len(pending)} parseadas, {len(rows) - len(pending)} sin cambios) - "
+                                 f"nuevas={len(delta['added'])}, modificadas={len(delta['changed'])}, retiradas={len(delta['removed'])}")
+            return delta
+            
+        except Exception as e:
+            BaseLogger.error(f"Error en extracción incremental: {e}")
+            return {'added': [], 'changed': [], 'removed': []}
+    
+    def _build_delta(self, orders, known_orders):
+        """Clasificar las órdenes presentes en la página y retirar las que ya no están"""
+        delta = {'added': [], 'changed': [], 'removed': []}
+        current_orders = {}
+        current_time = datetime.now()
+        
+        for order_data in orders:
+            current_orders[self.extractor.parser.generate_order_key(order_data)] = order_data
+            
+            change = self.extractor.classify_order(order_data, known_orders, current_time)
+            if change == 'new':
+                delta['added'].append(order_data)
+            elif change == 'changed':
+                delta['changed'].append(order_data)
+        
+        delta['removed'] = [order_data for order_key, order_data in self.current_orders.items()
+                            if order_key not in current_orders]
+        self.current_orders = current_orders
+        
+        for order_data in delta['removed']:
+            BaseLogger.info(f"Orden retirada de la página: {order_data.get('order_id', 'N/A')}")
+        
+        return delta
+    
+    def _full_delta(self, page, known_orders):
+        """Respaldo: extracción completa de la página, que también reconstruye las órdenes presentes"""
+        self.stats['full_extractions'] += 1
+        containers = self.extractor.parse_orders_page(page)
+        if not containers and not page.contains('responsive-table'):
+            # Sin tabla de órdenes (p. ej. otra página): no se sabe qué órdenes siguen, no retirar ninguna
+            BaseLogger.warning("Página sin tabla de órdenes, se conservan las órdenes en seguimiento")
+            return {'added': [], 'changed': [], 'removed': []}
+        
+        orders = [self.extractor.parse_row(container) for container in containers]
+        return self._build_delta([order_data for order_data in orders if order_data], known_orders)
+    
+    def get_stats(self):
+        """Filas parseadas frente a filas reutilizadas de la caché"""
+        rows_total = self.stats['rows_total']
+        return {
+            'rows_total': rows_total,
+            'rows_parsed': self.stats['rows_parsed'],
+            'rows_reused': self.stats['rows_reused'],
+            'reuse_rate': self.stats['rows_reused'] / rows_total if rows_total else 0.0,
+            'full_extractions': self.stats['full_extractions'],
+            'tracked_orders': len(self.current_orders)
+        }
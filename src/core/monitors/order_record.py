@@ -0,0 +1,189 @@
+"""
+Registro de orden tipado para monitores
+Estructura compacta (__slots__) con montos Decimal, fechas datetime y estado enumerado
+"""
+
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from enum import Enum
+
+from .raw_html import RAW_HTML_LIMIT
+from .patterns import PATTERNS
+
+
+class OrderStatus(str, Enum):
+    """Estado de una orden (el valor es el texto que se muestra y se guarda en BD)"""
+    
+    PROCESSED = 'Procesado'
+    IN_PREPARATION = 'En Preparación'
+    READY_FOR_COLLECTION = 'Listo para Recoger'
+    ON_THE_WAY = 'En Camino'
+    AT_LOCATION = 'En Ubicación'
+    ACTIVE = 'Activo'
+    PENDING = 'Pendiente'
+    UNKNOWN = 'Desconocido'
+    
+    def __str__(self):
+        return self.value
+    
+    def __format__(self, format_spec):
+        return format(self.value, format_spec)
+    
+    @classmethod
+    def from_text(cls, text):
+        """Estado a partir del texto mostrado o de la clase CSS de la fila"""
+        if isinstance(text, cls):
+            return text
+        if not text:
+            return cls.UNKNOWN
+        
+        text = str(text).strip()
+        try:
+            return cls(text)
+        except ValueError:
+            pass
+        
+        lowered = text.lower()
+        for keywords, status in STATUS_KEYWORDS:
+            if any(keyword in lowered for keyword in keywords):
+                return status
+        return cls.UNKNOWN
+
+
+# Palabras clave (texto o clase CSS) -> estado, en orden de prioridad
+STATUS_KEYWORDS = (
+    (('inpreparation', 'preparación', 'preparation'), OrderStatus.IN_PREPARATION),
+    (('readyforcollection', 'listo'), OrderStatus.READY_FOR_COLLECTION),
+    (('ontheway', 'en camino'), OrderStatus.ON_THE_WAY),
+    (('atlocation', 'en ubicación'), OrderStatus.AT_LOCATION),
+    (('processed', 'procesado'), OrderStatus.PROCESSED),
+    (('activo', 'active'), OrderStatus.ACTIVE),
+    (('pendiente', 'pending'), OrderStatus.PENDING)
+)
+
+
+def parse_amount(value):
+    """Monto como Decimal ("$ 1,234.50" -> Decimal('1234.50')); None si no hay número"""
+    if value is None or isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    
+    amount = PATTERNS.search('amount', str(value))
+    if not amount:
+        return None
+    try:
+        return Decimal(amount.replace(',', ''))
+    except InvalidOperation:
+        return None
+
+
+def parse_datetime(value):
+    """Fecha como datetime (acepta datetime o texto ISO); None si no es válida"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+class OrderRecord:
+    """Orden extraída de la página con campos tipados
+    
+    Ocupa una fracción de un dict equivalente y expone la misma interfaz de
+    lectura (get, [], in, items), así que los consumidores existentes siguen
+    funcionando; los valores ya vienen convertidos y nadie vuelve a parsear
+    montos ni fechas. raw_html guarda por referencia el marcado de la fila o el
+    contenedor parseado; el contenedor solo se serializa si alguien lee raw_html.
+    """
+    
+    __slots__ = (
+        'order_id', 'order_number', 'task_id', 'customer_name', 'delivery_address',
+        'restaurant', 'total_amount', 'status', 'priority', 'rider', 'created_at',
+        'cooking_time', 'delivery_time', 'timestamp', 'detected_at', 'order_hash',
+        'content_hash', 'source', 'page', 'type', '_raw_html'
+    )
+    
+    # Campo -> conversión aplicada al asignarlo
+    CONVERTERS = {
+        'total_amount': parse_amount,
+        'status': OrderStatus.from_text,
+        'timestamp': parse_datetime,
+        'detected_at': parse_datetime
+    }
+    
+    FIELDS = tuple(name for name in __slots__ if name != '_raw_html') + ('raw_html',)
+    
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, None)
+        for name, value in fields.items():
+            self[name] = value
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Crear un registro a partir de un dict (p. ej. releído de JSON), ignorando campos desconocidos"""
+        return cls(**{name: value for name, value in data.items() if name in cls.FIELDS})
+    
+    @property
+    def raw_html(self):
+        raw = self._raw_html
+        if raw is None:
+            return None
+        if not isinstance(raw, str):
+            # Serialización diferida del contenedor (una sola vez)
+            raw = self._raw_html = str(raw)[:RAW_HTML_LIMIT]
+        return raw[:RAW_HTML_LIMIT]
+    
+    @raw_html.setter
+    def raw_html(self, value):
+        self._raw_html = value
+    
+    def __setitem__(self, name, value):
+        if name not in self.FIELDS:
+            raise KeyError(name)
+        converter = self.CONVERTERS.get(name)
+        setattr(self, name, converter(value) if converter else value)
+    
+    def __getitem__(self, name):
+        value = getattr(self, name, None) if name in self.FIELDS else None
+        if value is None:
+            raise KeyError(name)
+        return value
+    
+    def get(self, name, default=None):
+        value = getattr(self, name, None) if name in self.FIELDS else None
+        return default if value is None else value
+    
+    def __contains__(self, name):
+        return self.get(name) is not None
+    
+    def keys(self):
+        return [name for name in self.FIELDS if getattr(self, name) is not None]
+    
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.FIELDS if getattr(self, name) is not None]
+    
+    def copy(self):
+        """Copia superficial (raw_html sigue compartiendo la misma referencia)"""
+        clone = OrderRecord.__new__(OrderRecord)
+        for name in self.__slots__:
+            object.__setattr__(clone, name, getattr(self, name))
+        return clone
+    
+    def to_dict(self):
+        """Dict serializable a JSON (Decimal y datetime como texto, estado por su valor)"""
+        data = {}
+        for name, value in self.items():
+            if isinstance(value, OrderStatus):
+                value = value.value
+            elif isinstance(value, Decimal):
+                value = str(value)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            data[name] = value
+        return data
+    
+    def __repr__(self):
+        return f"OrderRecord(order_id={self.order_id!r}, status={self.status!s}, total_amount={self.total_amount!s})"
@@ -0,0 +1,77 @@
+"""
+Registro de expresiones regulares para monitores
+Patrones compilados una sola vez al importar y compartidos por todos los monitores
+"""
+
+import re
+
+# Patrones por campo en orden de prioridad; cada uno captura el valor en su único grupo
+FIELD_PATTERNS = {
+    'order_id': (
+        r'Task[:\s]*([A-Z0-9-]+)',
+        r'Tarea[:\s]*([A-Z0-9-]+)',
+        r'Order[:\s]*([A-Z0-9-]+)',
+        r'Pedido[:\s]*([A-Z0-9-]+)',
+        r'#([A-Z0-9-]+)',
+        r'([A-Z]{2,3}-\d{4,})',
+        r'ID[:\s]*([A-Z0-9-]+)',
+        r'Active[:\s]*([A-Z0-9-]+)',
+        r'ORD-(\d+)',
+        r'TASK-(\d+)'
+    ),
+    'amount': (r'([\d,]+\.?\d*)',),
+    'number': (r'(\d+)',),
+    'order_class': (r'(order|task|active)',)  # Clases CSS de filas de órdenes
+}
+
+# Campos cuyos patrones no distinguen mayúsculas
+IGNORECASE_FIELDS = ('order_id', 'order_class')
+
+
+class PatternRegistry:
+    """Patrones compilados una vez por campo: cada alternativa por separado y todas en una alternancia
+    
+    search() prueba las alternativas ya compiladas en orden de prioridad: con el
+    re de CPython una alternancia de diez ramas no recorre el texto más rápido
+    que los patrones por separado. La alternancia se usa para findall() y como
+    patrón único para BeautifulSoup.
+    """
+    
+    def __init__(self, field_patterns):
+        self.field_patterns = field_patterns
+        self.merged = {}
+        self.compiled = {}
+        for field, patterns in field_patterns.items():
+            flags = re.IGNORECASE if field in IGNORECASE_FIELDS else 0
+            self.merged[field] = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), flags)
+            self.compiled[field] = tuple(re.compile(pattern, flags) for pattern in patterns)
+    
+    def pattern(self, field):
+        """Alternancia compilada del campo (p. ej. para find_all de BeautifulSoup)"""
+        return self.merged[field]
+    
+    def search(self, field, text):
+        """Valor del campo según la alternativa de mayor prioridad que aparece en el texto"""
+        if not text:
+            return None
+        
+        for pattern in self.compiled[field]:
+            match = pattern.search(text)
+            if match:
+                return match.group(1)
+        return None
+    
+    def findall(self, field, text):
+        """Todos los valores del campo en el texto, en orden de aparición"""
+        if not text:
+            return []
+        return [match.group(match.lastindex) for match in self.merged[field].finditer(text)]
+    
+    def last(self, field, text):
+        """Último valor del campo en el texto (p. ej. el número tras el checkbox del ID)"""
+        values = self.findall(field, text)
+        return values[-1] if values else None
+
+
+PATTERNS = PatternRegistry(FIELD_PATTERNS)
+
@@ -0,0 +1,57 @@
+"""
+Captura de raw_html para monitores
+Política de captura (desactivada, solo órdenes nuevas o muestreo) y compresión zlib para BD
+"""
+
+import random
+import zlib
+from collections import defaultdict
+
+# Modos de captura: "off" (nunca), "new" (solo órdenes nuevas), "sampled" (fracción de
+# las órdenes nuevas o modificadas) y "all" (toda orden que se guarda)
+RAW_HTML_CAPTURE_MODES = ('off', 'new', 'sampled', 'all')
+
+# Límite de caracteres guardados por fila
+RAW_HTML_LIMIT = 1000
+
+
+class RawHtmlCapture:
+    """Decide qué órdenes guardan su HTML; el HTML solo se serializa si la respuesta es sí"""
+    
+    def __init__(self, mode='new', sample_rate=0.1):
+        if mode not in RAW_HTML_CAPTURE_MODES:
+            raise ValueError(f"Modo de captura de raw_html desconocido: {mode}")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.stats = defaultdict(int)
+    
+    def should_capture(self, is_new):
+        """¿Guardar el HTML de esta orden? (is_new=False para órdenes modificadas)"""
+        if self.mode == 'all':
+            capture = True
+        elif self.mode == 'new':
+            capture = is_new
+        elif self.mode == 'sampled':
+            capture = random.random() < self.sample_rate
+        else:
+            capture = False
+        
+        self.stats['captured' if capture else 'skipped'] += 1
+        return capture
+    
+    def get_stats(self):
+        return {'mode': self.mode, 'captured': self.stats['captured'], 'skipped': self.stats['skipped']}
+
+
+def compress_raw_html(raw_html):
+    """HTML comprimido con zlib para una columna bytea (None si no hay HTML)"""
+    if not raw_html:
+        return None
+    return zlib.compress(raw_html.encode('utf-8'), 6)
+
+
+def decompress_raw_html(data):
+    """Recuperar el HTML de una columna bytea comprimida"""
+    if data is None:
+        return None
+    return zlib.decompress(bytes(data)).decode('utf-8')
@@ -0,0 +1,93 @@
+"""
+Planificador adaptativo de sondeos para monitores
+Acorta el intervalo cuando llegan órdenes o transiciones y lo alarga (con jitter) en los periodos sin actividad
+"""
+
+import random
+from collections import defaultdict
+from datetime import datetime
+
+
+def parse_hour_profiles(hour_profiles):
+    """{"12-15": [3, 15], "3": [60, 120]} -> límites (mínimo, máximo) por hora del día"""
+    bounds = {}
+    for hours, (min_interval, max_interval) in (hour_profiles or {}).items():
+        start, _, end = str(hours).partition('-')
+        start = int(start)
+        end = int(end) if end else start
+        hour = start
+        while True:
+            bounds[hour % 24] = (min_interval, max_interval)
+            if hour % 24 == end % 24:
+                break
+            hour += 1
+    return bounds
+
+
+class AdaptivePollScheduler:
+    """Intervalo entre sondeos según la actividad observada
+    
+    Cada sondeo con órdenes nuevas o cambios multiplica el intervalo por
+    tighten_factor y cada sondeo sin actividad lo multiplica por backoff_factor,
+    siempre dentro de los límites de la hora. Los límites salen del perfil
+    horario configurado o, si la hora no tiene perfil, del historial de
+    OrderAnalytics.time_stats: en horas de mucha actividad el intervalo no pasa
+    del base para no llegar tarde al primer pedido del pico.
+    """
+    
+    def __init__(self, base_interval, min_interval=None, max_interval=None, tighten_factor=0.5,
+                 backoff_factor=1.5, jitter=0.2, hour_profiles=None, time_stats=None):
+        self.base_interval = base_interval
+        self.min_interval = min_interval or base_interval
+        self.max_interval = max_interval or base_interval
+        self.tighten_factor = tighten_factor
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.hour_bounds = parse_hour_profiles(hour_profiles)
+        self.time_stats = time_stats  # Órdenes por hora del día (OrderAnalytics.time_stats)
+        self.interval = base_interval
+        self.stats = defaultdict(float)
+    
+    def is_peak_hour(self, hour):
+        """¿La hora tiene más órdenes que la media del historial?"""
+        if not self.time_stats:
+            return False
+        average = sum(self.time_stats.values()) / 24
+        return self.time_stats.get(hour, 0) > average
+    
+    def bounds(self, hour=None):
+        """Intervalo mínimo y máximo para la hora (la actual por defecto)"""
+        hour = datetime.now().hour if hour is None else hour
+        if hour in self.hour_bounds:
+            return self.hour_bounds[hour]
+        if self.is_peak_hour(hour):
+            return self.min_interval, min(self.max_interval, self.base_interval)
+        return self.min_interval, self.max_interval
+    
+    def record_poll(self, activity, hour=None):
+        """Registrar el resultado de un sondeo (activity = órdenes nuevas + transiciones)"""
+        min_interval, max_interval = self.bounds(hour)
+        if activity:
+            self.interval *= self.tighten_factor
+            self.stats['active_polls'] += 1
+        else:
+            self.interval *= self.backoff_factor
+        self.interval = max(min_interval, min(max_interval, self.interval))
+        self.stats['polls'] += 1
+        return self.interval
+    
+    def next_interval(self):
+        """Segundos hasta el siguiente sondeo (con jitter para no sondear a ritmo fijo)"""
+        interval = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.stats['total_wait'] += interval
+        self.stats['waits'] += 1
+        return interval
+    
+    def get_stats(self):
+        """Intervalo actual y medio, sondeos y sondeos con actividad"""
+        return {
+            'current_interval': self.interval,
+            'avg_interval': self.stats['total_wait'] / self.stats['waits'] if self.stats['waits'] else self.interval,
+            'polls': int(self.stats['polls']),
+            'active_polls': int(self.stats['active_polls'])
+        }
@@ -0,0 +1,134 @@
+"""
+Sesión HTTP persistente para monitores
+Cookies de la sesión cifradas en disco (Fernet) para no repetir el login en cada arranque
+"""
+
+import base64
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from .utils import BaseLogger
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:  # Sin cryptography la sesión no se guarda (nunca en claro)
+    Fernet = None
+
+# Iteraciones de PBKDF2 al derivar la clave de la contraseña (solo una vez por cliente)
+KEY_DERIVATION_ITERATIONS = 200000
+
+
+def derive_key(username, password):
+    """Clave Fernet derivada de las credenciales (si no hay SESSION_STORE_KEY en el entorno)"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=f"smartagent-session-store:{username}".encode('utf-8'),
+        iterations=KEY_DERIVATION_ITERATIONS
+    )
+    return base64.urlsafe_b64encode(kdf.derive(password.encode('utf-8')))
+
+
+class SessionStore:
+    """Cookie jar cifrado en disco, asociado a una cuenta
+    
+    La clave sale de SESSION_STORE_KEY (clave Fernet) o, si no existe, se deriva
+    de la contraseña de la cuenta: quien no tenga el .env no puede leer las
+    cookies. Un archivo ilegible (otra clave, otra contraseña) se ignora y el
+    cliente vuelve a iniciar sesión.
+    """
+    
+    def __init__(self, path, username, password, max_age=86400):
+        self.path = Path(path)
+        self.username = username
+        self.max_age = max_age
+        self.fernet = None
+        
+        if Fernet is None:
+            BaseLogger.warning("cryptography no está instalado: la sesión HTTP no se guardará en disco")
+            return
+        
+        try:
+            key = os.getenv("SESSION_STORE_KEY") or derive_key(username, password or '')
+            self.fernet = Fernet(key)
+        except Exception as e:
+            logging.error(f"❌ Clave de sesión inválida: {e}")
+            BaseLogger.error(f"Clave de sesión inválida: {e}")
+    
+    @property
+    def enabled(self):
+        return self.fernet is not None
+    
+    def load_into(self, session):
+        """Cargar las cookies guardadas en la sesión; False si no hay sesión utilizable"""
+        if not self.enabled or not self.path.exists():
+            return False
+        
+        try:
+            data = json.loads(self.fernet.decrypt(self.path.read_bytes(), ttl=self.max_age))
+            if data.get('username') != self.username:
+                return False
+            
+            for cookie in data['cookies']:
+                session.cookies.set(
+                    cookie['name'],
+                    cookie['value'],
+                    domain=cookie['domain'],
+                    path=cookie['path'],
+                    expires=cookie['expires'],
+                    secure=cookie['secure']
+                )
+            BaseLogger.info(f"Sesión guardada cargada ({len(data['cookies'])} cookies)")
+            return bool(data['cookies'])
+        
+        except InvalidToken:
+            BaseLogger.warning("Sesión guardada ilegible o vencida, se iniciará sesión de nuevo")
+            return False
+        except Exception as e:
+            logging.error(f"❌ Error cargando sesión guardada: {e}")
+            return False
+    
+    def save(self, session):
+        """Guardar cifradas las cookies vigentes de la sesión"""
+        if not self.enabled:
+            return False
+        
+        try:
+            now = time.time()
+            cookies = [
+                {
+                    'name': cookie.name,
+                    'value': cookie.value,
+                    'domain': cookie.domain,
+                    'path': cookie.path,
+                    'expires': cookie.expires,
+                    'secure': cookie.secure
+                }
+                for cookie in session.cookies
+                if not cookie.expires or cookie.expires > now
+            ]
+            token = self.fernet.encrypt(json.dumps({'username': self.username, 'cookies': cookies}).encode('utf-8'))
+            
+            # Escritura atómica y solo legible por el usuario
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.path.with_suffix(self.path.suffix + '.tmp')
+            temporary.write_bytes(token)
+            os.chmod(temporary, 0o600)
+            os.replace(temporary, self.path)
+            return True
+        
+        except Exception as e:
+            logging.error(f"❌ Error guardando sesión: {e}")
+            return False
+    
+    def clear(self):
+        """Borrar la sesión guardada (p. ej. si el servidor la rechazó)"""
+        try:
+            self.path.unlink(missing_ok=True)
+        except Exception as e:
+            logging.error(f"❌ Error borrando sesión guardada: {e}")
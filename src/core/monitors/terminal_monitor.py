@@ -11,7 +11,6 @@ import logging
 from datetime import datetime
 import threading
 from collections import defaultdict
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
 # Agregar el directorio src al path
@@ -23,7 +22,13 @@ sys.path.insert(0, str(src_path))
 from .config import TERMINAL_MONITOR_CONFIG, DATABASE_URL
 from .utils import BaseLogger, OrderAnalytics, NotificationManager, DatabaseManager
 from .http_client import HTTPClient
-from .order_parser import OrderExtractor
+from .order_parser import OrderExtractor, IncrementalOrderExtractor
+from .known_orders import KnownOrderStore
+from .lifecycle import OrderLifecycleTracker
+from .dedup_state import DedupStateStore
+from .write_behind import WriteBehindQueue
+from .scheduler import AdaptivePollScheduler
+from database.connection_pool import get_pool
 
 # Configuración de logging para consola
 os.makedirs("logs", exist_ok=True)
@@ -42,11 +47,20 @@ class TerminalOrderMonitor:
     def __init__(self):
         self.http_client = None
         self.db_manager = None
+        self.db_writer = None
         self.order_extractor = None
+        self.incremental_extractor = None
+        self.lifecycle = None
         self.analytics = OrderAnalytics()
+        self.poll_scheduler = None
+        self.last_cycle_activity = 0  # Órdenes nuevas/modificadas/retiradas del último sondeo
         self.is_running = False
         self.last_check_time = None
-        self.order_hashes = set()
+        self.dedup_state = None
+        self.known_orders = KnownOrderStore(
+            max_size=TERMINAL_MONITOR_CONFIG["max_known_orders"],
+            ttl=TERMINAL_MONITOR_CONFIG["order_timeout"]
+        )
         self.order_stats = defaultdict(int)
         self.performance_start_time = None
         self.last_refresh_time = None
@@ -55,15 +69,30 @@ class TerminalOrderMonitor:
         
         self.setup_database()
         self.setup_components()
+        self.setup_dedup_state()
         
     def setup_database(self):
         """Configurar conexión a la base de datos"""
         try:
-            db_conn = psycopg2.connect(DATABASE_URL)
+            db_conn = get_pool(DATABASE_URL).connect()
             db_cursor = db_conn.cursor(cursor_factory=RealDictCursor)
             
             self.db_manager = DatabaseManager(db_conn, db_cursor)
             self.db_manager.create_orders_table("terminal_orders")
+            if TERMINAL_MONITOR_CONFIG["lifecycle_events"]:
+                self.db_manager.create_events_table("terminal_order_events")
+            
+            # Escritura diferida: la latencia de la BD no retrasa la detección
+            if TERMINAL_MONITOR_CONFIG["enable_write_behind"]:
+                self.db_writer = WriteBehindQueue(
+                    self.db_manager,
+                    "terminal_orders",
+                    self.analytics,
+                    batch_size=TERMINAL_MONITOR_CONFIG["write_behind_batch_size"],
+                    flush_interval=TERMINAL_MONITOR_CONFIG["write_behind_flush_interval"],
+                    max_queue_size=TERMINAL_MONITOR_CONFIG["write_behind_max_queue"],
+                    spill_file=project_root / TERMINAL_MONITOR_CONFIG["write_behind_spill_file"]
+                )
             
             BaseLogger.success("Conexión a base de datos establecida")
             
@@ -71,6 +100,25 @@ class TerminalOrderMonitor:
             logging.error(f"❌ Error conectando a la base de datos: {e}")
             BaseLogger.error(f"Error conectando a la base de datos: {e}")
     
+    def setup_dedup_state(self):
+        """Cargar el estado de deduplicación persistente para no repetir órdenes tras un reinicio"""
+        state_file = TERMINAL_MONITOR_CONFIG.get("dedup_state_file")
+        if not state_file:
+            return
+        
+        try:
+            self.dedup_state = DedupStateStore(
+                project_root / state_file,
+                retention=TERMINAL_MONITOR_CONFIG["dedup_state_retention"]
+            )
+            loaded = self.dedup_state.load_into(self.known_orders)
+            self.known_orders.persistence = self.dedup_state
+            BaseLogger.success(f"Estado de deduplicación restaurado ({loaded} órdenes)")
+            
+        except Exception as e:
+            logging.error(f"❌ Error cargando estado de deduplicación: {e}")
+            BaseLogger.error(f"Error cargando estado de deduplicación: {e}")
+    
     def setup_components(self):
         """Configurar componentes del monitor"""
         try:
@@ -78,7 +126,31 @@ class TerminalOrderMonitor:
             self.http_client = HTTPClient()
             
             # Configurar extractor de órdenes
-            self.order_extractor = OrderExtractor(self.analytics)
+            self.order_extractor = OrderExtractor(
+                self.analytics,
+                html_parser=TERMINAL_MONITOR_CONFIG["html_parser"],
+                scoped_parsing=TERMINAL_MONITOR_CONFIG["scoped_parsing"],
+                raw_html_capture=TERMINAL_MONITOR_CONFIG["raw_html_capture"],
+                raw_html_sample_rate=TERMINAL_MONITOR_CONFIG["raw_html_sample_rate"]
+            )
+            if TERMINAL_MONITOR_CONFIG["incremental_extraction"]:
+                self.incremental_extractor = IncrementalOrderExtractor(
+                    self.order_extractor,
+                    max_cached_rows=TERMINAL_MONITOR_CONFIG["max_known_orders"] * 2
+                )
+            if TERMINAL_MONITOR_CONFIG["lifecycle_events"]:
+                self.lifecycle = OrderLifecycleTracker(max_orders=TERMINAL_MONITOR_CONFIG["max_known_orders"] * 2)
+            if TERMINAL_MONITOR_CONFIG["adaptive_polling"]:
+                self.poll_scheduler = AdaptivePollScheduler(
+                    TERMINAL_MONITOR_CONFIG["check_interval"],
+                    min_interval=TERMINAL_MONITOR_CONFIG["poll_min_interval"],
+                    max_interval=TERMINAL_MONITOR_CONFIG["poll_max_interval"],
+                    tighten_factor=TERMINAL_MONITOR_CONFIG["poll_tighten_factor"],
+                    backoff_factor=TERMINAL_MONITOR_CONFIG["poll_backoff_factor"],
+                    jitter=TERMINAL_MONITOR_CONFIG["poll_jitter"],
+                    hour_profiles=TERMINAL_MONITOR_CONFIG["poll_hour_profiles"],
+                    time_stats=self.analytics.time_stats
+                )
             
             BaseLogger.success("Componentes del monitor configurados")
             
@@ -90,50 +162,77 @@ class TerminalOrderMonitor:
         """Extraer nuevas órdenes de la página HTML"""
         try:
             start_time = time.time()
+            self.last_cycle_activity = 0
             
             # Auto-refresh de sesión si está habilitado
             if TERMINAL_MONITOR_CONFIG["enable_auto_refresh"]:
                 current_time = time.time()
                 if not self.last_refresh_time or (current_time - self.last_refresh_time) > TERMINAL_MONITOR_CONFIG["refresh_interval"]:
-                    BaseLogger.info("Refrescando sesión automáticamente...")
+                    BaseLogger.info("Comprobando sesión...")
                     self.http_client.refresh_session()
                     self.last_refresh_time = current_time
             
             # Obtener página de órdenes
-            html_content = self.http_client.get_orders_page()
-            if not html_content:
+            page = self.http_client.get_orders_page()
+            if not page:
                 BaseLogger.warning("No se pudo obtener contenido de la página")
                 return []
             
-            # Extraer nuevas órdenes
-            new_orders = self.order_extractor.extract_new_orders(html_content, self.order_hashes)
+            # Página sin cambios desde el último ciclo: no hace falta re-parsear
+            if self.http_client.page_unchanged:
+                self.order_stats['unchanged_pages'] += 1
+                self.known_orders.touch_all()  # Las órdenes siguen en la página
+                print(f"⏰ {datetime.now().strftime('%H:%M:%S')} - Sin cambios en la página")
+                return []
             
-            # Procesar órdenes
-            for order_data in new_orders:
+            # Extraer órdenes nuevas y órdenes con cambios
+            removed_orders = []
+            if self.incremental_extractor:
+                delta = self.incremental_extractor.extract_delta(page, self.known_orders)
+                new_orders, changed_orders, removed_orders = delta['added'], delta['changed'], delta['removed']
+                self.order_stats['removed_orders'] += len(removed_orders)
+            else:
+                new_orders, changed_orders = self.order_extractor.extract_order_changes(page, self.known_orders)
+            
+            # Procesar órdenes (las que no cambiaron no se vuelven a escribir)
+            orders_to_save = []
+            events = []
+            check_time = datetime.now()
+            pending = [(True, order) for order in new_orders] + [(False, order) for order in changed_orders]
+            for is_new, order_data in pending:
                 # Limpiar y validar datos
                 order_data = self.order_extractor.clean_order_data(order_data)
                 if self.order_extractor.validate_order_data(order_data):
-                    self.order_stats['new_orders'] += 1
-                    
-                    # Guardar en base de datos
-                    if self.db_manager:
-                        performance_metrics = {
-                            'processing_time': time.time() - start_time,
-                            'error_count': self.error_count,
-                            'success_count': self.success_count
-                        }
-                        self.db_manager.save_order(
-                            order_data, 
-                            "terminal_orders", 
-                            self.analytics, 
-                            performance_metrics
-                        )
-                        self.success_count += 1
+                    self.order_stats['new_orders' if is_new else 'changed_orders'] += 1
+                    orders_to_save.append(order_data)
+                    if self.lifecycle:
+                        events.extend(self.lifecycle.observe(order_data, check_time, is_new))
+            
+            if self.lifecycle:
+                for order_data in removed_orders:
+                    events.extend(self.lifecycle.remove(order_data, check_time))
+            self.last_cycle_activity = len(orders_to_save) + len(removed_orders)
             
-            # Limpiar hashes antiguos si excede el límite
-            if len(self.order_hashes) > TERMINAL_MONITOR_CONFIG["max_known_orders"]:
-                self.order_hashes.clear()
-                BaseLogger.info("Limpieza de hashes antiguos completada")
+            # Guardar todo el ciclo (órdenes y eventos) en un solo lote
+            if self.db_manager and (orders_to_save or events):
+                performance_metrics = {
+                    'processing_time': time.time() - start_time,
+                    'error_count': self.error_count,
+                    'success_count': self.success_count,
+                    'poll_interval': self.current_poll_interval(),
+                    'circuit_breaker': self.http_client.circuit_breaker.state
+                }
+                if self.db_writer:
+                    self.db_writer.submit(orders_to_save, performance_metrics, events)
+                    self.success_count += len(orders_to_save)
+                elif self.db_manager.save_orders(
+                    orders_to_save, 
+                    "terminal_orders", 
+                    self.analytics, 
+                    performance_metrics,
+                    events=events
+                ):
+                    self.success_count += len(orders_to_save)
             
             # Mostrar tabla de nuevas órdenes
             if new_orders:
@@ -163,6 +262,20 @@ class TerminalOrderMonitor:
             self.error_count += 1
             return []
     
+    def current_poll_interval(self):
+        """Intervalo de sondeo vigente en segundos (fijo si el sondeo no es adaptativo)"""
+        if self.poll_scheduler:
+            return round(self.poll_scheduler.interval, 1)
+        return TERMINAL_MONITOR_CONFIG["check_interval"]
+    
+    def wait_next_check(self):
+        """Esperar hasta la siguiente verificación según la actividad del último sondeo"""
+        if self.poll_scheduler:
+            self.poll_scheduler.record_poll(self.last_cycle_activity)
+            time.sleep(self.poll_scheduler.next_interval())
+        else:
+            time.sleep(TERMINAL_MONITOR_CONFIG["check_interval"])
+    
     def display_terminal_stats(self):
         """Mostrar estadísticas para terminal"""
         analytics_report = self.analytics.get_analytics_report()
@@ -171,11 +284,71 @@ class TerminalOrderMonitor:
         print("="*60)
         print(f"   Verificaciones totales: {self.order_stats['total_checks']}")
         print(f"   Nuevas órdenes detectadas: {self.order_stats['new_orders']}")
-        print(f"   Órdenes en memoria: {len(self.order_hashes)}")
+        print(f"   Órdenes actualizadas: {self.order_stats['changed_orders']}")
+        print(f"   Órdenes retiradas: {self.order_stats['removed_orders']}")
+        if self.lifecycle:
+            lifecycle_stats = self.lifecycle.get_stats()
+            print(f"   Eventos de ciclo de vida: creadas={lifecycle_stats.get('created', 0)}, "
+                  f"cambios de estado={lifecycle_stats.get('status_changed', 0)}, "
+                  f"riders asignados={lifecycle_stats.get('rider_assigned', 0)}, "
+                  f"completadas={lifecycle_stats.get('completed', 0)}, retiradas={lifecycle_stats.get('removed', 0)}")
+        if self.poll_scheduler:
+            poll_stats = self.poll_scheduler.get_stats()
+            print(f"   Intervalo de sondeo: {poll_stats['current_interval']:.1f}s actual, {poll_stats['avg_interval']:.1f}s medio "
+                  f"({poll_stats['active_polls']}/{poll_stats['polls']} sondeos con actividad)")
+        store_stats = self.known_orders.get_stats()
+        print(f"   Órdenes en memoria: {store_stats['size']}/{store_stats['max_size']} "
+              f"(aciertos={store_stats['hits']}, fallos={store_stats['misses']}, "
+              f"expulsadas={store_stats['evictions']}, expiradas={store_stats['expirations']})")
+        if self.http_client:
+            poll_paths = self.http_client.poll_path_stats
+            print(f"   Rutas de sondeo: directa={poll_paths['direct']}, fallback={poll_paths['fallback']}, descubrimiento={poll_paths['discovery']}")
+            breaker_stats = self.http_client.circuit_breaker.get_stats()
+            transport_stats = self.http_client.transport.get_stats() if self.http_client.transport else {}
+            print(f"   Transporte HTTP: {transport_stats.get('requests', 0)} peticiones, {transport_stats.get('retries', 0)} reintentos, "
+                  f"{transport_stats.get('timeouts', 0)} timeouts; circuit breaker {breaker_stats['state']} "
+                  f"(abierto {breaker_stats['opened']} veces, {breaker_stats['rejected']} rechazadas, "
+                  f"{poll_paths['skipped']} sondeos omitidos)")
+            session_stats = self.http_client.session_stats
+            print(f"   Sesión HTTP: {session_stats['restored']} reutilizadas, {session_stats['logins']} logins, "
+                  f"{session_stats['probes']} comprobaciones, {session_stats['auth_failures']} expiradas")
+            conditional = self.http_client.conditional_stats
+            print(f"   Páginas sin cambios: 304={conditional['not_modified']}, hash={conditional['body_hash_hits']}, con cambios={conditional['changed']}")
+        if self.order_extractor:
+            parser_stats = self.order_extractor.html_backend.get_stats()
+            print(f"   Parser HTML: {parser_stats['backend']} ({parser_stats['parses']} parseos, "
+                  f"media {parser_stats['avg_parse_time'] * 1000:.1f}ms, respaldos={parser_stats['fallbacks']}, "
+                  f"solo tabla={self.order_extractor.parse_stats['scoped']}, completos={self.order_extractor.parse_stats['full']}, "
+                  f"reutilizados={self.order_extractor.parse_stats['reused']})")
+            capture_stats = self.order_extractor.raw_html_capture.get_stats()
+            print(f"   raw_html ({capture_stats['mode']}): {capture_stats['captured']} capturados, "
+                  f"{capture_stats['skipped']} omitidos")
+        if self.incremental_extractor:
+            row_stats = self.incremental_extractor.get_stats()
+            print(f"   Filas: {row_stats['rows_parsed']} parseadas, {row_stats['rows_reused']} reutilizadas "
+                  f"({row_stats['reuse_rate'] * 100:.0f}% sin re-parsear), extracciones completas={row_stats['full_extractions']}")
         print(f"   Última verificación: {self.last_check_time.strftime('%H:%M:%S') if self.last_check_time else 'N/A'}")
         print(f"   Tasa de éxito: {(self.success_count / max(self.success_count + self.error_count, 1)) * 100:.1f}%")
         print(f"   Errores totales: {self.error_count}")
         
+        if self.db_writer:
+            writer_metrics = self.db_writer.get_metrics()
+            print(f"   Cola de escritura: {writer_metrics['queue_depth']} pendientes, "
+                  f"{writer_metrics['flushed_orders']} guardadas en {writer_metrics['flushes']} lotes "
+                  f"(latencia media {writer_metrics['avg_flush_latency'] * 1000:.0f}ms, "
+                  f"máx {writer_metrics['max_flush_latency'] * 1000:.0f}ms)")
+            if writer_metrics['spilled_orders'] or writer_metrics['failed_flushes']:
+                print(f"   Respaldo en disco: {writer_metrics['spilled_orders']} órdenes, "
+                      f"{writer_metrics['replayed_orders']} reintentadas, {writer_metrics['failed_flushes']} lotes fallidos")
+        
+        if self.db_manager and self.db_manager.db_conn:
+            pool_stats = self.db_manager.db_conn.pool.get_stats()
+            print(f"   Conexión BD: {pool_stats['reconnects']} reconexiones, "
+                  f"{pool_stats['connect_errors']} errores de conexión, {pool_stats['slow_queries']} sentencias lentas")
+            for statement, timing in pool_stats['statements'].items():
+                print(f"      {statement}: {timing['count']} ejecuciones "
+                      f"(media {timing['avg_time'] * 1000:.1f}ms, máx {timing['max_time'] * 1000:.1f}ms)")
+        
         if analytics_report['total_orders'] > 0:
             print(f"\n📈 ANÁLISIS DE ÓRDENES:")
             print(f"   Total de órdenes procesadas: {analytics_report['total_orders']}")
@@ -196,14 +369,14 @@ class TerminalOrderMonitor:
                 self.performance_start_time = time.time()
                 current_time = datetime.now()
                 
-                            # Extraer nuevas órdenes
-            new_orders = self.extract_new_orders()
-            
-            # Debug: Mostrar información de la extracción
-            if new_orders:
-                BaseLogger.success(f"✅ Extraídas {len(new_orders)} nuevas órdenes")
-            else:
-                BaseLogger.info("ℹ️ No se encontraron nuevas órdenes en esta verificación")
+                # Extraer nuevas órdenes
+                new_orders = self.extract_new_orders()
+                
+                # Debug: Mostrar información de la extracción
+                if new_orders:
+                    BaseLogger.success(f"✅ Extraídas {len(new_orders)} nuevas órdenes")
+                else:
+                    BaseLogger.info("ℹ️ No se encontraron nuevas órdenes en esta verificación")
                 
                 # Actualizar estadísticas
                 self.order_stats['total_checks'] += 1
@@ -214,13 +387,14 @@ class TerminalOrderMonitor:
                     self.display_terminal_stats()
                 
                 # Esperar antes de la siguiente verificación
-                time.sleep(TERMINAL_MONITOR_CONFIG["check_interval"])
+                self.wait_next_check()
                 
             except Exception as e:
                 logging.error(f"❌ Error en monitoreo: {e}")
                 BaseLogger.error(f"Error en monitoreo: {e}")
                 self.error_count += 1
-                time.sleep(TERMINAL_MONITOR_CONFIG["check_interval"])
+                self.last_cycle_activity = 0
+                self.wait_next_check()
     
     def start_monitoring(self):
         """Iniciar el monitoreo"""
@@ -230,18 +404,25 @@ class TerminalOrderMonitor:
             if not self.http_client.setup_session():
                 return False
             
-            if not self.http_client.login():
+            if not self.http_client.authenticate():
                 return False
             
             self.is_running = True
             self.last_check_time = datetime.now()
             self.last_refresh_time = time.time()
             
+            if self.db_writer:
+                self.db_writer.start()
+            
             print("\n" + "="*80)
             print("🎯 MONITOR DE ÓRDENES TERMINAL - SMARTAGENT")
             print("="*80)
             print("✅ Sistema iniciado correctamente")
-            print(f"⏱️  Intervalo de verificación: {TERMINAL_MONITOR_CONFIG['check_interval']} segundos")
+            if self.poll_scheduler:
+                print(f"⏱️  Intervalo de verificación: adaptativo {TERMINAL_MONITOR_CONFIG['poll_min_interval']}-"
+                      f"{TERMINAL_MONITOR_CONFIG['poll_max_interval']} segundos (inicial {TERMINAL_MONITOR_CONFIG['check_interval']})")
+            else:
+                print(f"⏱️  Intervalo de verificación: {TERMINAL_MONITOR_CONFIG['check_interval']} segundos")
             print(f"🔄 Auto-refresh: {'Activado' if TERMINAL_MONITOR_CONFIG['enable_auto_refresh'] else 'Desactivado'}")
             print(f"🔔 Notificaciones: {'Activadas' if TERMINAL_MONITOR_CONFIG['notification_sound'] else 'Desactivadas'}")
             print(f"📊 Analytics: {'Activado' if TERMINAL_MONITOR_CONFIG['enable_order_analytics'] else 'Desactivado'}")
@@ -278,12 +459,18 @@ class TerminalOrderMonitor:
         if self.http_client:
             self.http_client.close_session()
         
-        if self.db_manager and self.db_manager.db_cursor:
+        # Vaciar la cola de escritura antes de cerrar la conexión (que no se cierra si aún escribe)
+        writer_stopped = self.db_writer.stop() if self.db_writer else True
+        
+        if writer_stopped and self.db_manager and self.db_manager.db_cursor:
             self.db_manager.db_cursor.close()
         
-        if self.db_manager and self.db_manager.db_conn:
+        if writer_stopped and self.db_manager and self.db_manager.db_conn:
             self.db_manager.db_conn.close()
         
+        if self.dedup_state:
+            self.dedup_state.close()
+        
         self.display_terminal_stats()
         BaseLogger.success("✅ Monitoreo detenido correctamente")
 
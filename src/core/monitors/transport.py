@@ -0,0 +1,224 @@
+"""
+Capa de transporte HTTP para monitores
+Timeouts reales, reintentos con backoff exponencial y jitter, y circuit breaker montados en la sesión de requests
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from .utils import BaseLogger
+
+# Estados del circuit breaker
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+# Respuestas que indican un servidor con problemas (se reintentan y cuentan como fallo)
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Petición rechazada sin enviarla: el circuit breaker está abierto"""
+
+
+def is_timeout(error):
+    """¿El error es un timeout? (requests entrega el timeout de lectura agotado tras reintentos como ConnectionError)"""
+    if isinstance(error, requests.exceptions.Timeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, ReadTimeoutError)
+
+
+def is_server_failure(error):
+    """¿El error viene del servidor o de la red (y no de la página en sí)? Timeouts, conexión o 5xx"""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(error, 'response', None)
+    return isinstance(error, requests.exceptions.HTTPError) and response is not None and response.status_code in RETRY_STATUSES
+
+
+class JitterRetry(Retry):
+    """Retry de urllib3 con jitter completo y un tope de tiempo para todos los reintentos
+    
+    La espera es aleatoria entre 0 y el backoff exponencial; un Retry-After del
+    servidor se respeta pero nunca por encima de backoff_max. Con max_retry_time
+    los reintentos se abandonan cuando pasan ese número de segundos desde el
+    primer fallo, y ninguna espera se alarga más allá de ese plazo.
+    """
+    
+    def __init__(self, *args, max_retry_time=None, retry_started_at=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_time = max_retry_time
+        self.retry_started_at = retry_started_at
+    
+    def new(self, **kw):
+        # urllib3 crea un Retry nuevo en cada reintento: conservar el plazo y cuándo empezó a contar
+        kw.setdefault('max_retry_time', self.max_retry_time)
+        kw.setdefault('retry_started_at', time.monotonic() if self.retry_started_at is None else self.retry_started_at)
+        return super().new(**kw)
+    
+    def remaining_time(self):
+        """Segundos que quedan para reintentar (None = sin tope)"""
+        if self.max_retry_time is None or self.retry_started_at is None:
+            return None
+        return max(0.0, self.max_retry_time - (time.monotonic() - self.retry_started_at))
+    
+    def _cap(self, seconds):
+        remaining = self.remaining_time()
+        return seconds if remaining is None else min(seconds, remaining)
+    
+    def is_exhausted(self):
+        return super().is_exhausted() or self.remaining_time() == 0
+    
+    def get_backoff_time(self):
+        return self._cap(random.uniform(0, super().get_backoff_time()))
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return self._cap(min(retry_after, self.backoff_max))
+
+
+class CircuitBreaker:
+    """Deja de enviar peticiones tras N fallos seguidos y las reanuda tras un enfriamiento
+    
+    Cerrado: todo pasa. Abierto: todo se rechaza hasta que pasa cooldown.
+    Semiabierto: una sola petición de prueba en vuelo y el resto se rechaza;
+    si sale bien se cierra, si falla se vuelve a abrir. Una prueba que no
+    registra resultado en cooldown segundos deja paso a otra.
+    """
+    
+    def __init__(self, failure_threshold=5, cooldown=60):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_started_at = None  # Petición de prueba en vuelo (semiabierto)
+        self.stats = defaultdict(int)
+        self._lock = threading.Lock()  # Varias cuentas/hilos pueden compartir el breaker
+    
+    def allow_request(self):
+        """¿Se puede enviar una petición ahora?"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CIRCUIT_OPEN:
+                if now - self.opened_at < self.cooldown:
+                    self.stats['rejected'] += 1
+                    return False
+                self.state = CIRCUIT_HALF_OPEN
+                BaseLogger.info("Circuit breaker semiabierto: enviando petición de prueba")
+            elif self.state == CIRCUIT_HALF_OPEN:
+                if self.trial_started_at is not None and now - self.trial_started_at < self.cooldown:
+                    self.stats['rejected'] += 1
+                    return False
+            else:
+                return True
+            
+            self.trial_started_at = now
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            if self.state != CIRCUIT_CLOSED:
+                BaseLogger.success("Circuit breaker cerrado: el servidor responde de nuevo")
+            self.state = CIRCUIT_CLOSED
+            self.consecutive_failures = 0
+            self.trial_started_at = None
+    
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.stats['failures'] += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    self.stats['opened'] += 1
+                    BaseLogger.warning(f"Circuit breaker abierto tras {self.consecutive_failures} fallos seguidos: "
+                                       f"sin peticiones durante {self.cooldown}s")
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+                self.trial_started_at = None
+    
+    def is_open(self):
+        """Abierto y todavía en enfriamiento (sin contar la petición como rechazada)"""
+        return self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at < self.cooldown
+    
+    def get_stats(self):
+        """Estado actual, fallos seguidos, aperturas y peticiones rechazadas"""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'failures': self.stats['failures'],
+            'opened': self.stats['opened'],
+            'rejected': self.stats['rejected']
+        }
+
+
+class ResilientHTTPAdapter(HTTPAdapter):
+    """Adaptador con timeout por defecto (conexión, lectura), reintentos y circuit breaker
+    
+    Los reintentos de urllib3 ocurren dentro de send(), así que el breaker ve
+    una sola operación por petición: cuenta como fallo si tras los reintentos
+    sigue habiendo timeout, error de conexión o respuesta 5xx. Las esperas
+    (backoff o Retry-After) no pasan de backoff_max y los reintentos no pasan
+    de max_retry_time segundos desde el primer fallo.
+    """
+    
+    def __init__(self, timeout=(5, 30), max_retries=3, backoff_factor=0.5, circuit_breaker=None,
+                 backoff_max=10, max_retry_time=60, **kwargs):
+        self.timeout = timeout
+        self.circuit_breaker = circuit_breaker
+        self.stats = defaultdict(int)
+        retry = JitterRetry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            backoff_max=backoff_max,
+            max_retry_time=max_retry_time,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),  # El POST del login no se repite
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        super().__init__(max_retries=retry, **kwargs)
+    
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        
+        if self.circuit_breaker and not self.circuit_breaker.allow_request():
+            raise CircuitOpenError(f"Circuit breaker abierto, petición no enviada: {request.url}")
+        
+        self.stats['requests'] += 1
+        try:
+            response = super().send(request, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if is_timeout(e):
+                self.stats['timeouts'] += 1
+            if self.circuit_breaker:
+                self.circuit_breaker.record_failure()
+            raise
+        
+        retries = getattr(response.raw, 'retries', None)
+        if retries:
+            self.stats['retries'] += len(retries.history)
+        
+        if self.circuit_breaker:
+            if response.status_code in RETRY_STATUSES:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+        return response
+    
+    def get_stats(self):
+        return {'requests': self.stats['requests'], 'retries': self.stats['retries'], 'timeouts': self.stats['timeouts']}
@@ -9,9 +9,14 @@ import os
 from datetime import datetime
 from collections import defaultdict, deque
 import hashlib
-import re
 import json
 import time
+import psycopg2
+from psycopg2.extras import execute_values
+
+from .order_record import OrderRecord, parse_datetime
+from .raw_html import compress_raw_html
+from .patterns import PATTERNS
 
 class BaseLogger:
     """Logger base con funcionalidades comunes"""
@@ -92,7 +97,7 @@ class OrderAnalytics:
         self.time_stats[hour] += 1
         
         # Estadísticas por estado
-        status = order_data.get('status', 'Unknown')
+        status = str(order_data.get('status', 'Unknown'))
         self.status_stats[status] += 1
         
         self.performance_metrics['total_orders'] += 1
@@ -112,11 +117,27 @@ class OrderAnalytics:
 class OrderParser:
     """Clase para parsear órdenes con funcionalidades comunes"""
     
+    # Campos que cambian durante la vida de una orden
+    MUTABLE_FIELDS = ('status', 'rider', 'total_amount', 'created_at', 'cooking_time', 'delivery_time')
+    
+    @staticmethod
+    def generate_order_key(order_data):
+        """Clave estable de la orden (no depende del momento del parseo)"""
+        order_id = order_data.get('order_id') or order_data.get('order_number') or order_data.get('task_id')
+        if order_id:
+            return str(order_id)
+        return f"{order_data.get('customer_name', '')}|{order_data.get('delivery_address', '')}"
+    
     @staticmethod
     def generate_order_hash(order_data):
-        """Generar hash único para la orden"""
-        hash_string = f"{order_data.get('order_id', '')}{order_data.get('customer_name', '')}{order_data.get('delivery_address', '')}{order_data.get('timestamp', '')}"
-        return hashlib.sha256(hash_string.encode()).hexdigest()
+        """Generar hash estable de identidad para la orden"""
+        return hashlib.sha256(OrderParser.generate_order_key(order_data).encode()).hexdigest()
+    
+    @staticmethod
+    def generate_content_fingerprint(order_data):
+        """Huella del contenido mutable (estado, rider, tiempos) para detectar cambios"""
+        content = "|".join(str(order_data.get(field, '')) for field in OrderParser.MUTABLE_FIELDS)
+        return hashlib.sha256(content.encode()).hexdigest()
     
     @staticmethod
     def extract_order_id(container):
@@ -136,22 +157,8 @@ class OrderParser:
             if element:
                 return element.get_text(strip=True)
         
-        # Estrategia 2: Buscar en texto con regex
-        text = container.get_text()
-        patterns = [
-            r'Task[:\s]*([A-Z0-9-]+)',
-            r'Order[:\s]*([A-Z0-9-]+)',
-            r'#([A-Z0-9-]+)',
-            r'([A-Z]{2,3}-\d{4,})',
-            r'ID[:\s]*([A-Z0-9-]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
+        # Estrategia 2: Buscar en el texto de la fila (una sola pasada con todos los patrones)
+        return PATTERNS.search('order_id', container.get_text())
     
     @staticmethod
     def extract_customer_info(container):
@@ -220,10 +227,9 @@ class OrderParser:
         for selector in selectors:
             element = container.select_one(selector)
             if element:
-                amount_text = element.get_text(strip=True)
-                numbers = re.findall(r'[\d,]+\.?\d*', amount_text)
-                if numbers:
-                    return numbers[0]
+                amount = PATTERNS.search('amount', element.get_text(strip=True))
+                if amount:
+                    return amount
         
         return None
     
@@ -269,10 +275,9 @@ class OrderParser:
             priority_score += 1
         
         # Factor 2: Tiempo desde detección
-        detected_at = order_data.get('detected_at')
-        if detected_at:
+        detected_time = parse_datetime(order_data.get('detected_at'))  # Ya es datetime en un OrderRecord
+        if detected_time:
             try:
-                detected_time = datetime.fromisoformat(detected_at.replace('Z', '+00:00'))
                 time_diff = (datetime.now() - detected_time).total_seconds()
                 if time_diff > 300:  # Más de 5 minutos
                     priority_score += 2
@@ -346,12 +351,18 @@ class NotificationManager:
         print(f"📊 Nuevas órdenes detectadas: {len(orders)}")
         print("="*140 + "\n")
 
+def is_transient_db_error(error):
+    """¿El error es de conexión (reintentable) y no de los datos? OperationalError o InterfaceError"""
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
 class DatabaseManager:
     """Gestor de base de datos"""
     
     def __init__(self, db_conn, db_cursor):
         self.db_conn = db_conn
         self.db_cursor = db_cursor
+        self.last_save_error = None  # Excepción del último save_orders fallido
     
     def create_orders_table(self, table_name="terminal_orders"):
         """Crear tabla de órdenes"""
@@ -379,6 +390,33 @@ class DatabaseManager:
             );
             """
             
+            self.db_cursor.execute(create_table_query)
+            self.db_cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)")
+            # raw_html comprimido con zlib (la columna TEXT ya no se escribe)
+            self.db_cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS raw_html_compressed BYTEA")
+            self.db_conn.commit()
+            logging.info(f"✅ Tabla {table_name} creada/verificada")
+            
+        except Exception as e:
+            logging.error(f"❌ Error creando tabla {table_name}: {e}")
+    
+    def create_events_table(self, table_name="terminal_order_events"):
+        """Crear tabla de eventos de ciclo de vida (order_id es el id de la página, no orders.id)"""
+        try:
+            create_table_query = f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id SERIAL PRIMARY KEY,
+                order_id VARCHAR(50) NOT NULL,
+                event_type VARCHAR(50) NOT NULL,
+                previous_value VARCHAR(255),
+                new_value VARCHAR(255),
+                event_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                raw_data JSONB
+            );
+            CREATE INDEX IF NOT EXISTS idx_{table_name}_order_id ON {table_name}(order_id);
+            CREATE INDEX IF NOT EXISTS idx_{table_name}_event_type ON {table_name}(event_type);
+            """
+            
             self.db_cursor.execute(create_table_query)
             self.db_conn.commit()
             logging.info(f"✅ Tabla {table_name} creada/verificada")
@@ -388,52 +426,108 @@ class DatabaseManager:
     
     def save_order(self, order_data, table_name="terminal_orders", analytics=None, performance_metrics=None):
         """Guardar orden en base de datos"""
+        return self.save_orders([order_data], table_name, analytics, performance_metrics)
+    
+    def save_orders(self, orders, table_name="terminal_orders", analytics=None, performance_metrics=None,
+                    events=None, events_table="terminal_order_events", analytics_report=None):
+        """Guardar un lote de órdenes y sus eventos de ciclo de vida con un solo commit"""
+        if not orders and not events:
+            return True
+        
         try:
             insert_query = f"""
             INSERT INTO {table_name} (
                 order_id, order_number, task_id, customer_name, delivery_address,
                 restaurant, total_amount, status, priority, detected_at,
-                order_hash, source, page, raw_html, analytics_data, performance_metrics
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-            ) ON CONFLICT (order_id) DO UPDATE SET
+                order_hash, content_hash, source, page, raw_html_compressed, analytics_data, performance_metrics
+            ) VALUES %s
+            ON CONFLICT (order_id) DO UPDATE SET
                 status = EXCLUDED.status,
                 priority = EXCLUDED.priority,
+                content_hash = EXCLUDED.content_hash,
+                raw_html_compressed = COALESCE(EXCLUDED.raw_html_compressed, {table_name}.raw_html_compressed),
                 processed_at = CURRENT_TIMESTAMP,
                 analytics_data = EXCLUDED.analytics_data,
                 performance_metrics = EXCLUDED.performance_metrics
+            WHERE {table_name}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
             """
             
-            # Preparar datos
-            analytics_data = json.dumps(analytics.get_analytics_report() if analytics else {})
+            # Preparar datos (el reporte de analytics se calcula una vez por lote, o llega ya tomado por quien encola)
+            if analytics_report is None:
+                analytics_report = analytics.get_analytics_report() if analytics else {}
+            analytics_data = json.dumps(analytics_report)
             performance_data = json.dumps(performance_metrics or {})
             
-            values = (
-                order_data.get('order_id'),
-                order_data.get('order_number'),
-                order_data.get('task_id'),
-                order_data.get('customer_name'),
-                order_data.get('delivery_address'),
-                order_data.get('restaurant'),
-                order_data.get('total_amount'),
-                order_data.get('status'),
-                order_data.get('priority'),
-                order_data.get('detected_at'),
-                order_data.get('order_hash'),
-                order_data.get('source'),
-                order_data.get('page'),
-                order_data.get('raw_html'),
-                analytics_data,
-                performance_data
-            )
+            # ON CONFLICT no admite la misma orden dos veces en un lote: conservar la última.
+            # Los dicts (p. ej. releídos del archivo de respaldo) se convierten a registros tipados
+            unique_orders = {}
+            for order_data in orders:
+                record = order_data if isinstance(order_data, OrderRecord) else OrderRecord.from_dict(order_data)
+                unique_orders[record.order_id] = record
             
-            self.db_cursor.execute(insert_query, values)
+            values = [
+                (
+                    record.order_id,
+                    record.order_number,
+                    record.task_id,
+                    record.customer_name,
+                    record.delivery_address,
+                    record.restaurant,
+                    record.total_amount,
+                    record.status.value if record.status else None,
+                    record.priority,
+                    record.detected_at,
+                    record.order_hash,
+                    record.content_hash,
+                    record.source,
+                    record.page,
+                    compress_raw_html(record.raw_html),
+                    analytics_data,
+                    performance_data
+                )
+                for record in unique_orders.values()
+            ]
+            
+            if values:
+                execute_values(self.db_cursor, insert_query, values, page_size=len(values))
+            if events:
+                self._insert_events(events, events_table)
             self.db_conn.commit()
             
-            BaseLogger.success(f"Orden guardada en BD: {order_data.get('order_id', 'N/A')}")
+            if len(values) == 1:
+                BaseLogger.success(f"Orden guardada en BD: {values[0][0] or 'N/A'}")
+            elif values:
+                BaseLogger.success(f"{len(values)} órdenes guardadas en BD en un solo lote")
+            if events:
+                BaseLogger.info(f"{len(events)} eventos de ciclo de vida guardados en BD")
+            self.last_save_error = None
             return True
             
         except Exception as e:
-            logging.error(f"❌ Error guardando orden en BD: {e}")
-            BaseLogger.error(f"Error guardando orden en BD: {e}")
-            return False 
\ No newline at end of file
+            self.last_save_error = e
+            logging.error(f"❌ Error guardando órdenes en BD: {e}")
+            BaseLogger.error(f"Error guardando órdenes en BD: {e}")
+            try:
+                self.db_conn.rollback()
+            except Exception:
+                pass
+            return False
+    
+    def _insert_events(self, events, table_name):
+        """Insertar eventos de ciclo de vida en una sola sentencia (sin commit)"""
+        insert_query = f"""
+        INSERT INTO {table_name} (order_id, event_type, previous_value, new_value, event_timestamp, raw_data)
+        VALUES %s
+        """
+        values = [
+            (
+                event['order_id'],
+                event['event_type'],
+                event.get('previous_value'),
+                event.get('new_value'),
+                event.get('occurred_at'),
+                json.dumps(event.get('raw_data') or {}, default=str)
+            )
+            for event in events
+        ]
+        execute_values(self.db_cursor, insert_query, values, page_size=len(values))
\ No newline at end of file
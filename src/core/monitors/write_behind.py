@@ -0,0 +1,331 @@
+"""
+Persistencia diferida (write-behind) para monitores
+Cola acotada y un hilo escritor que guarda las órdenes y sus eventos por lotes fuera del hilo de sondeo
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from .utils import BaseLogger, is_transient_db_error
+
+
+class WriteBehindQueue:
+    """Cola de escritura diferida con lotes por tamaño/tiempo y volcado a disco si la BD cae
+    
+    Las órdenes se guardan en el orden en que se enviaron, para que una
+    instantánea antigua nunca pise a una más reciente de la misma orden:
+    
+    - submit() nunca bloquea: si la cola está llena, lo que no cabe se vuelca
+      al archivo de respaldo, y mientras ese archivo tenga pendientes todo lo
+      nuevo se añade detrás en el mismo archivo.
+    - Un lote que no se pudo guardar por un error de conexión se reintenta
+      antes de tomar el siguiente (al detenerse sin BD, el lote y la cola van
+      al principio del respaldo). Si el error es de los datos, el lote se
+      divide a la mitad hasta aislar las filas rechazadas, que van al archivo
+      de rechazos en vez de bloquear la cola.
+    - El respaldo se reenvía solo con la cola vacía: todo lo que contiene es
+      más reciente que lo ya guardado.
+    """
+    
+    def __init__(self, db_manager, table_name="terminal_orders", analytics=None,
+                 batch_size=50, flush_interval=2.0, max_queue_size=1000, spill_file=None, reject_file=None):
+        self.db_manager = db_manager
+        self.table_name = table_name
+        self.analytics = analytics
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = Path(spill_file) if spill_file else None
+        if reject_file:
+            self.reject_path = Path(reject_file)
+        else:
+            self.reject_path = self.spill_path.with_suffix('.rejected.jsonl') if self.spill_path else None
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.metrics = defaultdict(float)
+        self._spill_lock = threading.RLock()
+        self._spilling = bool(self.spill_path and self.spill_path.exists())  # Hay pendientes en el respaldo
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_performance = {}
+    
+    def start(self):
+        """Iniciar el hilo escritor"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        BaseLogger.success("Escritura diferida a base de datos iniciada")
+    
+    def submit(self, orders, performance_metrics=None, events=None):
+        """Encolar órdenes (y eventos de ciclo de vida) sin bloquear el sondeo"""
+        if performance_metrics:
+            self._last_performance = performance_metrics
+        
+        items = [('order', order_data) for order_data in orders]
+        items.extend(('event', event) for event in events or [])
+        if not items:
+            return
+        
+        # Instantánea de analytics en el hilo de sondeo, que es el único que la modifica
+        context = {
+            'analytics': self.analytics.get_analytics_report() if self.analytics else {},
+            'performance': self._last_performance
+        }
+        items = [(kind, payload, context) for kind, payload in items]
+        
+        with self._spill_lock:
+            overflow = items
+            if not self._spilling:
+                overflow = []
+                for index, item in enumerate(items):
+                    try:
+                        self.queue.put_nowait(item)
+                        self.metrics['enqueued'] += 1
+                    except queue.Full:
+                        overflow = items[index:]
+                        break
+            
+            if overflow:
+                # Contrapresión: lo que no cabe (y todo lo que llegue detrás) va al archivo de respaldo
+                self.metrics['backpressure_spills'] += len(overflow)
+                if not self._spilling:
+                    BaseLogger.warning(f"Cola de escritura llena, {len(overflow)} órdenes enviadas a disco")
+                self._spill(overflow)
+    
+    def _run(self):
+        """Bucle del hilo escritor"""
+        while True:
+            batch = self._collect_batch()
+            if batch and not self._flush_until_saved(batch):
+                return
+            if self.queue.empty():
+                self._replay_spill()
+                if self._stop_event.is_set():
+                    return
+    
+    def _collect_batch(self):
+        """Reunir hasta batch_size órdenes o esperar como máximo flush_interval"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    def _flush_until_saved(self, batch):
+        """Reintentar el lote hasta guardarlo; al detenerse sin BD, volcarlo con la cola al principio del respaldo"""
+        while True:
+            batch = self._save_or_reject(batch)
+            if not batch:
+                return True
+            if self._stop_event.is_set():
+                pending = list(batch)
+                while True:
+                    try:
+                        pending.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._spill(pending, prepend=True)
+                return False
+            self._stop_event.wait(self.flush_interval)
+    
+    def _save_or_reject(self, batch):
+        """Guardar un lote aislando por bisección las filas con errores de datos; devuelve lo pendiente por la conexión"""
+        if self._flush(batch):
+            return []
+        if self._failure_is_transient():
+            return batch
+        
+        if len(batch) == 1:
+            self._reject(batch, self.db_manager.last_save_error)
+            return []
+        
+        middle = len(batch) // 2
+        pending = self._save_or_reject(batch[:middle])
+        if pending:
+            # La conexión cayó a mitad: lo no intentado queda detrás, en orden
+            return pending + batch[middle:]
+        return self._save_or_reject(batch[middle:])
+    
+    def _failure_is_transient(self):
+        """¿El último fallo fue de conexión? Sin detalle del error se asume que sí y se reintenta"""
+        error = getattr(self.db_manager, 'last_save_error', None)
+        return error is None or is_transient_db_error(error)
+    
+    def _flush(self, batch):
+        """Guardar un lote con el contexto (analytics, rendimiento) de su elemento más reciente"""
+        orders = [payload for kind, payload, _ in batch if kind == 'order']
+        events = [payload for kind, payload, _ in batch if kind == 'event']
+        context = batch[-1][2]
+        
+        start_time = time.perf_counter()
+        saved = self.db_manager.save_orders(
+            orders,
+            self.table_name,
+            performance_metrics=context.get('performance'),
+            events=events,
+            analytics_report=context.get('analytics', {})
+        )
+        latency = time.perf_counter() - start_time
+        
+        self.metrics['flushes'] += 1
+        self.metrics['last_flush_latency'] = latency
+        self.metrics['total_flush_latency'] += latency
+        self.metrics['max_flush_latency'] = max(self.metrics['max_flush_latency'], latency)
+        
+        if saved:
+            self.metrics['flushed_orders'] += len(orders)
+            self.metrics['flushed_events'] += len(events)
+            return True
+        
+        self.metrics['failed_flushes'] += 1
+        return False
+    
+    @staticmethod
+    def _serialize(items, error=None):
+        """Elementos como líneas JSON (con el error que los rechazó, si lo hay)"""
+        lines = []
+        for kind, payload, context in items:
+            if hasattr(payload, 'to_dict'):
+                payload = payload.to_dict()  # OrderRecord
+            record = {'kind': kind, 'data': payload, 'context': context}
+            if error is not None:
+                record['error'] = str(error)
+            lines.append(json.dumps(record, default=str) + "\n")
+        return lines
+    
+    def _reject(self, items, error):
+        """Apartar filas que la BD rechaza por sus datos para que no bloqueen la cola"""
+        self.metrics['rejected_orders'] += len(items)
+        logging.error(f"❌ Orden rechazada por la BD, se aparta: {error}")
+        if not self.reject_path:
+            self.metrics['dropped_orders'] += len(items)
+            return
+        
+        try:
+            self.reject_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.reject_path, 'a', encoding='utf-8') as rejected:
+                rejected.writelines(self._serialize(items, error))
+            BaseLogger.warning(f"{len(items)} órdenes rechazadas guardadas en {self.reject_path}")
+        
+        except Exception as e:
+            self.metrics['dropped_orders'] += len(items)
+            logging.error(f"❌ Error escribiendo archivo de rechazos: {e}")
+    
+    def _spill(self, items, prepend=False):
+        """Añadir elementos al archivo de respaldo (JSON por línea); prepend=True los pone delante (más antiguos)"""
+        if not self.spill_path:
+            self.metrics['dropped_orders'] += len(items)
+            BaseLogger.error(f"Sin archivo de respaldo: {len(items)} órdenes descartadas")
+            return
+        
+        lines = self._serialize(items)
+        
+        try:
+            with self._spill_lock:
+                self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+                if prepend and self.spill_path.exists():
+                    temporary = self.spill_path.with_suffix(self.spill_path.suffix + '.tmp')
+                    with open(temporary, 'w', encoding='utf-8') as spill:
+                        spill.writelines(lines)
+                        with open(self.spill_path, encoding='utf-8') as existing:
+                            spill.writelines(existing)
+                    os.replace(temporary, self.spill_path)
+                else:
+                    with open(self.spill_path, 'a', encoding='utf-8') as spill:
+                        spill.writelines(lines)
+                was_spilling, self._spilling = self._spilling, True
+            self.metrics['spilled_orders'] += len(items)
+            if not was_spilling:
+                BaseLogger.warning(f"{len(items)} órdenes guardadas en {self.spill_path} hasta que la BD responda")
+        
+        except Exception as e:
+            self.metrics['dropped_orders'] += len(items)
+            logging.error(f"❌ Error escribiendo archivo de respaldo: {e}")
+    
+    def _replay_spill(self):
+        """Reintentar las órdenes volcadas a disco, en el orden en que se enviaron"""
+        if not self.spill_path:
+            return
+        
+        with self._spill_lock:
+            if not self.spill_path.exists():
+                self._spilling = False
+                return
+            try:
+                with open(self.spill_path, encoding='utf-8') as spill:
+                    records = [json.loads(line) for line in spill if line.strip()]
+                self.spill_path.unlink()
+            except Exception as e:
+                logging.error(f"❌ Error leyendo archivo de respaldo: {e}")
+                return
+            # Lo que llegue mientras tanto sigue yendo a un archivo nuevo, detrás de estos
+            self._spilling = True
+        
+        # Los archivos antiguos contienen solo órdenes, sin envoltorio ni contexto
+        pending = [
+            (record['kind'], record['data'], record.get('context') or {}) if 'kind' in record else ('order', record, {})
+            for record in records
+        ]
+        if not pending:
+            return
+        
+        BaseLogger.info(f"Reintentando {len(pending)} órdenes del archivo de respaldo...")
+        for index in range(0, len(pending), self.batch_size):
+            chunk = pending[index:index + self.batch_size]
+            unsaved = self._save_or_reject(chunk)
+            if unsaved:
+                # Devolver el resto al principio del respaldo, delante de lo que llegó después
+                self._spill(unsaved + pending[index + self.batch_size:], prepend=True)
+                return
+            self.metrics['replayed_orders'] += len(chunk)
+        
+        with self._spill_lock:
+            self._spilling = self.spill_path.exists()
+    
+    def get_metrics(self):
+        """Métricas de la cola: profundidad, latencia de guardado y respaldos"""
+        flushes = self.metrics['flushes']
+        return {
+            'queue_depth': self.queue.qsize(),
+            'enqueued': int(self.metrics['enqueued']),
+            'flushes': int(flushes),
+            'flushed_orders': int(self.metrics['flushed_orders']),
+            'flushed_events': int(self.metrics['flushed_events']),
+            'failed_flushes': int(self.metrics['failed_flushes']),
+            'spilled_orders': int(self.metrics['spilled_orders']),
+            'replayed_orders': int(self.metrics['replayed_orders']),
+            'rejected_orders': int(self.metrics['rejected_orders']),
+            'dropped_orders': int(self.metrics['dropped_orders']),
+            'backpressure_spills': int(self.metrics['backpressure_spills']),
+            'last_flush_latency': self.metrics['last_flush_latency'],
+            'avg_flush_latency': self.metrics['total_flush_latency'] / flushes if flushes else 0.0,
+            'max_flush_latency': self.metrics['max_flush_latency']
+        }
+    
+    def stop(self, timeout=30):
+        """Detener el hilo escritor vaciando la cola; False si sigue escribiendo pasado el timeout
+        
+        Mientras el hilo siga vivo usa la conexión: quien llama no debe cerrarla.
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                BaseLogger.warning("El escritor diferido sigue guardando, la conexión queda abierta")
+                return False
+            self._thread = None
+        return True
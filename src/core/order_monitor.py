@@ -13,7 +13,6 @@ import logging
 from datetime import datetime, timedelta
 import threading
 from collections import defaultdict
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
@@ -30,9 +29,16 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
 import random
 
+from database.connection_pool import get_pool
+from core.monitors.known_orders import KnownOrderStore
+from core.monitors.lifecycle import OrderLifecycleTracker
+from core.monitors.scheduler import AdaptivePollScheduler
+from core.monitors.html_backend import parse_html
+from core.monitors.patterns import PATTERNS
+from core.monitors.browser_extract import BrowserRowExtractor, MutationWatcher
+
 # Cargar variables de entorno
 load_dotenv(project_root / "config" / ".env")
 
@@ -42,12 +48,133 @@ ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "federico")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "***CONTRASEÑA_OCULTA***")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Filas de órdenes (los selectores genéricos de contenedores solo se usan al parsear page_source)
+ACTIVE_ORDER_ROW_SELECTORS = [
+    # Selectores específicos para la estructura de órdenes en tabla desplegada
+    "tr.orders-list-item",
+    "tr[class*='orders-list-item']",
+    "tr[class*='inpreparation']",
+    "tbody tr",
+    "table tbody tr",
+    # Selectores para tablas desplegadas
+    "div[class*='active_orders'] tbody tr",
+    "div[class*='active_orders'] table tr",
+    "section[class*='active_orders'] tbody tr",
+    "section[class*='active_orders'] table tr"
+]
+
+# Selectores de cada campo de un active_order (gana el primer elemento encontrado), compartidos por el
+# parseo de page_source y la extracción dentro del navegador
+ACTIVE_ORDER_FIELD_SELECTORS = {
+    'order_id': [
+        ".order-id-field",
+        "div[class*='order-id']",
+        "td[data-label='#'] .order-id-field",
+        "td[data-label='#'] div",
+        "span[class*='order-id']",
+        "td[class*='order-id']",
+        ".order-id",
+        ".active-id"
+    ],
+    'order_number': [
+        ".order-id-field",
+        "div[class*='order-id']",
+        "td[data-label='#'] .order-id-field",
+        "span[class*='order-number']",
+        "td[class*='order-number']",
+        ".order-number"
+    ],
+    'customer_name': [
+        ".customer-field a .link",
+        ".customer-field span.link",
+        "td .customer-field a",
+        "td .customer-field span",
+        "span[class*='customer']",
+        "span[class*='cliente']",
+        "span[class*='user']",
+        "td[class*='customer']",
+        "td[class*='cliente']",
+        "td[class*='user']"
+    ],
+    'delivery_address': [
+        "td:nth-child(4) div",  # Tercera columna con dirección
+        "td:nth-child(4) .cell div",
+        "span[class*='address']",
+        "span[class*='direccion']",
+        "span[class*='location']",
+        "td[class*='address']",
+        "td[class*='direccion']",
+        "td[class*='location']"
+    ],
+    'status': [
+        "tr[class*='inpreparation']",  # Estado en la clase del tr
+        "tr[class*='orders-list-item']",  # Clase que indica orden activa
+        ".purchase-status-field",
+        "td[class*='status']",
+        "span[class*='status']",
+        "span[class*='estado']",
+        "span[class*='state']",
+        "td[class*='estado']",
+        "td[class*='state']"
+    ],
+    'total_amount': [
+        ".price",
+        "span.price",
+        "td .price",
+        "td:nth-child(5) .price",  # Quinta columna con precio
+        "td:nth-child(5) span",
+        "span[class*='amount']",
+        "span[class*='total']",
+        "span[class*='monto']",
+        "span[class*='price']",
+        "td[class*='amount']",
+        "td[class*='total']",
+        "td[class*='monto']",
+        "td[class*='price']"
+    ],
+    'description': [
+        ".vendor-field a .link",  # Nombre del restaurante/vendor
+        ".vendor-field span.link",
+        "td .vendor-field a",
+        "td .vendor-field span",
+        ".rider-name a .link",  # Nombre del repartidor
+        ".rider-name span.link",
+        "td .rider-name a",
+        "td .rider-name span",
+        "span[class*='description']",
+        "span[class*='descripcion']",
+        "span[class*='task-desc']",
+        "td[class*='description']",
+        "td[class*='descripcion']",
+        "td[class*='task-desc']"
+    ],
+    'rider': [
+        ".rider-name a .link",  # Repartidor asignado (vacío mientras no haya uno)
+        ".rider-name span.link",
+        "td .rider-name a",
+        "td .rider-name span",
+        "span[class*='rider']",
+        "span[class*='repartidor']",
+        "td[class*='rider']",
+        "td[class*='repartidor']"
+    ]
+}
+
 # Configuración del monitor
 MONITOR_CONFIG = {
-    "check_interval": 30,  # Segundos entre verificaciones
+    "check_interval": 30,  # Segundos entre verificaciones (inicial si el sondeo es adaptativo)
+    "adaptive_polling": True,  # Ajustar el intervalo a las órdenes nuevas observadas
+    "poll_min_interval": 10,   # Intervalo mínimo con actividad (segundos)
+    "poll_max_interval": 120,  # Intervalo máximo sin actividad (segundos)
+    "poll_hour_profiles": {},  # Límites por hora, p. ej. {"12-15": [10, 30]}
     "order_timeout": 300,  # Segundos para considerar un pedido como "nuevo"
     "max_retries": 3,      # Máximo de reintentos en caso de error
     "notification_sound": True,  # Sonido de notificación
+    "identity_cache_size": 1000,  # Máximo de ids de clientes/pedidos en caché
+    "browser_extraction": True,  # Leer las filas con un solo execute_script (page_source como respaldo)
+    "event_driven": True,  # MutationObserver en la tabla: la espera termina en cuanto cambia una fila
+    "resync_interval": 300,  # Segundos entre lecturas completas de la tabla (el observador no avisa de las filas retiradas)
+    "refresh_interval": 900,  # Segundos entre recargas de /tasks por si la vista dejó de actualizarse (0 = nunca)
     "log_level": "INFO"
 }
 
@@ -90,12 +217,36 @@ class OrderMonitor:
         self.last_check_time = None
         self.known_orders = set()
         self.order_stats = defaultdict(int)
+        # Caché de identidades (nombre -> customer_id, order_number -> order_id)
+        self.customer_ids = KnownOrderStore(max_size=MONITOR_CONFIG["identity_cache_size"], ttl=None)
+        self.order_ids = KnownOrderStore(max_size=MONITOR_CONFIG["identity_cache_size"], ttl=None)
+        # Última instantánea por orden: solo las transiciones se escriben en order_events
+        self.lifecycle = OrderLifecycleTracker(max_orders=MONITOR_CONFIG["identity_cache_size"])
+        self.poll_scheduler = None
+        if MONITOR_CONFIG["adaptive_polling"]:
+            self.poll_scheduler = AdaptivePollScheduler(
+                MONITOR_CONFIG["check_interval"],
+                min_interval=MONITOR_CONFIG["poll_min_interval"],
+                max_interval=MONITOR_CONFIG["poll_max_interval"],
+                hour_profiles=MONITOR_CONFIG["poll_hour_profiles"]
+            )
+        self.row_extractor = None
+        if MONITOR_CONFIG["browser_extraction"]:
+            self.row_extractor = BrowserRowExtractor(ACTIVE_ORDER_ROW_SELECTORS, ACTIVE_ORDER_FIELD_SELECTORS, text_field='order_number')
+        self.mutation_watcher = None
+        if self.row_extractor and MONITOR_CONFIG["event_driven"]:
+            self.mutation_watcher = MutationWatcher(self.row_extractor)
+        self.pending_rows = None  # Filas que avisó el observador durante la última espera
+        self.last_read_complete = True  # False si el ciclo solo leyó las filas que avisó el observador
+        self.last_full_read_at = None  # time.monotonic() de la última lectura completa de la tabla
+        self.last_refresh_at = time.monotonic()  # Última carga de /tasks en el navegador
+        self.page_orders = {}  # order_id -> última versión vista en la página (para detectar las retiradas)
         self.setup_database()
         
     def setup_database(self):
         """Configurar conexión a la base de datos"""
         try:
-            self.db_conn = psycopg2.connect(DATABASE_URL)
+            self.db_conn = get_pool(DATABASE_URL).connect()
             self.db_cursor = self.db_conn.cursor(cursor_factory=RealDictCursor)
             logging.info("✅ Conexión a base de datos establecida")
             console_log("Conexión a base de datos establecida", "SUCCESS")
@@ -103,6 +254,38 @@ class OrderMonitor:
             logging.error(f"❌ Error conectando a la base de datos: {e}")
             console_log(f"Error conectando a la base de datos: {e}", "ERROR")
             sys.exit(1)
+        
+        self.warm_identity_cache()
+    
+    def warm_identity_cache(self):
+        """Precargar ids de clientes y pedidos recientes en la caché de identidades"""
+        try:
+            limit = MONITOR_CONFIG["identity_cache_size"]
+            
+            self.db_cursor.execute("""
+                SELECT name, MIN(id) AS id FROM customers
+                GROUP BY name
+                ORDER BY MAX(id) DESC
+                LIMIT %s
+            """, (limit,))
+            # Más antiguos primero para que los recientes queden como más usados
+            for row in reversed(self.db_cursor.fetchall()):
+                self.customer_ids.seed(row['name'], row['id'])
+            
+            self.db_cursor.execute("""
+                SELECT order_number, id FROM orders
+                ORDER BY id DESC
+                LIMIT %s
+            """, (limit,))
+            for row in reversed(self.db_cursor.fetchall()):
+                self.order_ids.seed(row['order_number'], row['id'])
+            
+            self.db_conn.rollback()  # Cerrar la transacción de solo lectura
+            console_log(f"Caché de identidades cargada: {len(self.customer_ids)} clientes, {len(self.order_ids)} pedidos", "SUCCESS")
+        
+        except Exception as e:
+            logging.error(f"❌ Error precargando caché de identidades: {e}")
+            self.db_conn.rollback()
     
     def setup_driver(self):
         """Configurar ChromeDriver para monitoreo"""
@@ -195,7 +378,7 @@ class OrderMonitor:
             console_log(f"Navegando a página específica: {task_url}", "MONITOR")
             
             self.driver.get(task_url)
-            time.sleep(5)
+            self.wait_for_orders_table(5)
             
             # Verificar que estamos en la página correcta
             current_url = self.driver.current_url
@@ -219,7 +402,7 @@ class OrderMonitor:
                         active_orders_button = self.driver.find_element(By.XPATH, selector)
                         # Hacer clic en el botón
                         active_orders_button.click()
-                        time.sleep(3)  # Esperar a que se despliegue la tabla
+                        self.wait_for_orders_table(3)  # Esperar a que se despliegue la tabla
                         logging.info(f"✅ Botón Active orders encontrado y clickeado: {selector}")
                         console_log(f"Botón Active orders encontrado y clickeado: {selector}", "SUCCESS")
                         active_orders_button_clicked = True
@@ -265,89 +448,35 @@ class OrderMonitor:
             logging.error(f"❌ Error navegando a página /tasks: {e}")
             return False
     
+    def wait_for_orders_table(self, timeout):
+        """Esperar a que aparezca la tabla de órdenes (como mucho `timeout` segundos) en vez de una pausa fija"""
+        try:
+            WebDriverWait(self.driver, timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "table.responsive-table"))
+            )
+            return True
+        except TimeoutException:
+            return False
+    
     def extract_new_orders(self):
         """Extraer nuevos active_orders de la página /tasks"""
         try:
             console_log("Extrayendo active_orders de la página /tasks...", "DETECTION")
-            page_source = self.driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
-            
             new_orders = []
             current_time = datetime.now()
             
-            # Buscar específicamente elementos de active_orders
-            active_orders_containers = []
-            
-            # Estrategias específicas para active_orders basadas en la estructura real
-            active_orders_selectors = [
-                # Selectores específicos para la estructura de órdenes en tabla desplegada
-                "tr.orders-list-item",
-                "tr[class*='orders-list-item']",
-                "tr[class*='inpreparation']",
-                "tbody tr",
-                "table tbody tr",
-                # Selectores para tablas desplegadas
-                "div[class*='active_orders'] tbody tr",
-                "div[class*='active_orders'] table tr",
-                "section[class*='active_orders'] tbody tr",
-                "section[class*='active_orders'] table tr",
-                # Selectores genéricos como respaldo
-                "div[class*='active_orders']",
-                "div[id*='active_orders']",
-                "section[class*='active_orders']",
-                "table[class*='active_orders']",
-                "ul[class*='active_orders']",
-                "div[class*='task']",
-                "div[class*='active']",
-                "tr[class*='active']",
-                "li[class*='active']",
-                ".active-orders",
-                ".active_orders",
-                ".task-item",
-                ".active-item"
-            ]
-            
-            # Buscar contenedores de active_orders
-            for selector in active_orders_selectors:
-                containers = soup.select(selector)
-                active_orders_containers.extend(containers)
-            
-            # Si no se encuentran contenedores específicos, buscar en toda la página
-            if not active_orders_containers:
-                logging.info("🔍 No se encontraron contenedores específicos de active_orders, buscando en toda la página")
-                console_log("No se encontraron contenedores específicos de active_orders, buscando en toda la página", "DETECTION")
-                
-                # Buscar específicamente en tablas con órdenes (incluyendo tablas desplegadas)
-                tables = soup.find_all('table')
-                for table in tables:
-                    tbody = table.find('tbody')
-                    if tbody:
-                        rows = tbody.find_all('tr')
-                        for row in rows:
-                            # Verificar si es una fila de orden
-                            if 'orders-list-item' in row.get('class', []) or 'inpreparation' in row.get('class', []):
-                                active_orders_containers.append(row)
-                
-                # Buscar también en divs que puedan contener tablas desplegadas
-                active_orders_divs = soup.find_all('div', class_=lambda x: x and 'active_orders' in x)
-                for div in active_orders_divs:
-                    # Buscar tablas dentro del div
-                    tables_in_div = div.find_all('table')
-                    for table in tables_in_div:
-                        tbody = table.find('tbody')
-                        if tbody:
-                            rows = tbody.find_all('tr')
-                            for row in rows:
-                                if 'orders-list-item' in row.get('class', []) or 'inpreparation' in row.get('class', []):
-                                    active_orders_containers.append(row)
-                
-                # Si aún no se encuentran, buscar elementos que contengan "order"
-                if not active_orders_containers:
-                    all_elements = soup.find_all(['div', 'tr', 'li', 'section'])
-                    for element in all_elements:
-                        element_text = element.get_text().lower()
-                        if 'order' in element_text or 'preparation' in element_text:
-                            active_orders_containers.append(element)
+            # Campos leídos en el navegador con un solo execute_script; page_source si no encuentra la tabla
+            browser_rows = self.collect_browser_rows()
+            if browser_rows is not None:
+                active_orders_containers = browser_rows
+                parse_container = self._parse_browser_row
+                table_found = True  # Sin tabla extract() devuelve None
+            else:
+                self.last_read_complete = True
+                soup = parse_html(self.driver.page_source)
+                active_orders_containers = self.find_active_order_containers(soup)
+                parse_container = self.parse_active_order_container
+                table_found = bool(active_orders_containers) or soup.select_one('table.responsive-table') is not None
             
             logging.info(f"📊 Encontrados {len(active_orders_containers)} contenedores de active_orders")
             console_log(f"Encontrados {len(active_orders_containers)} contenedores de active_orders", "DETECTION")
@@ -355,11 +484,14 @@ class OrderMonitor:
             # Procesar cada contenedor de active_orders
             new_orders_found = []
             existing_orders = []
+            seen_orders = {}
             
             for container in active_orders_containers:
-                order_data = self.parse_active_order_container(container)
+                order_data = parse_container(container)
                 if order_data:
                     order_id = order_data.get('order_id') or order_data.get('order_number') or order_data.get('task_id')
+                    if order_id:
+                        seen_orders[order_id] = order_data
                     
                     if order_id and order_id not in self.known_orders:
                         # Es una orden nueva
@@ -368,6 +500,15 @@ class OrderMonitor:
                         # Es una orden existente
                         existing_orders.append(order_data)
             
+            # Órdenes ya conocidas: guardar solo si hubo transición (estado, rider)
+            for order_data in existing_orders:
+                events = self.lifecycle.observe(order_data, current_time, is_new=False)
+                if events:
+                    self.order_stats['changed_orders'] += 1
+                    self.save_order_to_database(order_data, events)
+            
+            self.track_removed_orders(seen_orders, table_found, current_time)
+            
             # Mostrar tabla solo si hay órdenes nuevas
             if new_orders_found:
                 print("\n" + "="*100)
@@ -437,6 +578,129 @@ class OrderMonitor:
             console_log(f"Error extrayendo active_orders: {e}", "ERROR")
             return []
     
+    def collect_browser_rows(self):
+        """Filas del ciclo leídas en el navegador: las que avisó el observador o todas (None: usar page_source)"""
+        if self.mutation_watcher:
+            rows, self.pending_rows = self.pending_rows, None
+            # Las filas retiradas no llegan por el observador: releer todo cada resync_interval aunque haya cambios
+            full_read_due = (self.last_full_read_at is None or
+                             time.monotonic() - self.last_full_read_at >= MONITOR_CONFIG["resync_interval"])
+            if rows is not None and not full_read_due:
+                self.last_read_complete = False
+                return rows
+        
+        self.auto_refresh()
+        if self.mutation_watcher:
+            # Primera lectura, observador perdido, página recargada o relectura periódica: instalar y releer todo
+            self.mutation_watcher.install(self.driver)
+        
+        self.last_read_complete = True
+        self.last_full_read_at = time.monotonic()
+        return self.row_extractor.extract(self.driver) if self.row_extractor else None
+    
+    def auto_refresh(self):
+        """Recargar /tasks cada refresh_interval (una vista que dejó de actualizarse no genera mutaciones)"""
+        refresh_interval = MONITOR_CONFIG["refresh_interval"]
+        if not refresh_interval or time.monotonic() - self.last_refresh_at < refresh_interval:
+            return
+        try:
+            self.driver.refresh()
+            self.wait_for_orders_table(5)
+            console_log("Página /tasks recargada", "INFO")
+        except Exception as e:
+            logging.error(f"❌ Error recargando la página /tasks: {e}")
+        self.last_refresh_at = time.monotonic()
+    
+    def track_removed_orders(self, seen_orders, table_found, current_time):
+        """Emitir 'completed'/'removed' para las órdenes que salieron de la tabla
+        
+        Solo una lectura completa de la tabla dice qué órdenes ya no están; las
+        filas que avisa el observador solo actualizan la última versión vista.
+        """
+        if not self.last_read_complete:
+            self.page_orders.update(seen_orders)
+            return
+        if not table_found:
+            return  # Otra página (p. ej. sesión caducada): no se sabe qué órdenes siguen
+        
+        removed = [order_data for order_id, order_data in self.page_orders.items() if order_id not in seen_orders]
+        self.page_orders = seen_orders
+        for order_data in removed:
+            order_id = order_data.get('order_id') or order_data.get('order_number') or order_data.get('task_id')
+            self.known_orders.discard(order_id)  # Si vuelve a aparecer es una orden nueva
+            self.order_stats['removed_orders'] += 1
+            console_log(f"Active_order retirado de la página: {order_id}", "INFO")
+            events = self.lifecycle.remove(order_data, current_time)
+            if events:
+                self.save_order_to_database(order_data, events)
+    
+    def find_active_order_containers(self, soup):
+        """Buscar los contenedores de active_orders en el árbol de la página (page_source)"""
+        # Buscar específicamente elementos de active_orders
+        active_orders_containers = []
+        
+        # Estrategias específicas para active_orders basadas en la estructura real
+        active_orders_selectors = ACTIVE_ORDER_ROW_SELECTORS + [
+            # Selectores genéricos como respaldo
+            "div[class*='active_orders']",
+            "div[id*='active_orders']",
+            "section[class*='active_orders']",
+            "table[class*='active_orders']",
+            "ul[class*='active_orders']",
+            "div[class*='task']",
+            "div[class*='active']",
+            "tr[class*='active']",
+            "li[class*='active']",
+            ".active-orders",
+            ".active_orders",
+            ".task-item",
+            ".active-item"
+        ]
+        
+        # Buscar contenedores de active_orders
+        for selector in active_orders_selectors:
+            containers = soup.select(selector)
+            active_orders_containers.extend(containers)
+        
+        # Si no se encuentran contenedores específicos, buscar en toda la página
+        if not active_orders_containers:
+            logging.info("🔍 No se encontraron contenedores específicos de active_orders, buscando en toda la página")
+            console_log("No se encontraron contenedores específicos de active_orders, buscando en toda la página", "DETECTION")
+            
+            # Buscar específicamente en tablas con órdenes (incluyendo tablas desplegadas)
+            tables = soup.find_all('table')
+            for table in tables:
+                tbody = table.find('tbody')
+                if tbody:
+                    rows = tbody.find_all('tr')
+                    for row in rows:
+                        # Verificar si es una fila de orden
+                        if 'orders-list-item' in row.get('class', []) or 'inpreparation' in row.get('class', []):
+                            active_orders_containers.append(row)
+            
+            # Buscar también en divs que puedan contener tablas desplegadas
+            active_orders_divs = soup.find_all('div', class_=lambda x: x and 'active_orders' in x)
+            for div in active_orders_divs:
+                # Buscar tablas dentro del div
+                tables_in_div = div.find_all('table')
+                for table in tables_in_div:
+                    tbody = table.find('tbody')
+                    if tbody:
+                        rows = tbody.find_all('tr')
+                        for row in rows:
+                            if 'orders-list-item' in row.get('class', []) or 'inpreparation' in row.get('class', []):
+                                active_orders_containers.append(row)
+            
+            # Si aún no se encuentran, buscar elementos que contengan "order"
+            if not active_orders_containers:
+                all_elements = soup.find_all(['div', 'tr', 'li', 'section'])
+                for element in all_elements:
+                    element_text = element.get_text().lower()
+                    if 'order' in element_text or 'preparation' in element_text:
+                        active_orders_containers.append(element)
+        
+        return active_orders_containers
+    
     def parse_active_order_container(self, container):
         """Parsear un contenedor de active_order para extraer información"""
         try:
@@ -447,34 +711,14 @@ class OrderMonitor:
             }
             
             # Buscar ID de orden basado en la estructura real
-            order_id_selectors = [
-                ".order-id-field",
-                "div[class*='order-id']",
-                "td[data-label='#'] .order-id-field",
-                "td[data-label='#'] div",
-                "span[class*='order-id']",
-                "td[class*='order-id']",
-                ".order-id",
-                ".active-id"
-            ]
-            
-            for selector in order_id_selectors:
+            for selector in ACTIVE_ORDER_FIELD_SELECTORS['order_id']:
                 element = container.select_one(selector)
                 if element:
                     order_data['order_id'] = element.get_text(strip=True)
                     break
             
             # Buscar número de pedido (usar el mismo ID de orden)
-            order_number_selectors = [
-                ".order-id-field",
-                "div[class*='order-id']",
-                "td[data-label='#'] .order-id-field",
-                "span[class*='order-number']",
-                "td[class*='order-number']",
-                ".order-number"
-            ]
-            
-            for selector in order_number_selectors:
+            for selector in ACTIVE_ORDER_FIELD_SELECTORS['order_number']:
                 element = container.select_one(selector)
                 if element:
                     order_data['order_number'] = element.get_text(strip=True)
@@ -482,138 +726,58 @@ class OrderMonitor:
             
             # Si no se encuentra con selectores específicos, buscar en el texto
             if 'order_number' not in order_data and 'task_id' not in order_data:
-                text = container.get_text()
-                # Buscar patrones de números de tareas/pedidos
-                import re
-                patterns = [
-                    r'Task[:\s]*([A-Z0-9-]+)',
-                    r'Tarea[:\s]*([A-Z0-9-]+)',
-                    r'Order[:\s]*([A-Z0-9-]+)',
-                    r'Pedido[:\s]*([A-Z0-9-]+)',
-                    r'#([A-Z0-9-]+)',
-                    r'([A-Z]{2,3}-\d{4,})',
-                    r'ID[:\s]*([A-Z0-9-]+)',
-                    r'Active[:\s]*([A-Z0-9-]+)'
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, text, re.IGNORECASE)
-                    if match:
-                        if 'task_id' not in order_data:
-                            order_data['task_id'] = match.group(1)
-                        if 'order_number' not in order_data:
-                            order_data['order_number'] = match.group(1)
-                        break
+                # Buscar patrones de números de tareas/pedidos (una sola pasada con todos los patrones)
+                task_number = PATTERNS.search('order_id', container.get_text())
+                if task_number:
+                    if 'task_id' not in order_data:
+                        order_data['task_id'] = task_number
+                    if 'order_number' not in order_data:
+                        order_data['order_number'] = task_number
             
             # Buscar información del cliente basado en la estructura real
-            customer_selectors = [
-                ".customer-field a .link",
-                ".customer-field span.link",
-                "td .customer-field a",
-                "td .customer-field span",
-                "span[class*='customer']",
-                "span[class*='cliente']",
-                "span[class*='user']",
-                "td[class*='customer']",
-                "td[class*='cliente']",
-                "td[class*='user']"
-            ]
-            
-            for selector in customer_selectors:
+            for selector in ACTIVE_ORDER_FIELD_SELECTORS['customer_name']:
                 element = container.select_one(selector)
                 if element:
                     order_data['customer_name'] = element.get_text(strip=True)
                     break
             
             # Buscar dirección de entrega (tercera columna en la estructura real)
-            address_selectors = [
-                "td:nth-child(4) div",  # Tercera columna con dirección
-                "td:nth-child(4) .cell div",
-                "span[class*='address']",
-                "span[class*='direccion']",
-                "span[class*='location']",
-                "td[class*='address']",
-                "td[class*='direccion']",
-                "td[class*='location']"
-            ]
-            
-            for selector in address_selectors:
+            for selector in ACTIVE_ORDER_FIELD_SELECTORS['delivery_address']:
                 element = container.select_one(selector)
                 if element:
                     order_data['delivery_address'] = element.get_text(strip=True)
                     break
             
             # Buscar estado de la orden basado en la estructura real
-            status_selectors = [
-                "tr[class*='inpreparation']",  # Estado en la clase del tr
-                "tr[class*='orders-list-item']",  # Clase que indica orden activa
-                ".purchase-status-field",
-                "td[class*='status']",
-                "span[class*='status']",
-                "span[class*='estado']",
-                "span[class*='state']",
-                "td[class*='estado']",
-                "td[class*='state']"
-            ]
-            
-            for selector in status_selectors:
+            for selector in ACTIVE_ORDER_FIELD_SELECTORS['status']:
                 element = container.select_one(selector)
                 if element:
                     order_data['status'] = element.get_text(strip=True)
                     break
             
             # Buscar monto total basado en la estructura real
-            amount_selectors = [
-                ".price",
-                "span.price",
-                "td .price",
-                "td:nth-child(5) .price",  # Quinta columna con precio
-                "td:nth-child(5) span",
-                "span[class*='amount']",
-                "span[class*='total']",
-                "span[class*='monto']",
-                "span[class*='price']",
-                "td[class*='amount']",
-                "td[class*='total']",
-                "td[class*='monto']",
-                "td[class*='price']"
-            ]
-            
-            for selector in amount_selectors:
+            for selector in ACTIVE_ORDER_FIELD_SELECTORS['total_amount']:
                 element = container.select_one(selector)
                 if element:
-                    amount_text = element.get_text(strip=True)
-                    # Extraer números del texto
-                    import re
-                    numbers = re.findall(r'[\d,]+\.?\d*', amount_text)
-                    if numbers:
-                        order_data['total_amount'] = numbers[0]
+                    amount = PATTERNS.search('amount', element.get_text(strip=True))
+                    if amount:
+                        order_data['total_amount'] = amount
                     break
             
             # Buscar información adicional de la orden
-            description_selectors = [
-                ".vendor-field a .link",  # Nombre del restaurante/vendor
-                ".vendor-field span.link",
-                "td .vendor-field a",
-                "td .vendor-field span",
-                ".rider-name a .link",  # Nombre del repartidor
-                ".rider-name span.link",
-                "td .rider-name a",
-                "td .rider-name span",
-                "span[class*='description']",
-                "span[class*='descripcion']",
-                "span[class*='task-desc']",
-                "td[class*='description']",
-                "td[class*='descripcion']",
-                "td[class*='task-desc']"
-            ]
-            
-            for selector in description_selectors:
+            for selector in ACTIVE_ORDER_FIELD_SELECTORS['description']:
                 element = container.select_one(selector)
                 if element:
                     order_data['description'] = element.get_text(strip=True)
                     break
             
+            # Buscar repartidor asignado (para el evento rider_assigned)
+            for selector in ACTIVE_ORDER_FIELD_SELECTORS['rider']:
+                element = container.select_one(selector)
+                if element:
+                    order_data['rider'] = element.get_text(strip=True)
+                    break
+            
             # Solo retornar si se encontró al menos un ID de orden o número de pedido
             if 'order_id' in order_data or 'order_number' in order_data:
                 return order_data
@@ -624,97 +788,156 @@ class OrderMonitor:
             logging.error(f"❌ Error parseando contenedor de active_order: {e}")
             return None
     
-    def save_order_to_database(self, order_data):
-        """Guardar active_order en la base de datos"""
+    def _parse_browser_row(self, row):
+        """Parsear los campos de una fila leídos en el navegador (mismas reglas que parse_active_order_container)"""
         try:
-            # Crear cliente si no existe
-            customer_name = order_data.get('customer_name', 'Cliente Desconocido')
+            fields = row['fields']
+            order_data = {
+                'timestamp': datetime.now().isoformat(),
+                'type': 'active_order'
+            }
             
-            # Verificar si el cliente ya existe
-            self.db_cursor.execute("SELECT id FROM customers WHERE name = %s", (customer_name,))
-            customer_result = self.db_cursor.fetchone()
+            for field in ('order_id', 'order_number'):
+                if field in fields:
+                    order_data[field] = fields[field]
             
-            if customer_result:
-                customer_id = customer_result['id']
-            else:
-                # Crear nuevo cliente
-                self.db_cursor.execute("""
+            # Si no se encontró el número de pedido, buscar en el texto de la fila
+            if 'order_number' not in order_data:
+                task_number = PATTERNS.search('order_id', row.get('text', ''))
+                if task_number:
+                    order_data['task_id'] = task_number
+                    order_data['order_number'] = task_number
+            
+            for field in ('customer_name', 'delivery_address', 'status'):
+                if field in fields:
+                    order_data[field] = fields[field]
+            
+            if 'total_amount' in fields:
+                amount = PATTERNS.search('amount', fields['total_amount'])
+                if amount:
+                    order_data['total_amount'] = amount
+            
+            for field in ('description', 'rider'):
+                if field in fields:
+                    order_data[field] = fields[field]
+            
+            # Solo retornar si se encontró al menos un ID de orden o número de pedido
+            if 'order_id' in order_data or 'order_number' in order_data:
+                return order_data
+            
+            return None
+            
+        except Exception as e:
+            logging.error(f"❌ Error parseando fila del navegador: {e}")
+            return None
+    
+    def save_order_to_database(self, order_data, events=None):
+        """Guardar active_order en la base de datos (una sola sentencia por orden)
+        
+        events son los eventos de ciclo de vida ya calculados; si no se pasan,
+        se comparan los datos con la última instantánea de la orden.
+        """
+        customer_name = order_data.get('customer_name', 'Cliente Desconocido')
+        order_number = order_data.get('order_number') or order_data.get('order_id')
+        
+        try:
+            # El id del cliente sale de la caché; si no está, la misma sentencia lo busca o lo crea
+            customer_id = self.customer_ids.get(customer_name)
+            is_update = order_number in self.order_ids
+            notes = f"Active Order from /tasks - {order_data.get('description', 'Sin descripción')} - ID: {order_data.get('order_id', 'N/A')}"
+            
+            # Eventos de transición respecto a la última instantánea (vacío si nada cambió)
+            if events is None:
+                events = self.lifecycle.observe(order_data, is_new=not is_update)
+            event_rows = [
+                {
+                    'event_type': event['event_type'],
+                    'occurred_at': event['occurred_at'],
+                    'raw_data': {
+                        'previous_value': event['previous_value'],
+                        'new_value': event['new_value'],
+                        'order': order_data
+                    }
+                }
+                for event in events
+            ]
+            
+            self.db_cursor.execute("""
+                WITH existing_customer AS (
+                    SELECT id FROM customers
+                    WHERE %(customer_id)s::integer IS NULL AND name = %(customer_name)s
+                    ORDER BY id
+                    LIMIT 1
+                ),
+                new_customer AS (
                     INSERT INTO customers (name, email, phone)
-                    VALUES (%s, %s, %s)
+                    SELECT %(customer_name)s, %(customer_email)s, 'N/A'
+                    WHERE %(customer_id)s::integer IS NULL
+                      AND NOT EXISTS (SELECT 1 FROM existing_customer)
                     RETURNING id
-                """, (customer_name, f"{customer_name.lower().replace(' ', '')}@example.com", "N/A"))
-                customer_id = self.db_cursor.fetchone()['id']
-            
-            # Verificar si el pedido ya existe
-            order_number = order_data.get('order_number') or order_data.get('order_id')
-            self.db_cursor.execute("SELECT id FROM orders WHERE order_number = %s", (order_number,))
-            order_result = self.db_cursor.fetchone()
-            
-            if order_result:
-                # Actualizar pedido existente
-                order_id = order_result['id']
-                self.db_cursor.execute("""
-                    UPDATE orders SET 
-                        status = %s,
-                        delivery_address = %s,
-                        notes = %s,
+                ),
+                customer AS (
+                    SELECT %(customer_id)s::integer AS id WHERE %(customer_id)s::integer IS NOT NULL
+                    UNION ALL SELECT id FROM existing_customer
+                    UNION ALL SELECT id FROM new_customer
+                ),
+                upserted_order AS (
+                    INSERT INTO orders (order_number, status, customer_id, delivery_address,
+                                        product_type, priority_level, created_at, notes)
+                    SELECT %(order_number)s, %(status)s, customer.id, %(delivery_address)s,
+                           'Active Order', 'high', %(created_at)s, %(notes)s
+                    FROM customer
+                    LIMIT 1
+                    ON CONFLICT (order_number) DO UPDATE SET
+                        status = EXCLUDED.status,
+                        delivery_address = EXCLUDED.delivery_address,
+                        notes = EXCLUDED.notes,
                         updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                """, (
-                    order_data.get('status', 'active'),
-                    order_data.get('delivery_address', 'Dirección no especificada'),
-                    f"Active Order from /tasks - {order_data.get('description', 'Sin descripción')} - ID: {order_data.get('order_id', 'N/A')}",
-                    order_id
-                ))
-            else:
-                # Crear nuevo pedido
-                self.db_cursor.execute("""
-                    INSERT INTO orders (order_number, status, customer_id, delivery_address, 
-                                       product_type, priority_level, created_at, notes)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    order_number,
-                    order_data.get('status', 'active'),
-                    customer_id,
-                    order_data.get('delivery_address', 'Dirección no especificada'),
-                    'Active Order',  # Tipo específico para active_orders
-                    'high',  # Prioridad alta para active_orders
-                    datetime.now(),
-                    f"Active Order from /tasks - {order_data.get('description', 'Sin descripción')} - ID: {order_data.get('order_id', 'N/A')}"
-                ))
-                order_id = self.db_cursor.fetchone()['id']
-            
-            # Crear evento de detección específico
-            self.db_cursor.execute("""
-                INSERT INTO order_events (order_id, event_type, screen_coordinates, raw_data)
-                VALUES (%s, %s, %s, %s)
-            """, (
-                order_id,
-                'active_order_detected',
-                'x:0,y:0',
-                json.dumps(order_data)
-            ))
-            
-            # Crear notificación específica
-            self.db_cursor.execute("""
-                INSERT INTO notifications (order_id, notification_type, recipient, message, status)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                order_id,
-                'system',
-                'admin@besmartdelivery.mx',
-                f"Nuevo active_order detectado en /tasks: {order_number}",
-                'sent'
-            ))
-            
+                    RETURNING id, customer_id
+                ),
+                lifecycle_events AS (
+                    INSERT INTO order_events (order_id, event_type, event_timestamp, screen_coordinates, raw_data)
+                    SELECT upserted_order.id, event.event_type, event.occurred_at, 'x:0,y:0', event.raw_data
+                    FROM upserted_order,
+                         jsonb_to_recordset(%(events)s::jsonb) AS event(event_type text, occurred_at timestamp, raw_data jsonb)
+                ),
+                notification AS (
+                    INSERT INTO notifications (order_id, notification_type, recipient, message, status)
+                    SELECT id, 'system', 'admin@besmartdelivery.mx', %(message)s, 'sent'
+                    FROM upserted_order
+                )
+                SELECT id, customer_id FROM upserted_order
+            """, {
+                'customer_id': customer_id,
+                'customer_name': customer_name,
+                'customer_email': f"{customer_name.lower().replace(' ', '')}@example.com",
+                'order_number': order_number,
+                'status': order_data.get('status', 'active'),
+                'delivery_address': order_data.get('delivery_address', 'Dirección no especificada'),
+                'created_at': datetime.now(),
+                'notes': notes,
+                'events': json.dumps(event_rows, default=str),
+                'message': f"Nuevo active_order detectado en /tasks: {order_number}"
+            })
+            result = self.db_cursor.fetchone()
             self.db_conn.commit()
-            logging.info(f"✅ Active_order guardado en BD: {order_number}")
+            
+            # Actualizar la caché solo después del commit
+            self.order_ids[order_number] = result['id']
+            if customer_id is None:
+                self.customer_ids[customer_name] = result['customer_id']
+            
+            logging.info(f"✅ Active_order {'actualizado' if is_update else 'guardado'} en BD: {order_number}")
             return True
             
         except Exception as e:
             logging.error(f"❌ Error guardando active_order en BD: {e}")
             self.db_conn.rollback()
+            # Un id en caché puede haber quedado obsoleto (p. ej. cliente borrado)
+            self.customer_ids.pop(customer_name)
+            self.order_ids.pop(order_number)
+            # Los eventos no se guardaron: volver a emitirlos en el siguiente intento
+            self.lifecycle.forget(order_data.get('order_id'))
             return False
     
     def play_notification_sound(self):
@@ -780,12 +1003,25 @@ class OrderMonitor:
                     self.display_stats()
                 
                 # Esperar antes de la siguiente verificación
-                time.sleep(MONITOR_CONFIG["check_interval"])
+                self.wait_next_check(len(new_orders))
                 
             except Exception as e:
                 logging.error(f"❌ Error en monitoreo de active_orders: {e}")
                 console_log(f"Error en monitoreo de active_orders: {e}", "ERROR")
-                time.sleep(MONITOR_CONFIG["check_interval"])
+                self.wait_next_check(0)
+    
+    def wait_next_check(self, activity):
+        """Esperar hasta la siguiente verificación (más pronto si hubo órdenes nuevas o si el observador ve cambios)"""
+        if self.poll_scheduler:
+            self.poll_scheduler.record_poll(activity)
+            interval = self.poll_scheduler.next_interval()
+        else:
+            interval = MONITOR_CONFIG["check_interval"]
+        
+        if self.mutation_watcher and self.mutation_watcher.installed:
+            self.pending_rows = self.mutation_watcher.wait_for_changes(self.driver, interval)
+        else:
+            time.sleep(interval)
     
     def display_stats(self):
         """Mostrar estadísticas del monitoreo de active_orders"""
@@ -793,7 +1029,24 @@ class OrderMonitor:
         print(f"   Verificaciones totales: {self.order_stats['total_checks']}")
         print(f"   Nuevos active_orders detectados: {self.order_stats['new_orders']}")
         print(f"   Última verificación: {self.last_check_time.strftime('%H:%M:%S')}")
+        if self.poll_scheduler:
+            poll_stats = self.poll_scheduler.get_stats()
+            print(f"   Intervalo de sondeo: {poll_stats['current_interval']:.0f}s actual, {poll_stats['avg_interval']:.0f}s medio")
         print(f"   Active_orders conocidos: {len(self.known_orders)}")
+        if self.row_extractor:
+            extract_stats = self.row_extractor.get_stats()
+            print(f"   Extracción en navegador: {extract_stats['calls']} llamadas, "
+                  f"{extract_stats['avg_extract_time'] * 1000:.0f}ms media, {extract_stats['fallbacks']} con page_source")
+        if self.mutation_watcher:
+            watcher_stats = self.mutation_watcher.get_stats()
+            print(f"   Observador: {watcher_stats['wakeups']}/{watcher_stats['waits']} esperas con cambios, "
+                  f"{watcher_stats['rows']} filas, {watcher_stats['lost']} perdidos")
+        customer_stats = self.customer_ids.get_stats()
+        print(f"   Caché de identidades: {customer_stats['size']} clientes ({customer_stats['hit_rate'] * 100:.0f}% aciertos), {len(self.order_ids)} pedidos")
+        lifecycle_stats = self.lifecycle.get_stats()
+        print(f"   Eventos de ciclo de vida: creadas={lifecycle_stats.get('created', 0)}, "
+              f"cambios de estado={lifecycle_stats.get('status_changed', 0)}, riders asignados={lifecycle_stats.get('rider_assigned', 0)}, "
+              f"completadas={lifecycle_stats.get('completed', 0)}, retiradas={lifecycle_stats.get('removed', 0)}")
         print(f"   Página monitoreada: /task")
     
     def start_monitoring(self):
@@ -818,7 +1071,12 @@ class OrderMonitor:
             print("="*60)
             print("✅ Sistema iniciado correctamente")
             print(f"🌐 Página monitoreada: /tasks")
-            print(f"⏱️  Intervalo de verificación: {MONITOR_CONFIG['check_interval']} segundos")
+            if self.mutation_watcher:
+                print(f"⚡ Detección por eventos: MutationObserver en la tabla de órdenes")
+            if self.poll_scheduler:
+                print(f"⏱️  Intervalo de verificación: adaptativo {MONITOR_CONFIG['poll_min_interval']}-{MONITOR_CONFIG['poll_max_interval']} segundos")
+            else:
+                print(f"⏱️  Intervalo de verificación: {MONITOR_CONFIG['check_interval']} segundos")
             print(f"🔔 Notificaciones de sonido: {'Activadas' if MONITOR_CONFIG['notification_sound'] else 'Desactivadas'}")
             print("="*60)
             print("💡 Presiona Ctrl+C para detener el monitoreo")
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Monitor de Pedidos en Tiempo Real - Motor Asíncrono
+Varias cuentas o filtros de estado en un solo proceso (TERMINAL_MONITOR_CONFIG["monitor_targets"])
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Cambiar al directorio del proyecto
+project_root = Path(__file__).parent.parent.parent
+os.chdir(project_root)
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(project_root / "src"))
+
+# Importar el motor asíncrono modular
+from core.monitors.async_engine import main
+
+if __name__ == "__main__":
+    main()
@@ -13,11 +13,9 @@ import logging
 from datetime import datetime, timedelta
 import threading
 from collections import defaultdict, deque
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 import hashlib
-import re
 
 # Agregar el directorio src al path
 project_root = Path(__file__).parent.parent.parent
@@ -32,24 +30,50 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
 import random
 
+from core.monitors.utils import OrderParser
+from core.monitors.known_orders import KnownOrderStore
+from core.monitors.dedup_state import DedupStateStore
+from core.monitors.html_backend import parse_html
+from core.monitors.raw_html import RawHtmlCapture, RAW_HTML_LIMIT, compress_raw_html
+from core.monitors.patterns import PATTERNS
+from core.monitors.scheduler import AdaptivePollScheduler
+from core.monitors.http_client import HTTPClient
+from core.monitors.browser_extract import BrowserRowExtractor, MutationWatcher
+from database.connection_pool import get_pool
+
 # Cargar variables de entorno
 load_dotenv(project_root / "config" / ".env")
 
 # Configuración mejorada
 MONITOR_CONFIG = {
-    "check_interval": 15,           # Segundos entre verificaciones (más frecuente)
+    "check_interval": 15,           # Segundos entre verificaciones (más frecuente; inicial si el sondeo es adaptativo)
+    "adaptive_polling": True,       # Ajustar el intervalo a la actividad observada
+    "poll_min_interval": 5,         # Intervalo mínimo con actividad (segundos)
+    "poll_max_interval": 90,        # Intervalo máximo sin actividad (segundos)
+    "poll_tighten_factor": 0.5,     # Factor aplicado al intervalo tras un sondeo con órdenes o cambios
+    "poll_backoff_factor": 1.3,     # Factor aplicado al intervalo tras un sondeo sin actividad
+    "poll_jitter": 0.2,             # Variación aleatoria del intervalo (±20%)
+    "poll_hour_profiles": {},       # Límites por hora, p. ej. {"12-15": [5, 20], "0-6": [45, 180]}
     "order_timeout": 300,           # Segundos para considerar un pedido como "nuevo"
     "max_retries": 5,               # Máximo de reintentos en caso de error
     "notification_sound": True,     # Sonido de notificación
     "log_level": "INFO",
     "max_known_orders": 1000,       # Máximo de órdenes conocidas en memoria
+    "dedup_state_file": "data/enhanced_monitor_state.sqlite3", # Estado de deduplicación persistente ("" = desactivado)
+    "dedup_state_retention": 86400, # Segundos que se conserva una orden en el estado persistente
+    "raw_html_capture": "new",      # raw_html a guardar (comprimido): "off", "new" (solo nuevas), "sampled" o "all"
+    "raw_html_sample_rate": 0.1,    # Fracción de órdenes nuevas/modificadas con raw_html en modo "sampled"
+    "hybrid_mode": True,            # Login con Chrome, cookies a una sesión HTTP y navegador cerrado mientras se sondea
+                                    # (False = modo navegador, el único que usa browser_extraction y event_driven)
+    "session_store_file": "data/enhanced_session.bin", # Sesión HTTP cifrada del modo híbrido ("" = desactivado)
+    "browser_extraction": True,     # Solo con hybrid_mode=False: filas leídas con un solo execute_script (page_source como respaldo)
+    "event_driven": True,           # Solo con hybrid_mode=False: MutationObserver en la tabla; la espera termina al cambiar una fila
     "page_load_timeout": 30,        # Timeout para cargar página
     "element_wait_timeout": 10,     # Timeout para esperar elementos
     "enable_auto_refresh": True,    # Auto-refresh de página
-    "refresh_interval": 300,        # Segundos entre auto-refresh
+    "refresh_interval": 300,        # Segundos entre auto-refresh (con event_driven, solo tras ese tiempo sin cambios)
     "enable_debug_mode": False,     # Modo debug para desarrollo
     "save_screenshots": True,       # Guardar screenshots de nuevas órdenes
     "enable_webhook": False,        # Habilitar webhooks para notificaciones
@@ -81,6 +105,64 @@ ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "federico")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "***CONTRASEÑA_OCULTA***")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# La página no cambió desde el último ciclo (distinto de None, que indica que no se pudo obtener)
+PAGE_UNCHANGED = object()
+
+# Filas de órdenes y selectores de cada campo (gana el primer elemento encontrado); los usan tanto el
+# parseo con BeautifulSoup como la extracción dentro del navegador
+ORDER_ROW_SELECTORS = [
+    "tr.orders-list-item",
+    "tr[class*='orders-list-item']",
+    "tr[class*='inpreparation']",
+    "div[class*='active_orders'] tbody tr",
+    "div[class*='task'] tbody tr",
+    "table[class*='orders'] tbody tr",
+    "table[class*='tasks'] tbody tr"
+]
+
+ORDER_FIELD_SELECTORS = {
+    'order_id': [
+        ".order-id-field",
+        "div[class*='order-id']",
+        "td[data-label='#'] div",
+        "span[class*='order-id']",
+        ".order-id",
+        ".task-id"
+    ],
+    'customer_name': [
+        ".customer-field a",
+        ".customer-field span",
+        "span[class*='customer']",
+        "span[class*='cliente']",
+        "td[class*='customer']"
+    ],
+    'delivery_address': [
+        "td:nth-child(4) div",
+        "span[class*='address']",
+        "span[class*='direccion']",
+        "td[class*='address']"
+    ],
+    'restaurant': [
+        ".vendor-field a",
+        ".vendor-field span",
+        "span[class*='vendor']",
+        "span[class*='restaurant']",
+        "td[class*='vendor']"
+    ],
+    'total_amount': [
+        ".price",
+        "span.price",
+        "td .price",
+        "span[class*='amount']",
+        "span[class*='total']"
+    ],
+    'status': [
+        "span[class*='status']",
+        "td[class*='status']",
+        ".status-field"
+    ]
+}
+
 class EnhancedConsoleLogger:
     """Logger mejorado para consola con colores y emojis"""
     
@@ -187,19 +269,46 @@ class EnhancedOrderMonitor:
         self.is_running = False
         self.last_check_time = None
         self.known_orders = set()
-        self.order_hashes = set()  # Para detección más precisa
+        self.order_hashes = KnownOrderStore(
+            max_size=MONITOR_CONFIG["max_known_orders"],
+            ttl=MONITOR_CONFIG["order_timeout"]
+        )
         self.order_stats = defaultdict(int)
         self.analytics = OrderAnalytics()
         self.performance_start_time = None
         self.last_refresh_time = None
         self.error_count = 0
         self.success_count = 0
+        self.dedup_state = None
+        self.raw_html_capture = RawHtmlCapture(MONITOR_CONFIG["raw_html_capture"], MONITOR_CONFIG["raw_html_sample_rate"])
+        self.poll_scheduler = None
+        if MONITOR_CONFIG["adaptive_polling"]:
+            self.poll_scheduler = AdaptivePollScheduler(
+                MONITOR_CONFIG["check_interval"],
+                min_interval=MONITOR_CONFIG["poll_min_interval"],
+                max_interval=MONITOR_CONFIG["poll_max_interval"],
+                tighten_factor=MONITOR_CONFIG["poll_tighten_factor"],
+                backoff_factor=MONITOR_CONFIG["poll_backoff_factor"],
+                jitter=MONITOR_CONFIG["poll_jitter"],
+                hour_profiles=MONITOR_CONFIG["poll_hour_profiles"],
+                time_stats=self.analytics.time_stats
+            )
+        self.last_cycle_activity = 0  # Órdenes nuevas o modificadas del último sondeo
+        self.http_client = None  # Modo híbrido: sondeo por HTTP con la sesión del navegador
+        self.row_extractor = None  # Extracción en el navegador y observador: solo en modo navegador
+        if MONITOR_CONFIG["browser_extraction"] and not MONITOR_CONFIG["hybrid_mode"]:
+            self.row_extractor = BrowserRowExtractor(ORDER_ROW_SELECTORS, ORDER_FIELD_SELECTORS, text_field='order_id')
+        self.mutation_watcher = None
+        if self.row_extractor and MONITOR_CONFIG["event_driven"]:
+            self.mutation_watcher = MutationWatcher(self.row_extractor)
+        self.pending_rows = None  # Filas que avisó el observador durante la última espera
         self.setup_database()
+        self.setup_dedup_state()
         
     def setup_database(self):
         """Configurar conexión a la base de datos con manejo de errores mejorado"""
         try:
-            self.db_conn = psycopg2.connect(DATABASE_URL)
+            self.db_conn = get_pool(DATABASE_URL).connect()
             self.db_cursor = self.db_conn.cursor(cursor_factory=RealDictCursor)
             logging.info("✅ Conexión a base de datos establecida")
             EnhancedConsoleLogger.success("Conexión a base de datos establecida")
@@ -211,6 +320,25 @@ class EnhancedOrderMonitor:
             logging.error(f"❌ Error conectando a la base de datos: {e}")
             EnhancedConsoleLogger.error(f"Error conectando a la base de datos: {e}")
     
+    def setup_dedup_state(self):
+        """Cargar el estado de deduplicación persistente para no repetir órdenes tras un reinicio"""
+        state_file = MONITOR_CONFIG.get("dedup_state_file")
+        if not state_file:
+            return
+        
+        try:
+            self.dedup_state = DedupStateStore(
+                project_root / state_file,
+                retention=MONITOR_CONFIG["dedup_state_retention"]
+            )
+            loaded = self.dedup_state.load_into(self.order_hashes)
+            self.order_hashes.persistence = self.dedup_state
+            EnhancedConsoleLogger.success(f"Estado de deduplicación restaurado ({loaded} órdenes)")
+            
+        except Exception as e:
+            logging.error(f"❌ Error cargando estado de deduplicación: {e}")
+            EnhancedConsoleLogger.error(f"Error cargando estado de deduplicación: {e}")
+    
     def create_orders_table(self):
         """Crear tabla de órdenes con estructura mejorada"""
         try:
@@ -238,6 +366,9 @@ class EnhancedOrderMonitor:
             """
             
             self.db_cursor.execute(create_table_query)
+            self.db_cursor.execute("ALTER TABLE enhanced_orders ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)")
+            # raw_html comprimido con zlib (la columna TEXT ya no se escribe)
+            self.db_cursor.execute("ALTER TABLE enhanced_orders ADD COLUMN IF NOT EXISTS raw_html_compressed BYTEA")
             self.db_conn.commit()
             logging.info("✅ Tabla de órdenes mejorada creada/verificada")
             
@@ -427,6 +558,103 @@ class EnhancedOrderMonitor:
         except Exception:
             return False
     
+    def browser_login(self):
+        """Modo híbrido: login con Chrome (estrategias 1-3), cookies a la sesión HTTP y cerrar Chrome"""
+        try:
+            EnhancedConsoleLogger.info("Abriendo navegador para iniciar sesión...")
+            if not self.setup_driver():
+                return False
+            if not self.login():
+                return False
+            self.find_orders_page()
+            
+            cookies = self.driver.get_cookies()
+            user_agent = self.driver.execute_script("return navigator.userAgent")
+            return self.http_client.import_browser_cookies(cookies, user_agent)
+            
+        except Exception as e:
+            logging.error(f"❌ Error en login con navegador: {e}")
+            EnhancedConsoleLogger.error(f"Error en login con navegador: {e}")
+            return False
+        
+        finally:
+            # El navegador solo vive durante el login
+            if self.driver:
+                self.driver.quit()
+                self.driver = None
+                EnhancedConsoleLogger.info("Navegador cerrado, sondeo por HTTP")
+    
+    def _get_page_source(self):
+        """HTML de la página de órdenes (por HTTP en modo híbrido o desde el navegador), PAGE_UNCHANGED o None si falló"""
+        if self.http_client:
+            page = self.http_client.get_orders_page()
+            if page is None:
+                return None
+            if self.http_client.page_unchanged:
+                # 304 o mismo contenido: las órdenes siguen en la página, que no expiren por TTL
+                self.order_hashes.touch_all()
+                return PAGE_UNCHANGED
+            return page.text
+        
+        self._auto_refresh()
+        return self.driver.page_source
+    
+    def _auto_refresh(self):
+        """Refrescar el navegador si está habilitado y pasó refresh_interval"""
+        if MONITOR_CONFIG["enable_auto_refresh"]:
+            current_time = time.time()
+            if not self.last_refresh_time or (current_time - self.last_refresh_time) > MONITOR_CONFIG["refresh_interval"]:
+                self.driver.refresh()
+                self._wait_for_orders_table()
+                self.last_refresh_time = current_time
+                EnhancedConsoleLogger.info("Página refrescada automáticamente")
+    
+    def _collect_orders(self):
+        """Órdenes de la página como pares (order_data, fila); PAGE_UNCHANGED si no cambió, None si no se pudo leer
+        
+        La fila es el contenedor de BeautifulSoup o, con la extracción en el
+        navegador, el índice de la fila (su HTML se pide solo si se captura).
+        """
+        if self.mutation_watcher:
+            rows, self.pending_rows = self.pending_rows, None
+            # Sin cambios durante refresh_interval: recargar y releer todo por si la vista dejó de actualizarse
+            if rows is not None and self.mutation_watcher.silent_for() < MONITOR_CONFIG["refresh_interval"]:
+                # Observador intacto: las filas sin mutaciones siguen en la página, que no expiren por TTL
+                self.order_hashes.touch_all()
+                if rows:
+                    EnhancedConsoleLogger.detection(f"{len(rows)} filas nuevas o modificadas (observador)")
+                return [(self._parse_browser_row(row), row['index']) for row in rows]
+        
+        if self.row_extractor:
+            self._auto_refresh()
+            if self.mutation_watcher:
+                # Antes de leer: un cambio entre la lectura y la instalación no se pierde
+                self.mutation_watcher.install(self.driver)
+            rows = self.row_extractor.extract(self.driver)
+            if rows is not None:
+                EnhancedConsoleLogger.detection(f"Encontradas {len(rows)} filas de órdenes en el navegador")
+                return [(self._parse_browser_row(row), row['index']) for row in rows]
+        
+        page_source = self._get_page_source()
+        if page_source is None or page_source is PAGE_UNCHANGED:
+            return page_source
+        soup = parse_html(page_source)
+        
+        # Estrategias de detección mejoradas
+        order_containers = self._find_order_containers(soup)
+        EnhancedConsoleLogger.detection(f"Encontrados {len(order_containers)} contenedores de órdenes")
+        return [(self._parse_order_container(container), container) for container in order_containers]
+    
+    def _attach_raw_html(self, captured):
+        """Guardar el HTML de la fila en las órdenes capturadas (una sola llamada al navegador para todas)"""
+        indexes = [row for _, row in captured if isinstance(row, int)]
+        row_html = self.row_extractor.row_html(self.driver, indexes) if indexes else {}
+        
+        for order_data, row in captured:
+            raw_html = row_html.get(row) if isinstance(row, int) else str(row)
+            if raw_html:
+                order_data['raw_html'] = raw_html[:RAW_HTML_LIMIT]
+    
     def find_orders_page(self):
         """Navegar a la página de órdenes con manejo de errores mejorado"""
         try:
@@ -434,7 +662,7 @@ class EnhancedOrderMonitor:
             
             # Intentar navegar directamente a /tasks
             self.driver.get(f"{LOGIN_URL.rstrip('/')}/tasks")
-            time.sleep(3)
+            self._wait_for_orders_table()
             
             # Verificar si estamos en la página correcta
             if "tasks" in self.driver.current_url.lower():
@@ -445,7 +673,7 @@ class EnhancedOrderMonitor:
             try:
                 tasks_link = self.driver.find_element(By.XPATH, "//a[contains(@href, 'tasks') or contains(text(), 'Tasks') or contains(text(), 'Tareas')]")
                 tasks_link.click()
-                time.sleep(3)
+                self._wait_for_orders_table()
                 EnhancedConsoleLogger.success("Navegación a página de órdenes exitosa")
                 return True
             except:
@@ -459,63 +687,82 @@ class EnhancedOrderMonitor:
             EnhancedConsoleLogger.error(f"Error navegando a página de órdenes: {e}")
             return False
     
+    def _wait_for_orders_table(self, timeout=3):
+        """Esperar a que aparezca la tabla de órdenes (como mucho `timeout` segundos) en vez de una pausa fija"""
+        try:
+            WebDriverWait(self.driver, timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "table.responsive-table"))
+            )
+            return True
+        except TimeoutException:
+            return False
+    
     def generate_order_hash(self, order_data):
-        """Generar hash único para la orden basado en sus datos"""
-        hash_string = f"{order_data.get('order_id', '')}{order_data.get('customer_name', '')}{order_data.get('delivery_address', '')}{order_data.get('timestamp', '')}"
-        return hashlib.sha256(hash_string.encode()).hexdigest()
+        """Generar hash estable de identidad para la orden"""
+        return OrderParser.generate_order_hash(order_data)
     
     def extract_new_orders(self):
         """Extraer nuevas órdenes con detección mejorada"""
         try:
             start_time = time.time()
+            self.last_cycle_activity = 0
             EnhancedConsoleLogger.detection("Extrayendo órdenes de la página...")
             
-            # Auto-refresh si está habilitado
-            if MONITOR_CONFIG["enable_auto_refresh"]:
-                current_time = time.time()
-                if not self.last_refresh_time or (current_time - self.last_refresh_time) > MONITOR_CONFIG["refresh_interval"]:
-                    self.driver.refresh()
-                    time.sleep(3)
-                    self.last_refresh_time = current_time
-                    EnhancedConsoleLogger.info("Página refrescada automáticamente")
-            
-            page_source = self.driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
+            orders = self._collect_orders()
+            if orders is PAGE_UNCHANGED:
+                EnhancedConsoleLogger.info("Sin cambios en la página")
+                return []
+            if orders is None:
+                EnhancedConsoleLogger.warning("No se pudo obtener contenido de la página")
+                return []
             
             new_orders = []
+            changed_orders = []
+            captured = []
             current_time = datetime.now()
             
-            # Estrategias de detección mejoradas
-            order_containers = self._find_order_containers(soup)
-            
-            EnhancedConsoleLogger.detection(f"Encontrados {len(order_containers)} contenedores de órdenes")
-            
-            # Procesar cada contenedor
-            for container in order_containers:
-                order_data = self._parse_order_container(container)
-                if order_data:
-                    order_hash = self.generate_order_hash(order_data)
-                    
-                    if order_hash not in self.order_hashes:
-                        # Es una orden nueva
-                        order_data['order_hash'] = order_hash
-                        order_data['detected_at'] = current_time.isoformat()
-                        order_data['source'] = 'enhanced_monitor'
-                        order_data['page'] = '/tasks'
-                        
-                        new_orders.append(order_data)
-                        self.order_hashes.add(order_hash)
-                        self.order_stats['new_orders'] += 1
-                        
-                        # Agregar a analytics
-                        self.analytics.add_order(order_data)
-                        
-                        EnhancedConsoleLogger.notification(f"Nueva orden detectada: {order_data.get('order_id', 'N/A')}")
-                        
-                        # Limpiar hashes antiguos si excede el límite
-                        if len(self.order_hashes) > MONITOR_CONFIG["max_known_orders"]:
-                            self.order_hashes.clear()
-                            self.known_orders.clear()
+            # Procesar cada orden
+            for order_data, row in orders:
+                if not order_data:
+                    continue
+                
+                order_key = OrderParser.generate_order_key(order_data)
+                content_hash = OrderParser.generate_content_fingerprint(order_data)
+                previous_hash = self.order_hashes.get(order_key)
+                
+                if previous_hash == content_hash:
+                    continue
+                
+                order_data['order_hash'] = self.generate_order_hash(order_data)
+                order_data['content_hash'] = content_hash
+                order_data['detected_at'] = current_time.isoformat()
+                order_data['source'] = 'enhanced_monitor'
+                order_data['page'] = '/tasks'
+                self.order_hashes[order_key] = content_hash
+                self.last_cycle_activity += 1
+                
+                # Serializar la fila solo para las órdenes que indique la política de captura
+                if self.raw_html_capture.should_capture(previous_hash is None):
+                    captured.append((order_data, row))
+                
+                if previous_hash is not None:
+                    # Orden conocida con cambios: actualizar sin notificar
+                    self.order_stats['changed_orders'] += 1
+                    changed_orders.append(order_data)
+                    continue
+                
+                # Es una orden nueva
+                new_orders.append(order_data)
+                self.order_stats['new_orders'] += 1
+                
+                # Agregar a analytics
+                self.analytics.add_order(order_data)
+                
+                EnhancedConsoleLogger.notification(f"Nueva orden detectada: {order_data.get('order_id', 'N/A')}")
+            
+            self._attach_raw_html(captured)
+            for order_data in changed_orders:
+                self.save_order_to_database(order_data)
             
             # Mostrar tabla de nuevas órdenes
             if new_orders:
@@ -539,17 +786,7 @@ class EnhancedOrderMonitor:
         containers = []
         
         # Estrategia 1: Buscar por selectores específicos
-        specific_selectors = [
-            "tr.orders-list-item",
-            "tr[class*='orders-list-item']",
-            "tr[class*='inpreparation']",
-            "div[class*='active_orders'] tbody tr",
-            "div[class*='task'] tbody tr",
-            "table[class*='orders'] tbody tr",
-            "table[class*='tasks'] tbody tr"
-        ]
-        
-        for selector in specific_selectors:
+        for selector in ORDER_ROW_SELECTORS:
             containers.extend(soup.select(selector))
         
         # Estrategia 2: Buscar por contenido de texto
@@ -578,7 +815,6 @@ class EnhancedOrderMonitor:
         try:
             order_data = {
                 'timestamp': datetime.now().isoformat(),
-                'raw_html': str(container)[:1000],  # Limitar tamaño
                 'type': 'enhanced_order'
             }
             
@@ -622,51 +858,54 @@ class EnhancedOrderMonitor:
             logging.error(f"❌ Error parseando contenedor: {e}")
             return None
     
+    def _parse_browser_row(self, row):
+        """Parsear los campos de una fila leídos en el navegador (mismas reglas que _parse_order_container)"""
+        try:
+            fields = row['fields']
+            order_data = {
+                'timestamp': datetime.now().isoformat(),
+                'type': 'enhanced_order'
+            }
+            
+            # ID de la celda o, si no hay, búsqueda por patrón en el texto de la fila
+            order_id = fields['order_id'] if 'order_id' in fields else PATTERNS.search('order_id', row.get('text', ''))
+            if order_id:
+                order_data['order_id'] = order_id
+            
+            for field in ('customer_name', 'delivery_address', 'restaurant'):
+                if fields.get(field):
+                    order_data[field] = fields[field]
+            
+            amount = PATTERNS.search('amount', fields['total_amount']) if 'total_amount' in fields else None
+            if amount:
+                order_data['total_amount'] = amount
+            
+            status = self._status_from_classes(row['classes']) or fields.get('status', 'Desconocido')
+            if status:
+                order_data['status'] = status
+            
+            order_data['priority'] = self._determine_priority(order_data)
+            
+            return order_data if order_data.get('order_id') else None
+            
+        except Exception as e:
+            logging.error(f"❌ Error parseando fila del navegador: {e}")
+            return None
+    
     def _extract_order_id(self, container):
         """Extraer ID de orden con múltiples estrategias"""
         # Estrategia 1: Selectores específicos
-        selectors = [
-            ".order-id-field",
-            "div[class*='order-id']",
-            "td[data-label='#'] div",
-            "span[class*='order-id']",
-            ".order-id",
-            ".task-id"
-        ]
-        
-        for selector in selectors:
+        for selector in ORDER_FIELD_SELECTORS['order_id']:
             element = container.select_one(selector)
             if element:
                 return element.get_text(strip=True)
         
-        # Estrategia 2: Buscar en texto con regex
-        text = container.get_text()
-        patterns = [
-            r'Task[:\s]*([A-Z0-9-]+)',
-            r'Order[:\s]*([A-Z0-9-]+)',
-            r'#([A-Z0-9-]+)',
-            r'([A-Z]{2,3}-\d{4,})',
-            r'ID[:\s]*([A-Z0-9-]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
+        # Estrategia 2: Buscar en el texto de la fila (una sola pasada con todos los patrones)
+        return PATTERNS.search('order_id', container.get_text())
     
     def _extract_customer_info(self, container):
         """Extraer información del cliente"""
-        selectors = [
-            ".customer-field a",
-            ".customer-field span",
-            "span[class*='customer']",
-            "span[class*='cliente']",
-            "td[class*='customer']"
-        ]
-        
-        for selector in selectors:
+        for selector in ORDER_FIELD_SELECTORS['customer_name']:
             element = container.select_one(selector)
             if element:
                 return element.get_text(strip=True)
@@ -675,14 +914,7 @@ class EnhancedOrderMonitor:
     
     def _extract_address(self, container):
         """Extraer dirección de entrega"""
-        selectors = [
-            "td:nth-child(4) div",
-            "span[class*='address']",
-            "span[class*='direccion']",
-            "td[class*='address']"
-        ]
-        
-        for selector in selectors:
+        for selector in ORDER_FIELD_SELECTORS['delivery_address']:
             element = container.select_one(selector)
             if element:
                 return element.get_text(strip=True)
@@ -691,15 +923,7 @@ class EnhancedOrderMonitor:
     
     def _extract_restaurant(self, container):
         """Extraer información del restaurante"""
-        selectors = [
-            ".vendor-field a",
-            ".vendor-field span",
-            "span[class*='vendor']",
-            "span[class*='restaurant']",
-            "td[class*='vendor']"
-        ]
-        
-        for selector in selectors:
+        for selector in ORDER_FIELD_SELECTORS['restaurant']:
             element = container.select_one(selector)
             if element:
                 return element.get_text(strip=True)
@@ -708,50 +932,41 @@ class EnhancedOrderMonitor:
     
     def _extract_amount(self, container):
         """Extraer monto total"""
-        selectors = [
-            ".price",
-            "span.price",
-            "td .price",
-            "span[class*='amount']",
-            "span[class*='total']"
-        ]
-        
-        for selector in selectors:
+        for selector in ORDER_FIELD_SELECTORS['total_amount']:
             element = container.select_one(selector)
             if element:
-                amount_text = element.get_text(strip=True)
-                numbers = re.findall(r'[\d,]+\.?\d*', amount_text)
-                if numbers:
-                    return numbers[0]
+                amount = PATTERNS.search('amount', element.get_text(strip=True))
+                if amount:
+                    return amount
         
         return None
     
     def _extract_status(self, container):
         """Extraer estado de la orden"""
         # Verificar clases del contenedor
-        classes = container.get('class', [])
-        for class_name in classes:
-            if 'inpreparation' in class_name:
-                return 'En Preparación'
-            elif 'active' in class_name:
-                return 'Activo'
-            elif 'pending' in class_name:
-                return 'Pendiente'
+        status = self._status_from_classes(container.get('class', []))
+        if status:
+            return status
         
         # Buscar en elementos hijos
-        selectors = [
-            "span[class*='status']",
-            "td[class*='status']",
-            ".status-field"
-        ]
-        
-        for selector in selectors:
+        for selector in ORDER_FIELD_SELECTORS['status']:
             element = container.select_one(selector)
             if element:
                 return element.get_text(strip=True)
         
         return 'Desconocido'
     
+    def _status_from_classes(self, classes):
+        """Estado según las clases CSS de la fila (None si ninguna lo indica)"""
+        for class_name in classes:
+            if 'inpreparation' in class_name:
+                return 'En Preparación'
+            elif 'active' in class_name:
+                return 'Activo'
+            elif 'pending' in class_name:
+                return 'Pendiente'
+        return None
+    
     def _determine_priority(self, order_data):
         """Determinar prioridad de la orden"""
         # Lógica de prioridad basada en múltiples factores
@@ -827,15 +1042,18 @@ class EnhancedOrderMonitor:
             INSERT INTO enhanced_orders (
                 order_id, order_number, task_id, customer_name, delivery_address,
                 restaurant, total_amount, status, priority, detected_at,
-                order_hash, source, page, raw_html, analytics_data, performance_metrics
+                order_hash, content_hash, source, page, raw_html_compressed, analytics_data, performance_metrics
             ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
             ) ON CONFLICT (order_id) DO UPDATE SET
                 status = EXCLUDED.status,
                 priority = EXCLUDED.priority,
+                content_hash = EXCLUDED.content_hash,
+                raw_html_compressed = COALESCE(EXCLUDED.raw_html_compressed, enhanced_orders.raw_html_compressed),
                 processed_at = CURRENT_TIMESTAMP,
                 analytics_data = EXCLUDED.analytics_data,
                 performance_metrics = EXCLUDED.performance_metrics
+            WHERE enhanced_orders.content_hash IS DISTINCT FROM EXCLUDED.content_hash
             """
             
             # Preparar datos
@@ -843,7 +1061,8 @@ class EnhancedOrderMonitor:
             performance_data = json.dumps({
                 'processing_time': time.time() - self.performance_start_time if self.performance_start_time else 0,
                 'error_count': self.error_count,
-                'success_count': self.success_count
+                'success_count': self.success_count,
+                'poll_interval': round(self.poll_scheduler.interval, 1) if self.poll_scheduler else MONITOR_CONFIG["check_interval"]
             })
             
             values = (
@@ -858,9 +1077,10 @@ class EnhancedOrderMonitor:
                 order_data.get('priority'),
                 order_data.get('detected_at'),
                 order_data.get('order_hash'),
+                order_data.get('content_hash'),
                 order_data.get('source'),
                 order_data.get('page'),
-                order_data.get('raw_html'),
+                compress_raw_html(order_data.get('raw_html')),
                 analytics_data,
                 performance_data
             )
@@ -887,6 +1107,23 @@ class EnhancedOrderMonitor:
                 # Fallback: imprimir caracteres especiales
                 print("\a")  # Bell character
     
+    def wait_next_check(self):
+        """Esperar hasta la siguiente verificación según la actividad del último sondeo
+        
+        Con el observador instalado la espera se hace en el navegador y termina
+        en cuanto cambia alguna fila de la tabla.
+        """
+        if self.poll_scheduler:
+            self.poll_scheduler.record_poll(self.last_cycle_activity)
+            interval = self.poll_scheduler.next_interval()
+        else:
+            interval = MONITOR_CONFIG["check_interval"]
+        
+        if self.mutation_watcher and self.driver and self.mutation_watcher.installed:
+            self.pending_rows = self.mutation_watcher.wait_for_changes(self.driver, interval)
+        else:
+            time.sleep(interval)
+    
     def display_enhanced_stats(self):
         """Mostrar estadísticas mejoradas"""
         analytics_report = self.analytics.get_analytics_report()
@@ -895,7 +1132,27 @@ class EnhancedOrderMonitor:
         print("="*60)
         print(f"   Verificaciones totales: {self.order_stats['total_checks']}")
         print(f"   Nuevas órdenes detectadas: {self.order_stats['new_orders']}")
-        print(f"   Órdenes en memoria: {len(self.order_hashes)}")
+        print(f"   Órdenes actualizadas: {self.order_stats['changed_orders']}")
+        if self.poll_scheduler:
+            poll_stats = self.poll_scheduler.get_stats()
+            print(f"   Intervalo de sondeo: {poll_stats['current_interval']:.1f}s actual, {poll_stats['avg_interval']:.1f}s medio "
+                  f"({poll_stats['active_polls']}/{poll_stats['polls']} sondeos con actividad)")
+        if self.http_client:
+            session_stats = self.http_client.session_stats
+            print(f"   Modo híbrido: {session_stats['browser_handoffs']} logins con navegador, "
+                  f"{session_stats['restored']} sesiones reutilizadas, {session_stats['auth_failures']} expiradas")
+        if self.row_extractor:
+            extract_stats = self.row_extractor.get_stats()
+            print(f"   Extracción en navegador: {extract_stats['calls']} llamadas, "
+                  f"{extract_stats['avg_extract_time'] * 1000:.0f}ms media, {extract_stats['fallbacks']} con page_source")
+        if self.mutation_watcher:
+            watcher_stats = self.mutation_watcher.get_stats()
+            print(f"   Observador: {watcher_stats['wakeups']}/{watcher_stats['waits']} esperas con cambios, "
+                  f"{watcher_stats['rows']} filas, {watcher_stats['installs']} instalaciones, {watcher_stats['lost']} perdidos")
+        store_stats = self.order_hashes.get_stats()
+        print(f"   Órdenes en memoria: {store_stats['size']}/{store_stats['max_size']} "
+              f"(aciertos={store_stats['hits']}, fallos={store_stats['misses']}, "
+              f"expulsadas={store_stats['evictions']}, expiradas={store_stats['expirations']})")
         print(f"   Última verificación: {self.last_check_time.strftime('%H:%M:%S') if self.last_check_time else 'N/A'}")
         print(f"   Tasa de éxito: {(self.success_count / max(self.success_count + self.error_count, 1)) * 100:.1f}%")
         print(f"   Errores totales: {self.error_count}")
@@ -937,27 +1194,37 @@ class EnhancedOrderMonitor:
                     self.display_enhanced_stats()
                 
                 # Esperar antes de la siguiente verificación
-                time.sleep(MONITOR_CONFIG["check_interval"])
+                self.wait_next_check()
                 
             except Exception as e:
                 logging.error(f"❌ Error en monitoreo: {e}")
                 EnhancedConsoleLogger.error(f"Error en monitoreo: {e}")
                 self.error_count += 1
-                time.sleep(MONITOR_CONFIG["check_interval"])
+                self.last_cycle_activity = 0
+                self.wait_next_check()
     
     def start_monitoring(self):
         """Iniciar el monitoreo mejorado"""
         try:
             EnhancedConsoleLogger.monitor("🚀 Iniciando Monitor de Órdenes Mejorado")
             
-            if not self.setup_driver():
-                return False
-            
-            if not self.login():
-                return False
-            
-            if not self.find_orders_page():
-                return False
+            if MONITOR_CONFIG["hybrid_mode"]:
+                # Sesión guardada si sigue válida; si no, login con navegador y sondeo por HTTP
+                self.http_client = HTTPClient(
+                    session_file=MONITOR_CONFIG["session_store_file"],
+                    login_handler=self.browser_login
+                )
+                if not self.http_client.authenticate():
+                    return False
+            else:
+                if not self.setup_driver():
+                    return False
+                
+                if not self.login():
+                    return False
+                
+                if not self.find_orders_page():
+                    return False
             
             self.is_running = True
             self.last_check_time = datetime.now()
@@ -968,7 +1235,15 @@ class EnhancedOrderMonitor:
             print("="*80)
             print("✅ Sistema iniciado correctamente")
             print(f"🌐 Página monitoreada: /tasks")
-            print(f"⏱️  Intervalo de verificación: {MONITOR_CONFIG['check_interval']} segundos")
+            if self.http_client:
+                print(f"🧭 Modo: híbrido (login con navegador, sondeo por HTTP)")
+            else:
+                print(f"🧭 Modo: navegador{' con detección por eventos (MutationObserver)' if self.mutation_watcher else ''}")
+            if self.poll_scheduler:
+                print(f"⏱️  Intervalo de verificación: adaptativo {MONITOR_CONFIG['poll_min_interval']}-"
+                      f"{MONITOR_CONFIG['poll_max_interval']} segundos (inicial {MONITOR_CONFIG['check_interval']})")
+            else:
+                print(f"⏱️  Intervalo de verificación: {MONITOR_CONFIG['check_interval']} segundos")
             print(f"🔄 Auto-refresh: {'Activado' if MONITOR_CONFIG['enable_auto_refresh'] else 'Desactivado'}")
             print(f"🔔 Notificaciones: {'Activadas' if MONITOR_CONFIG['notification_sound'] else 'Desactivadas'}")
             print(f"📊 Analytics: {'Activado' if MONITOR_CONFIG['enable_order_analytics'] else 'Desactivado'}")
@@ -1005,12 +1280,18 @@ class EnhancedOrderMonitor:
         if self.driver:
             self.driver.quit()
         
+        if self.http_client:
+            self.http_client.close_session()
+        
         if self.db_cursor:
             self.db_cursor.close()
         
         if self.db_conn:
             self.db_conn.close()
         
+        if self.dedup_state:
+            self.dedup_state.close()
+        
         self.display_enhanced_stats()
         EnhancedConsoleLogger.success("✅ Monitoreo detenido correctamente")
 
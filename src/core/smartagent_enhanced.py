@@ -11,15 +11,18 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from datetime import datetime, timedelta
 import json, time, os, threading, logging, signal, sys
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import random
 from dotenv import load_dotenv
 
+# Agregar el directorio src al path (permite ejecutar el módulo directamente)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection_pool import get_pool
+from core.monitors.html_backend import parse_html
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -70,7 +73,7 @@ class EnhancedDatabaseManager:
     def connect(self):
         """Conectar a la base de datos"""
         try:
-            self.conn = psycopg2.connect(self.database_url)
+            self.conn = get_pool(self.database_url).connect()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             logging.info("✅ Conexión a PostgreSQL establecida")
             return True
@@ -470,7 +473,7 @@ class SmartAgentEnhanced:
         """Extraer datos de la página actual"""
         try:
             page_source = self.driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
+            soup = parse_html(page_source)
             
             # Extraer título
             titulo = soup.title.string if soup.title else "Sin título"
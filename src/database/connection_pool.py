@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Capa compartida de conexiones PostgreSQL para SmartAgent
+Pool de conexiones con verificación de salud, reconexión automática con backoff
+y tiempos por sentencia
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+# Configuración del pool
+POOL_CONFIG = {
+    "min_connections": 1,
+    "max_connections": 10,
+    "connect_timeout": 10,          # Segundos para establecer la conexión
+    "health_check_interval": 60,    # Verificar con SELECT 1 si la conexión estuvo inactiva más de N segundos
+    "max_reconnect_attempts": 5,    # Intentos de reconexión antes de rendirse
+    "backoff_base": 0.5,            # Espera inicial entre intentos (segundos)
+    "backoff_max": 30,              # Espera máxima entre intentos (segundos)
+    "slow_query_threshold": 1.0,    # Registrar sentencias más lentas que N segundos
+    "keepalives_idle": 30           # TCP keepalive para detectar conexiones TLS caídas
+}
+
+# Errores que indican una conexión rota (no un error de la sentencia)
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database_url, **options):
+    """Obtener el pool compartido para una URL (se crea una sola vez por proceso)"""
+    with _pools_lock:
+        pool = _pools.get(database_url)
+        if pool is None:
+            pool = DatabasePool(database_url, **options)
+            _pools[database_url] = pool
+        return pool
+
+
+def close_all_pools():
+    """Cerrar todos los pools del proceso"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
+
+
+class DatabasePool:
+    """Pool de conexiones con reconexión automática y métricas por sentencia"""
+    
+    def __init__(self, database_url, **options):
+        self.database_url = database_url
+        self.config = dict(POOL_CONFIG, **options)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self.stats = defaultdict(float)
+        self.statement_stats = defaultdict(lambda: {'count': 0, 'total_time': 0.0, 'max_time': 0.0})
+    
+    def _create_pool(self):
+        return ThreadedConnectionPool(
+            self.config["min_connections"],
+            self.config["max_connections"],
+            self.database_url,
+            connect_timeout=self.config["connect_timeout"],
+            keepalives=1,
+            keepalives_idle=self.config["keepalives_idle"]
+        )
+    
+    def _backoff(self, attempt):
+        """Espera exponencial con jitter"""
+        delay = min(self.config["backoff_max"], self.config["backoff_base"] * (2 ** attempt))
+        time.sleep(delay * random.uniform(0.5, 1.0))
+    
+    def getconn(self):
+        """Obtener una conexión sana del pool, reintentando con backoff"""
+        last_error = None
+        for attempt in range(self.config["max_reconnect_attempts"]):
+            try:
+                with self._lock:
+                    if self._pool is None or self._pool.closed:
+                        self._pool = self._create_pool()
+                        self.stats['pool_created'] += 1
+                    conn = self._pool.getconn()
+                
+                if self._is_healthy(conn):
+                    self._last_used[id(conn)] = time.monotonic()
+                    return conn
+                
+                self.putconn(conn, close=True)
+                self.stats['unhealthy_connections'] += 1
+            
+            except CONNECTION_ERRORS as e:
+                last_error = e
+                self.stats['connect_errors'] += 1
+                logging.warning(f"⚠️ Error conectando a la base de datos (intento {attempt + 1}): {e}")
+            
+            self._backoff(attempt)
+        
+        raise psycopg2.OperationalError(f"No se pudo obtener conexión tras {self.config['max_reconnect_attempts']} intentos: {last_error}")
+    
+    def putconn(self, conn, close=False):
+        """Devolver una conexión al pool (cerrándola si está rota)"""
+        if conn is None:
+            return
+        self._last_used.pop(id(conn), None)
+        try:
+            with self._lock:
+                if self._pool is not None and not self._pool.closed:
+                    self._pool.putconn(conn, close=close or bool(conn.closed))
+                    return
+            conn.close()
+        except Exception as e:
+            logging.debug(f"Error devolviendo conexión al pool: {e}")
+    
+    def _is_healthy(self, conn):
+        """Verificación de salud barata; solo hace SELECT 1 si la conexión estuvo inactiva"""
+        if conn.closed:
+            return False
+        
+        idle_since = self._last_used.get(id(conn))
+        if idle_since is not None and time.monotonic() - idle_since < self.config["health_check_interval"]:
+            return True
+        
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            self.stats['health_checks'] += 1
+            return True
+        except CONNECTION_ERRORS:
+            return False
+    
+    @contextmanager
+    def connection(self):
+        """Context manager: conexión del pool con commit/rollback automáticos"""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+    
+    def connect(self):
+        """Conexión gestionada de larga duración (reemplazo de psycopg2.connect)"""
+        return ManagedConnection(self)
+    
+    def record_timing(self, query, elapsed):
+        """Registrar el tiempo de una sentencia"""
+        if isinstance(query, bytes):
+            query = query.decode('utf-8', 'replace')
+        statement = " ".join(str(query).split()[:1]).upper() or "UNKNOWN"
+        
+        stats = self.statement_stats[statement]
+        stats['count'] += 1
+        stats['total_time'] += elapsed
+        stats['max_time'] = max(stats['max_time'], elapsed)
+        
+        if elapsed > self.config["slow_query_threshold"]:
+            self.stats['slow_queries'] += 1
+            short_query = " ".join(str(query).split())[:120]
+            logging.warning(f"🐢 Sentencia lenta ({elapsed:.2f}s): {short_query}")
+    
+    def get_stats(self):
+        """Estadísticas del pool y tiempos por tipo de sentencia"""
+        return {
+            'pool_created': int(self.stats['pool_created']),
+            'reconnects': int(self.stats['reconnects']),
+            'connect_errors': int(self.stats['connect_errors']),
+            'health_checks': int(self.stats['health_checks']),
+            'unhealthy_connections': int(self.stats['unhealthy_connections']),
+            'slow_queries': int(self.stats['slow_queries']),
+            'statements': {
+                statement: {
+                    'count': stats['count'],
+                    'avg_time': stats['total_time'] / stats['count'] if stats['count'] else 0.0,
+                    'max_time': stats['max_time']
+                }
+                for statement, stats in self.statement_stats.items()
+            }
+        }
+    
+    def closeall(self):
+        """Cerrar todas las conexiones del pool"""
+        with self._lock:
+            if self._pool is not None and not self._pool.closed:
+                self._pool.closeall()
+            self._pool = None
+        self._last_used.clear()
+
+
+class ManagedConnection:
+    """Conexión de larga duración que se repone sola si el servidor la corta
+    
+    Expone la interfaz de psycopg2 que usan los componentes (cursor, commit,
+    rollback, close), de modo que pueden seguir guardando `self.conn` y
+    `self.cursor` como antes.
+    """
+    
+    def __init__(self, pool):
+        self.pool = pool
+        self.raw = pool.getconn()
+    
+    @property
+    def closed(self):
+        return self.raw is None or bool(self.raw.closed)
+    
+    def reconnect(self):
+        """Descartar la conexión actual y obtener otra del pool"""
+        self.pool.putconn(self.raw, close=True)
+        self.raw = None
+        self.raw = self.pool.getconn()
+        self.pool.stats['reconnects'] += 1
+        logging.info("🔄 Reconexión a la base de datos completada")
+    
+    def ensure_connection(self):
+        if self.closed:
+            self.reconnect()
+        return self.raw
+    
+    def cursor(self, cursor_factory=None):
+        return ResilientCursor(self, cursor_factory)
+    
+    def commit(self):
+        try:
+            self.ensure_connection().commit()
+        except CONNECTION_ERRORS:
+            self.reconnect()
+            raise
+    
+    def rollback(self):
+        try:
+            self.ensure_connection().rollback()
+        except CONNECTION_ERRORS:
+            # La transacción ya se perdió con la conexión
+            self.reconnect()
+    
+    def close(self):
+        self.pool.putconn(self.raw)
+        self.raw = None
+    
+    def __getattr__(self, name):
+        return getattr(self.ensure_connection(), name)
+
+
+class ResilientCursor:
+    """Cursor que mide cada sentencia y reconecta si la conexión se cayó
+    
+    Una sentencia solo se reintenta cuando no había transacción abierta,
+    porque en ese caso no se pierde trabajo previo al reconectar.
+    """
+    
+    def __init__(self, managed_conn, cursor_factory=None):
+        self.managed_conn = managed_conn
+        self.cursor_factory = cursor_factory
+        self._cursor = None
+        self._cursor_conn = None
+    
+    def _get_cursor(self):
+        raw = self.managed_conn.ensure_connection()
+        if self._cursor is None or self._cursor_conn is not raw or self._cursor.closed:
+            self._cursor = raw.cursor(cursor_factory=self.cursor_factory) if self.cursor_factory else raw.cursor()
+            self._cursor_conn = raw
+        return self._cursor
+    
+    def _run(self, method, query, *args):
+        cursor = self._get_cursor()
+        was_idle = cursor.connection.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+        start_time = time.perf_counter()
+        try:
+            return getattr(cursor, method)(query, *args)
+        except CONNECTION_ERRORS:
+            self.managed_conn.reconnect()
+            if not was_idle:
+                raise
+            start_time = time.perf_counter()
+            return getattr(self._get_cursor(), method)(query, *args)
+        finally:
+            self.managed_conn.pool.record_timing(query, time.perf_counter() - start_time)
+    
+    def execute(self, query, vars=None):
+        return self._run('execute', query, vars)
+    
+    def executemany(self, query, vars_list):
+        return self._run('executemany', query, vars_list)
+    
+    def close(self):
+        if self._cursor is not None and not self._cursor.closed:
+            self._cursor.close()
+    
+    def __iter__(self):
+        return iter(self._get_cursor())
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def __getattr__(self, name):
+        return getattr(self._get_cursor(), name)
@@ -3,10 +3,15 @@
 Script para consultar la base de datos PostgreSQL del SmartAgent
 """
 
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import json
 from datetime import datetime
+import os
+import sys
+
+# Agregar el directorio src al path (permite ejecutar el módulo directamente)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection_pool import get_pool
 
 # Configuración de la base de datos
 DATABASE_URL = "postgresql://***USUARIO_OCULTO***:***CONTRASEÑA_OCULTA***@***HOST_OCULTO***/***DB_OCULTA***?sslmode=require&channel_binding=require"
@@ -20,7 +25,7 @@ class DatabaseQuery:
     def connect(self):
         """Conectar a la base de datos"""
         try:
-            self.conn = psycopg2.connect(self.database_url)
+            self.conn = get_pool(self.database_url).connect()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             print("✅ Conexión a PostgreSQL establecida")
             return True
@@ -4,13 +4,17 @@ Script de mejora de base de datos PostgreSQL para SmartAgent
 Agrega tablas complementarias y relaciones adicionales
 """
 
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import json
 import logging
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+import sys
+
+# Agregar el directorio src al path (permite ejecutar el módulo directamente)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection_pool import get_pool
 
 # Cargar variables de entorno
 load_dotenv()
@@ -33,7 +37,7 @@ class DatabaseEnhancer:
     def connect(self):
         """Conectar a la base de datos"""
         try:
-            self.conn = psycopg2.connect(self.database_url)
+            self.conn = get_pool(self.database_url).connect()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             logging.info("✅ Conexión a PostgreSQL establecida")
             return True
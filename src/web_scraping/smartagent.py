@@ -5,13 +5,16 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from datetime import datetime
 import json, time, os, threading, logging, signal, sys
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
+# Agregar el directorio src al path (permite ejecutar el módulo directamente)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection_pool import get_pool
+from core.monitors.html_backend import parse_html
+
 # Configuración del proyecto
 CHROMEDRIVER_PATH = "chromedriver.exe"  # Actualizado para Windows
 START_URL = "https://admin.besmartdelivery.mx/"
@@ -143,7 +146,7 @@ class DatabaseManager:
     def connect(self):
         """Conectar a la base de datos"""
         try:
-            self.conn = psycopg2.connect(self.database_url)
+            self.conn = get_pool(self.database_url).connect()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             logging.info("✅ Conexión a PostgreSQL establecida")
             return True
@@ -426,7 +429,7 @@ class SmartAgent:
     def extract_page_data(self, url):
         """Extraer datos de la página actual"""
         try:
-            soup = BeautifulSoup(self.driver.page_source, "html.parser")
+            soup = parse_html(self.driver.page_source)
             
             datos = {
                 "url": url,
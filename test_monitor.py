@@ -33,10 +33,10 @@ try:
             html_content = monitor.http_client.get_orders_page()
             if html_content:
                 print("✅ Página obtenida correctamente")
-                print(f"📏 Tamaño del contenido: {len(html_content)} caracteres")
+                print(f"📏 Tamaño del contenido: {len(html_content.text)} caracteres")
                 
                 print("🔍 Extrayendo órdenes...")
-                new_orders = monitor.order_extractor.extract_new_orders(html_content, set())
+                new_orders = monitor.order_extractor.extract_new_orders(html_content, {})
                 print(f"📊 Órdenes encontradas: {len(new_orders)}")
                 
                 if new_orders:
@@ -4,11 +4,16 @@ Script de prueba para el sistema de pedidos
 Demuestra las funcionalidades de gestión de pedidos, repartidores y eventos
 """
 
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import json
 from datetime import datetime, timedelta
 import random
+import os
+import sys
+
+# Agregar el directorio src al path (usa el pool de conexiones compartido)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from database.connection_pool import get_pool
 
 # Configuración de la base de datos
 DATABASE_URL = "postgresql://***USUARIO_OCULTO***:***CONTRASEÑA_OCULTA***@***HOST_OCULTO***/***DB_OCULTA***?sslmode=require&channel_binding=require"
@@ -22,7 +27,7 @@ class OrderSystemTest:
     def connect(self):
         """Conectar a la base de datos"""
         try:
-            self.conn = psycopg2.connect(self.database_url)
+            self.conn = get_pool(self.database_url).connect()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             print("✅ Conexión a PostgreSQL establecida")
             return True
@@ -0,0 +1,10 @@
+"""
+Configuración común de las pruebas unitarias
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio src al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
@@ -0,0 +1,93 @@
+"""
+Pruebas de la extracción en el navegador con un driver simulado
+"""
+
+from core.monitors.browser_extract import (OBSERVER_DRAIN_SCRIPT, OBSERVER_INSTALL_SCRIPT, ORDER_ROWS_SCRIPT,
+                                           ROW_HTML_SCRIPT, BrowserRowExtractor, MutationWatcher)
+
+ROW_SELECTORS = ['tr.orders-list-item']
+FIELD_SELECTORS = {'order_id': ['.order-id-field'], 'customer_name': ['.customer-field a', '.customer']}
+
+
+class FakeDriver:
+    """Driver de Selenium mínimo: respuestas por script y registro de llamadas"""
+    
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+        self.script_timeout = None
+    
+    def execute_script(self, script, *args):
+        self.calls.append((script, args))
+        response = self.responses[script]
+        if isinstance(response, Exception):
+            raise response
+        return response(*args) if callable(response) else response
+    
+    def execute_async_script(self, script, *args):
+        return self.execute_script(script, *args)
+    
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+
+ROWS = [
+    {'index': 0, 'classes': ['orders-list-item', 'ontheway'], 'fields': {'order_id': '1001', 'customer_name': 'Ana'}},
+    {'index': 1, 'classes': ['orders-list-item'], 'fields': {}, 'text': 'Task: 1002'}
+]
+
+
+def test_extract_sends_selectors_in_one_call():
+    driver = FakeDriver({ORDER_ROWS_SCRIPT: {'table': True, 'rows': ROWS}})
+    extractor = BrowserRowExtractor(ROW_SELECTORS, FIELD_SELECTORS, text_field='order_id')
+    
+    assert extractor.extract(driver) == ROWS
+    assert driver.calls == [(ORDER_ROWS_SCRIPT, (ROW_SELECTORS, FIELD_SELECTORS, 'order_id'))]
+    assert extractor.get_stats()['rows'] == 2
+
+
+def test_empty_table_is_a_result_but_missing_table_falls_back():
+    extractor = BrowserRowExtractor(ROW_SELECTORS, FIELD_SELECTORS)
+    
+    assert extractor.extract(FakeDriver({ORDER_ROWS_SCRIPT: {'table': True, 'rows': []}})) == []
+    assert extractor.extract(FakeDriver({ORDER_ROWS_SCRIPT: {'table': False, 'rows': []}})) is None
+    assert extractor.extract(FakeDriver({ORDER_ROWS_SCRIPT: RuntimeError("javascript error")})) is None
+    assert extractor.get_stats()['fallbacks'] == 2
+
+
+def test_row_html_is_requested_only_for_given_rows():
+    driver = FakeDriver({ROW_HTML_SCRIPT: lambda indexes: [f'<tr id="{index}"></tr>' for index in indexes]})
+    extractor = BrowserRowExtractor(ROW_SELECTORS, FIELD_SELECTORS)
+    
+    assert extractor.row_html(driver, []) == {}
+    assert driver.calls == []
+    assert extractor.row_html(driver, [3, 5]) == {3: '<tr id="3"></tr>', 5: '<tr id="5"></tr>'}
+    assert len(driver.calls) == 1
+
+
+def test_watcher_returns_changed_rows_and_sets_script_timeout():
+    driver = FakeDriver({
+        OBSERVER_INSTALL_SCRIPT: True,
+        OBSERVER_DRAIN_SCRIPT: {'installed': True, 'rows': ROWS[:1]}
+    })
+    watcher = MutationWatcher(BrowserRowExtractor(ROW_SELECTORS, FIELD_SELECTORS), settle=0.2)
+    
+    assert watcher.wait_for_changes(driver, 30) is None  # Sin instalar: extracción completa
+    assert watcher.install(driver)
+    assert watcher.wait_for_changes(driver, 30) == ROWS[:1]
+    assert driver.script_timeout == 40
+    assert driver.calls[-1][1] == (FIELD_SELECTORS, None, 30000, 200)
+    assert watcher.get_stats()['wakeups'] == 1
+
+
+def test_watcher_lost_after_reload_requests_full_extraction():
+    driver = FakeDriver({
+        OBSERVER_INSTALL_SCRIPT: True,
+        OBSERVER_DRAIN_SCRIPT: {'installed': False, 'rows': []}
+    })
+    watcher = MutationWatcher(BrowserRowExtractor(ROW_SELECTORS, FIELD_SELECTORS))
+    watcher.install(driver)
+    
+    assert watcher.wait_for_changes(driver, 10) is None
+    assert not watcher.installed
+    assert watcher.get_stats()['lost'] == 1
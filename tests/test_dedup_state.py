@@ -0,0 +1,106 @@
+"""
+Pruebas del estado de deduplicación persistente (SQLite)
+"""
+
+import time
+
+from core.monitors.dedup_state import DedupStateStore
+from core.monitors.known_orders import KnownOrderStore
+
+
+def test_reload_restores_known_orders(tmp_path):
+    path = tmp_path / "state.sqlite3"
+    store = KnownOrderStore(max_size=10, ttl=None, persistence=DedupStateStore(path))
+    store['order:1'] = 'hash-1'
+    store['order:2'] = 'hash-2'
+    store['order:1'] = 'hash-1b'
+    store.persistence.close()
+    
+    # Un reinicio: archivo nuevo abierto sobre el mismo path
+    reloaded = KnownOrderStore(max_size=10, ttl=None)
+    state = DedupStateStore(path)
+    assert state.load_into(reloaded) == 2
+    assert reloaded.get('order:1') == 'hash-1b'
+    assert reloaded.get('order:2') == 'hash-2'
+    state.close()
+
+
+def test_load_purges_entries_past_retention(tmp_path):
+    state = DedupStateStore(tmp_path / "state.sqlite3", retention=60)
+    state.record('order:old', 'hash-old')
+    state.conn.execute("UPDATE known_orders SET last_seen = ? WHERE order_key = 'order:old'", (time.time() - 120,))
+    state.conn.commit()
+    state.record('order:new', 'hash-new')
+    
+    assert state.load() == [('order:new', 'hash-new')]
+    assert state.conn.execute("SELECT COUNT(*) FROM known_orders").fetchone()[0] == 1
+    state.close()
+
+
+def test_seeding_does_not_write_back(tmp_path):
+    state = DedupStateStore(tmp_path / "state.sqlite3")
+    state.record('order:1', 'hash-1')
+    writes = state.writes
+    
+    store = KnownOrderStore(max_size=10, ttl=None, persistence=state)
+    state.load_into(store)
+    assert state.writes == writes
+    state.close()
+
+
+
+class FakeClock:
+    """Reloj manual para controlar persist_interval"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def _age_all(state, seconds):
+    """Simular que todas las órdenes se guardaron hace `seconds` segundos"""
+    state.conn.execute("UPDATE known_orders SET last_seen = ?", (time.time() - seconds,))
+    state.conn.commit()
+
+
+def test_orders_still_listed_survive_restart_past_retention(tmp_path):
+    path = tmp_path / "state.sqlite3"
+    clock = FakeClock()
+    state = DedupStateStore(path, retention=60)
+    store = KnownOrderStore(max_size=10, ttl=None, clock=clock, persistence=state, persist_interval=30)
+    store['order:listed'] = 'hash-1'
+    store['order:gone'] = 'hash-2'
+    _age_all(state, 120)
+    
+    # 'order:listed' sigue en la página: su consulta refresca last_seen en disco
+    clock.now = 40
+    assert store.get('order:listed') == 'hash-1'
+    state.close()
+    
+    reloaded = KnownOrderStore(max_size=10, ttl=None)
+    restarted = DedupStateStore(path, retention=60)
+    assert restarted.load_into(reloaded) == 1
+    assert reloaded.get('order:listed') == 'hash-1'
+    restarted.close()
+
+
+def test_touch_all_refreshes_disk_once_per_interval(tmp_path):
+    clock = FakeClock()
+    state = DedupStateStore(tmp_path / "state.sqlite3", retention=60)
+    store = KnownOrderStore(max_size=10, ttl=None, clock=clock, persistence=state, persist_interval=30)
+    store['order:1'] = 'hash-1'
+    store['order:2'] = 'hash-2'
+    _age_all(state, 120)
+    cutoff = time.time() - 60
+    stale = "SELECT COUNT(*) FROM known_orders WHERE last_seen < ?"
+    
+    clock.now = 10
+    store.touch_all()  # Dentro de persist_interval: no escribe
+    assert state.conn.execute(stale, (cutoff,)).fetchone()[0] == 2
+    
+    clock.now = 31
+    store.touch_all()
+    assert state.conn.execute(stale, (cutoff,)).fetchone()[0] == 0
+    state.close()
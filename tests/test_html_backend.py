@@ -0,0 +1,71 @@
+"""
+Pruebas de los backends de parseo HTML
+"""
+
+from bs4 import SoupStrainer
+
+from core.monitors.html_backend import FALLBACK_BACKEND, FetchedPage, ParserBackend, available_backends, parse_html
+
+ORDERS_HTML = """
+<html><body>
+<table class="responsive-table">
+<tbody>
+<tr><td class="order-number">#1001</td><td class="status">Pendiente</td></tr>
+<tr><td class="order-number">#1002</td><td class="status">En camino</td></tr>
+</tbody>
+</table>
+</body></html>
+"""
+
+
+def order_numbers(soup):
+    return [cell.get_text(strip=True) for cell in soup.select('td.order-number')]
+
+
+def test_standard_library_backend_is_always_available():
+    assert FALLBACK_BACKEND in available_backends()
+
+
+def test_unknown_backend_falls_back_to_html_parser():
+    backend = ParserBackend(preferred='no-existe')
+    assert backend.name == FALLBACK_BACKEND
+    assert order_numbers(backend.parse(ORDERS_HTML)) == ['#1001', '#1002']
+
+
+def test_every_backend_extracts_the_same_data():
+    results = {name: order_numbers(ParserBackend(preferred=name).parse(ORDERS_HTML)) for name in available_backends()}
+    assert all(numbers == ['#1001', '#1002'] for numbers in results.values())
+
+
+def test_parse_only_restricts_the_tree_to_the_table():
+    soup = parse_html(ORDERS_HTML, parse_only=SoupStrainer('table'))
+    assert soup.find('body') is None
+    assert order_numbers(soup) == ['#1001', '#1002']
+
+
+def test_invalid_tree_is_parsed_again_with_fallback():
+    backend = ParserBackend()
+    calls = []
+    
+    def is_valid(soup):
+        calls.append(soup)
+        return False
+    
+    soup = backend.parse_with_fallback(ORDERS_HTML, is_valid)
+    assert order_numbers(soup) == ['#1001', '#1002']
+    if backend.name != FALLBACK_BACKEND:
+        assert len(calls) == 1
+        assert backend.get_stats()['fallbacks'] == 1
+    assert backend.get_stats()['parses'] >= 1
+
+
+def test_fetched_page_decodes_and_parses_once():
+    page = FetchedPage(ORDERS_HTML.encode('utf-8'), 'utf-8')
+    assert page.contains('orders-list-item') is False
+    assert page.contains('responsive-table')
+    assert len(page.text) == len(ORDERS_HTML)
+    assert page.text is page.text
+    
+    soup = page.soup()
+    assert page.soup() is soup
+    assert order_numbers(soup) == ['#1001', '#1002']
@@ -0,0 +1,101 @@
+"""
+Pruebas del almacén de órdenes conocidas (LRU + TTL)
+"""
+
+from core.monitors.known_orders import KnownOrderStore
+
+
+class FakeClock:
+    """Reloj manual para controlar el TTL"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    store = KnownOrderStore(max_size=2, ttl=None)
+    store['a'] = 1
+    store['b'] = 2
+    assert store.get('a') == 1  # 'a' pasa a ser la más reciente
+    store['c'] = 3
+    
+    assert 'b' not in store
+    assert store.get('a') == 1 and store.get('c') == 3
+    assert store.get_stats()['evictions'] == 1
+
+
+def test_ttl_expires_entries_not_seen():
+    clock = FakeClock()
+    store = KnownOrderStore(max_size=10, ttl=300, clock=clock)
+    store['a'] = 1
+    
+    clock.now = 299
+    assert store.get('a') == 1  # La consulta la refresca
+    clock.now = 598
+    assert store.get('a') == 1
+    clock.now = 899
+    assert store.get('a') is None
+    assert store.get_stats()['expirations'] == 1
+
+
+def test_touch_all_refreshes_every_entry():
+    clock = FakeClock()
+    store = KnownOrderStore(max_size=10, ttl=300, clock=clock)
+    store['a'] = 1
+    store['b'] = 2
+    
+    clock.now = 250
+    store.touch_all()
+    clock.now = 500
+    assert store.get('a') == 1 and store.get('b') == 2
+    
+    clock.now = 801
+    assert store.get('a') is None
+
+
+def test_touch_all_does_not_revive_expired_entries():
+    clock = FakeClock()
+    store = KnownOrderStore(max_size=10, ttl=300, clock=clock)
+    store['a'] = 1
+    clock.now = 200
+    store['b'] = 2
+    
+    clock.now = 400  # 'a' ya expiró pero sigue sin purgar
+    store.touch_all()
+    
+    assert 'a' not in store
+    assert store.get('b') == 2
+    assert store.get_stats()['expirations'] == 1
+
+
+def test_contains_refreshes_and_counts_lookup():
+    clock = FakeClock()
+    store = KnownOrderStore(max_size=2, ttl=300, clock=clock)
+    store['a'] = 1
+    store['b'] = 2
+    
+    clock.now = 200
+    assert 'a' in store  # Refresca 'a' (TTL y posición LRU)
+    assert 'missing' not in store
+    store['c'] = 3  # Expulsa 'b', la menos reciente
+    
+    assert list(store) == ['a', 'c']
+    clock.now = 450
+    assert 'a' in store
+    stats = store.get_stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1
+
+
+def test_purge_expired_removes_oldest_first():
+    clock = FakeClock()
+    store = KnownOrderStore(max_size=10, ttl=100, clock=clock)
+    store['old'] = 1
+    clock.now = 50
+    store['new'] = 2
+    
+    clock.now = 120
+    assert store.purge_expired() == 1
+    assert list(store) == ['new']
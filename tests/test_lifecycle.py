@@ -0,0 +1,79 @@
+"""
+Pruebas del ciclo de vida de órdenes: transiciones y eventos al salir de la página
+"""
+
+from core.monitors.lifecycle import OrderLifecycleTracker
+from core.monitors.order_parser import IncrementalOrderExtractor, OrderExtractor
+from core.monitors.order_record import OrderStatus
+
+HEADER = "<thead><tr><th>#</th><th>Vendor</th><th>Customer</th><th>Rider</th></tr></thead>"
+
+
+def order_row(order_id, status, rider=''):
+    return (f'<tr class="orders-list-item {status}">'
+            f'<td><div class="order-id-field">{order_id}</div></td>'
+            f'<td><a class="link">Restaurante {order_id}</a></td>'
+            f'<td><a class="link">Cliente {order_id}</a></td>'
+            f'<td>{rider}</td></tr>')
+
+
+def tasks_page(*rows):
+    return f'<table class="responsive-table">{HEADER}<tbody>{"".join(rows)}</tbody></table>'
+
+
+def event_types(events):
+    return [(event['order_id'], event['event_type']) for event in events]
+
+
+def test_transitions_emit_one_event_per_change():
+    tracker = OrderLifecycleTracker()
+    order = {'order_id': '1001', 'status': OrderStatus.IN_PREPARATION}
+    
+    assert event_types(tracker.observe(order)) == [('1001', 'created')]
+    assert tracker.observe(order) == []  # Sin cambios no hay eventos
+    
+    order = {'order_id': '1001', 'status': OrderStatus.ON_THE_WAY, 'rider': 'Ana'}
+    events = tracker.observe(order)
+    assert event_types(events) == [('1001', 'status_changed'), ('1001', 'rider_assigned')]
+    assert (events[0]['previous_value'], events[0]['new_value']) == ('En Preparación', 'En Camino')
+
+
+def test_known_order_without_snapshot_is_registered_silently():
+    tracker = OrderLifecycleTracker()
+    assert tracker.observe({'order_id': '1001', 'status': 'Procesado'}, is_new=False) == []
+    assert tracker.get_stats()['tracked_orders'] == 1
+
+
+def test_removal_depends_on_last_status():
+    tracker = OrderLifecycleTracker()
+    tracker.observe({'order_id': '1001', 'status': OrderStatus.AT_LOCATION})
+    tracker.observe({'order_id': '1002', 'status': OrderStatus.IN_PREPARATION})
+    
+    assert event_types(tracker.remove({'order_id': '1001'})) == [('1001', 'completed')]
+    assert event_types(tracker.remove({'order_id': '1002'})) == [('1002', 'removed')]
+    assert tracker.get_stats()['tracked_orders'] == 0
+
+
+def test_last_orders_leaving_the_page_emit_completed_and_removed(capsys):
+    """Como el monitor de terminal: delta del extractor incremental -> observe/remove"""
+    incremental = IncrementalOrderExtractor(OrderExtractor(html_parser='html.parser'))
+    tracker = OrderLifecycleTracker()
+    known_orders = {}
+    
+    def poll(page):
+        delta = incremental.extract_delta(page, known_orders)
+        events = []
+        for order_data in delta['added'] + delta['changed']:
+            events.extend(tracker.observe(order_data, is_new=order_data in delta['added']))
+        for order_data in delta['removed']:
+            events.extend(tracker.remove(order_data))
+        return event_types(events)
+    
+    assert poll(tasks_page(order_row(1001, 'inpreparation'), order_row(1002, 'inpreparation'))) == [
+        ('1001', 'created'), ('1002', 'created')]
+    assert poll(tasks_page(order_row(1001, 'ontheway', 'Ana'), order_row(1002, 'inpreparation'))) == [
+        ('1001', 'status_changed'), ('1001', 'rider_assigned')]
+    
+    # La tabla queda vacía: las dos últimas órdenes salen de la página
+    assert sorted(poll(tasks_page())) == [('1001', 'completed'), ('1002', 'removed')]
+    capsys.readouterr()
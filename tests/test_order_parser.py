@@ -0,0 +1,84 @@
+"""
+Pruebas del extractor incremental: delta de órdenes añadidas, modificadas y retiradas
+"""
+
+import pytest
+
+from core.monitors.order_parser import IncrementalOrderExtractor, OrderExtractor
+
+HEADER = "<thead><tr><th>#</th><th>Vendor</th><th>Customer</th><th>Zone</th><th>Total</th></tr></thead>"
+
+
+def order_row(order_id, status='inpreparation', nested=False):
+    zone = f"<table><tr><td>Zona {order_id}</td></tr></table>" if nested else f"Zona {order_id}"
+    return (f'<tr class="orders-list-item {status}">'
+            f'<td><div class="order-id-field"><input type="checkbox"> {order_id}</div></td>'
+            f'<td><div class="vendor-field"><a class="link">Restaurante {order_id}</a></div></td>'
+            f'<td><div class="customer-field"><a class="link">Cliente {order_id}</a></div></td>'
+            f'<td>{zone}</td>'
+            f'<td><span class="price">$ 100.00</span></td></tr>')
+
+
+def tasks_page(*rows):
+    return f'<html><body><table class="responsive-table">{HEADER}<tbody>{"".join(rows)}</tbody></table></body></html>'
+
+
+def ids(orders):
+    return sorted(order.get('order_id') for order in orders)
+
+
+@pytest.fixture
+def incremental(capsys):
+    yield IncrementalOrderExtractor(OrderExtractor(html_parser='html.parser'))
+    capsys.readouterr()  # El extractor registra cada orden en consola
+
+
+def test_delta_tracks_added_changed_and_removed(incremental):
+    known_orders = {}
+    delta = incremental.extract_delta(tasks_page(order_row(1001), order_row(1002)), known_orders)
+    assert ids(delta['added']) == ['1001', '1002']
+    
+    delta = incremental.extract_delta(tasks_page(order_row(1001, 'ontheway')), known_orders)
+    assert delta['added'] == []
+    assert ids(delta['changed']) == ['1001']
+    assert ids(delta['removed']) == ['1002']
+
+
+def test_empty_table_removes_every_tracked_order(incremental):
+    """Secuencia 3 -> 2 -> 0 -> 1: la tabla vacía retira las órdenes que quedaban"""
+    known_orders = {}
+    delta = incremental.extract_delta(tasks_page(order_row(1001), order_row(1002), order_row(1003)), known_orders)
+    assert ids(delta['added']) == ['1001', '1002', '1003']
+    
+    delta = incremental.extract_delta(tasks_page(order_row(1001), order_row(1002)), known_orders)
+    assert ids(delta['removed']) == ['1003']
+    
+    delta = incremental.extract_delta(tasks_page(), known_orders)
+    assert ids(delta['removed']) == ['1001', '1002']
+    assert incremental.get_stats()['tracked_orders'] == 0
+    
+    delta = incremental.extract_delta(tasks_page(order_row(1004)), known_orders)
+    assert ids(delta['added']) == ['1004']
+    assert delta['removed'] == []
+
+
+def test_full_extraction_fallback_rebuilds_tracked_orders(incremental):
+    known_orders = {}
+    incremental.extract_delta(tasks_page(order_row(1001), order_row(1002), order_row(1003)), known_orders)
+    
+    # Una tabla anidada impide el recorte sin parsear: extracción completa
+    delta = incremental.extract_delta(tasks_page(order_row(1001, nested=True), order_row(1002)), known_orders)
+    assert incremental.get_stats()['full_extractions'] == 1
+    assert ids(delta['removed']) == ['1003']
+    
+    delta = incremental.extract_delta(tasks_page(order_row(1001), order_row(1002)), known_orders)
+    assert delta['removed'] == []
+
+
+def test_page_without_orders_table_keeps_tracked_orders(incremental):
+    known_orders = {}
+    incremental.extract_delta(tasks_page(order_row(1001)), known_orders)
+    
+    delta = incremental.extract_delta('<html><body><form id="login"></form></body></html>', known_orders)
+    assert delta == {'added': [], 'changed': [], 'removed': []}
+    assert incremental.get_stats()['tracked_orders'] == 1
@@ -0,0 +1,69 @@
+"""
+Pruebas del registro tipado de órdenes
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from core.monitors.order_record import OrderRecord, OrderStatus, parse_amount
+
+
+def test_fields_are_converted_on_assignment():
+    order = OrderRecord(order_id='1001', total_amount='$ 1,234.50', status='ontheway',
+                        detected_at='2026-10-18T12:30:00')
+    
+    assert order['total_amount'] == Decimal('1234.50')
+    assert order['status'] is OrderStatus.ON_THE_WAY
+    assert order['detected_at'] == datetime(2026, 10, 18, 12, 30)
+
+
+def test_status_from_display_text_and_css_class():
+    assert OrderStatus.from_text('En Preparación') is OrderStatus.IN_PREPARATION
+    assert OrderStatus.from_text('readyforcollection') is OrderStatus.READY_FOR_COLLECTION
+    assert OrderStatus.from_text('') is OrderStatus.UNKNOWN
+    assert str(OrderStatus.AT_LOCATION) == 'En Ubicación'
+
+
+def test_amount_without_number_is_none():
+    assert parse_amount('sin precio') is None
+    assert parse_amount(12.5) == Decimal('12.5')
+
+
+def test_dict_interface_ignores_missing_fields():
+    order = OrderRecord(order_id='1001')
+    
+    assert order.get('customer_name', 'N/A') == 'N/A'
+    assert 'customer_name' not in order and 'order_id' in order
+    assert order.keys() == ['order_id']
+    with pytest.raises(KeyError):
+        order['customer_name']
+    with pytest.raises(KeyError):
+        order['unknown_field'] = 'x'
+
+
+def test_raw_html_container_is_serialized_once_on_read():
+    class Container:
+        calls = 0
+        
+        def __str__(self):
+            Container.calls += 1
+            return '<tr class="orders-list-item"></tr>'
+    
+    order = OrderRecord(order_id='1001', raw_html=Container())
+    assert Container.calls == 0
+    assert order.raw_html == '<tr class="orders-list-item"></tr>'
+    assert order.raw_html == '<tr class="orders-list-item"></tr>'
+    assert Container.calls == 1
+
+
+def test_to_dict_round_trip():
+    order = OrderRecord(order_id='1001', total_amount='99.90', status='processed',
+                        detected_at=datetime(2026, 10, 18, 9, 0))
+    data = order.to_dict()
+    
+    assert data == {'order_id': '1001', 'total_amount': '99.90', 'status': 'Procesado',
+                    'detected_at': '2026-10-18T09:00:00'}
+    restored = OrderRecord.from_dict(dict(data, unknown='x'))
+    assert restored.to_dict() == data
@@ -0,0 +1,35 @@
+"""
+Pruebas del registro de expresiones regulares compartido
+"""
+
+from bs4 import BeautifulSoup
+
+from core.monitors.patterns import FIELD_PATTERNS, PATTERNS, PatternRegistry
+
+
+def test_search_follows_pattern_priority_not_text_position():
+    # '#' aparece antes en el texto, pero 'Task' tiene más prioridad
+    assert PATTERNS.search('order_id', '#999 Task: A-100') == 'A-100'
+    assert PATTERNS.search('order_id', 'pedido: 42') == '42'  # Sin distinguir mayúsculas
+    assert PATTERNS.search('order_id', '') is None
+
+
+def test_findall_and_last_return_values_in_text_order():
+    assert PATTERNS.findall('number', 'fila 3 de 12') == ['3', '12']
+    assert PATTERNS.last('number', 'checkbox 50012') == '50012'
+    assert PATTERNS.last('number', 'sin números') is None
+
+
+def test_amount_keeps_thousands_separator():
+    assert PATTERNS.search('amount', '$ 1,234.50 MXN') == '1,234.50'
+
+
+def test_merged_pattern_works_as_beautifulsoup_filter():
+    soup = BeautifulSoup('<tr class="orders-list-item"></tr><tr class="summary"></tr>', 'html.parser')
+    assert len(soup.find_all('tr', class_=PATTERNS.pattern('order_class'))) == 1
+
+
+def test_every_alternative_is_compiled_once():
+    registry = PatternRegistry(FIELD_PATTERNS)
+    assert len(registry.compiled['order_id']) == len(FIELD_PATTERNS['order_id'])
+    assert registry.pattern('order_id') is registry.pattern('order_id')
@@ -0,0 +1,41 @@
+"""
+Pruebas del planificador adaptativo de sondeos
+"""
+
+from core.monitors.scheduler import AdaptivePollScheduler, parse_hour_profiles
+
+
+def test_activity_tightens_and_idle_backs_off_within_bounds():
+    scheduler = AdaptivePollScheduler(10, min_interval=3, max_interval=40, tighten_factor=0.5, backoff_factor=2)
+    
+    assert scheduler.record_poll(2, hour=10) == 5
+    assert scheduler.record_poll(1, hour=10) == 3  # No baja del mínimo
+    assert [scheduler.record_poll(0, hour=10) for _ in range(5)] == [6, 12, 24, 40, 40]
+    assert scheduler.get_stats()['active_polls'] == 2
+
+
+def test_hour_profiles_override_bounds_and_wrap_midnight():
+    bounds = parse_hour_profiles({"22-1": [30, 120], "12": [3, 15]})
+    assert sorted(bounds) == [0, 1, 12, 22, 23]
+    
+    scheduler = AdaptivePollScheduler(10, min_interval=5, max_interval=60, hour_profiles={"12": [3, 15]})
+    assert scheduler.bounds(12) == (3, 15)
+    assert scheduler.bounds(9) == (5, 60)
+
+
+def test_peak_hours_never_back_off_past_base_interval():
+    time_stats = {hour: 1 for hour in range(24)}
+    time_stats[13] = 50
+    scheduler = AdaptivePollScheduler(10, min_interval=5, max_interval=60, time_stats=time_stats)
+    
+    assert scheduler.bounds(13) == (5, 10)
+    for _ in range(10):
+        scheduler.record_poll(0, hour=13)
+    assert scheduler.interval == 10
+
+
+def test_next_interval_applies_jitter():
+    scheduler = AdaptivePollScheduler(10, jitter=0.2)
+    waits = [scheduler.next_interval() for _ in range(50)]
+    assert all(8 <= wait <= 12 for wait in waits)
+    assert len(set(waits)) > 1
@@ -0,0 +1,79 @@
+"""
+Pruebas de la sesión HTTP persistente: cookies cifradas y comprobación de la sesión restaurada
+"""
+
+import pytest
+import requests
+
+from core.monitors.config import LOGIN_URL
+from core.monitors.http_client import HTTPClient
+from core.monitors.session_store import SessionStore
+
+
+@pytest.fixture(autouse=True)
+def derived_key(monkeypatch):
+    monkeypatch.delenv("SESSION_STORE_KEY", raising=False)  # Clave derivada de la contraseña
+
+
+def session_with_cookie():
+    session = requests.Session()
+    session.cookies.set('sessionid', 'secreto-123', domain='example.com', path='/')
+    return session
+
+
+def test_encrypted_round_trip(tmp_path):
+    store = SessionStore(tmp_path / "session.bin", "agente", "clave")
+    assert store.save(session_with_cookie())
+    assert b'secreto-123' not in (tmp_path / "session.bin").read_bytes()
+    
+    restored = requests.Session()
+    assert SessionStore(tmp_path / "session.bin", "agente", "clave").load_into(restored)
+    assert restored.cookies.get('sessionid', domain='example.com') == 'secreto-123'
+
+
+def test_wrong_key_or_account_is_rejected(tmp_path):
+    SessionStore(tmp_path / "session.bin", "agente", "clave").save(session_with_cookie())
+    
+    restored = requests.Session()
+    assert not SessionStore(tmp_path / "session.bin", "agente", "otra-clave").load_into(restored)
+    assert not SessionStore(tmp_path / "session.bin", "otro-agente", "clave").load_into(restored)
+    assert len(restored.cookies) == 0
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200, url="https://example.com/tasks"):
+        self.content = content
+        self.status_code = status_code
+        self.url = url
+        self.encoding = 'utf-8'
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+    
+    def get(self, url, **kwargs):
+        return self.response
+
+
+@pytest.fixture
+def client(tmp_path):
+    return HTTPClient(username="agente", password="clave", orders_url="https://example.com/tasks",
+                      session_file=tmp_path / "session.bin")
+
+
+def test_probe_accepts_the_orders_page(client):
+    client.session = FakeSession(FakeResponse(b'<table class="responsive-table"></table>'))
+    assert client.probe_session()
+    assert client.last_authenticated_at is not None
+
+
+def test_probe_rejects_login_form_served_with_200(client):
+    client.session = FakeSession(FakeResponse(b'<form><input name="password"></form>', url=LOGIN_URL))
+    assert not client.probe_session()
+    
+    client.session = FakeSession(FakeResponse(b'<html><body>Mantenimiento</body></html>'))
+    assert not client.probe_session()
+    
+    client.session = FakeSession(FakeResponse(b'', status_code=302))
+    assert not client.probe_session()
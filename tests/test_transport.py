@@ -0,0 +1,117 @@
+"""
+Pruebas del circuit breaker y del adaptador HTTP resiliente
+"""
+
+import pytest
+import requests
+from urllib3 import HTTPResponse
+
+from core.monitors import transport
+from core.monitors.transport import (CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitBreaker,
+                                     CircuitOpenError, JitterRetry, ResilientHTTPAdapter, is_server_failure)
+
+
+class FakeClock:
+    """Reloj manual para el enfriamiento del breaker"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(transport.time, 'monotonic', clock)
+    return clock
+
+
+def test_closed_open_half_open_closed(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow_request()
+    
+    clock.now += 60
+    assert breaker.allow_request()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.get_stats()['consecutive_failures'] == 0
+
+
+def test_half_open_allows_a_single_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    clock.now += 60
+    
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # La prueba sigue en vuelo
+    assert not breaker.allow_request()
+    assert breaker.get_stats()['rejected'] == 2
+    
+    breaker.record_failure()  # La prueba falló: vuelve a abrirse
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow_request()
+
+
+def test_trial_without_result_frees_the_slot_after_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    clock.now += 60
+    assert breaker.allow_request()
+    
+    clock.now += 60
+    assert breaker.allow_request()
+
+
+def test_adapter_rejects_without_sending_while_open(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    adapter = ResilientHTTPAdapter(circuit_breaker=breaker)
+    request = requests.Request('GET', 'https://example.com/tasks').prepare()
+    
+    with pytest.raises(CircuitOpenError):
+        adapter.send(request)
+    assert adapter.get_stats()['requests'] == 0
+
+
+def test_server_failures_are_classified():
+    response = requests.Response()
+    response.status_code = 503
+    assert is_server_failure(requests.exceptions.HTTPError(response=response))
+    assert is_server_failure(requests.exceptions.ConnectTimeout())
+    
+    response.status_code = 404
+    assert not is_server_failure(requests.exceptions.HTTPError(response=response))
+
+
+def test_retry_after_is_capped_at_backoff_max(clock):
+    retry = JitterRetry(total=3, backoff_max=10)
+    response = HTTPResponse(status=503, headers={'Retry-After': '3600'})
+    assert retry.get_retry_after(response) == 10
+    
+    response = HTTPResponse(status=503, headers={'Retry-After': '2'})
+    assert retry.get_retry_after(response) == 2
+
+
+def test_retries_stop_at_max_retry_time(clock):
+    retry = JitterRetry(total=10, status_forcelist=[503], backoff_max=10, max_retry_time=30)
+    response = HTTPResponse(status=503, headers={'Retry-After': '20'})
+    
+    retry = retry.increment('GET', '/tasks', response=response)  # Primer fallo: empieza a contar
+    clock.now += 25
+    assert not retry.is_exhausted()
+    assert retry.get_retry_after(response) == 5  # La espera no pasa del plazo
+    
+    clock.now += 5
+    retry = retry.new()
+    assert retry.is_exhausted()
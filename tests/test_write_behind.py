@@ -0,0 +1,154 @@
+"""
+Pruebas de la escritura diferida: contrapresión sin bloqueo, orden del respaldo e instantánea de analytics
+"""
+
+import json
+import threading
+import time
+
+import psycopg2
+
+from core.monitors.write_behind import WriteBehindQueue
+
+
+class FakeDatabase:
+    """save_orders en memoria; available=False simula la BD caída y `invalid` órdenes con datos rechazados"""
+    
+    def __init__(self):
+        self.available = True
+        self.invalid = set()
+        self.saved = []
+        self.reports = []
+        self.last_save_error = None
+    
+    def save_orders(self, orders, table_name, analytics=None, performance_metrics=None, events=None,
+                    analytics_report=None):
+        if not self.available:
+            self.last_save_error = psycopg2.OperationalError("server closed the connection unexpectedly")
+            return False
+        if any(order['order_id'] in self.invalid for order in orders):
+            self.last_save_error = psycopg2.DataError("value too long for type character varying(50)")
+            return False
+        self.last_save_error = None
+        self.saved.extend(order['order_id'] for order in orders)
+        self.reports.append(analytics_report)
+        return True
+
+
+class FakeAnalytics:
+    """Analytics mínimos: el reporte refleja el contador en el momento de pedirlo"""
+    
+    def __init__(self):
+        self.orders_seen = 0
+    
+    def get_analytics_report(self):
+        return {'orders_seen': self.orders_seen}
+
+
+def orders(*ids):
+    return [{'order_id': order_id} for order_id in ids]
+
+
+def drain(writer):
+    """Ejecutar el hilo escritor en el hilo actual hasta vaciar cola y respaldo"""
+    writer._stop_event.set()
+    writer._run()
+
+
+def test_full_queue_spills_overflow_without_blocking(tmp_path):
+    writer = WriteBehindQueue(FakeDatabase(), max_queue_size=2, flush_interval=0.01,
+                              spill_file=tmp_path / "spill.jsonl")
+    
+    start_time = time.perf_counter()
+    writer.submit(orders('a', 'b', 'c', 'd'))
+    writer.submit(orders('e'))  # Con pendientes en el respaldo, lo nuevo va detrás aunque haya sitio
+    assert time.perf_counter() - start_time < 0.1
+    
+    metrics = writer.get_metrics()
+    assert metrics['queue_depth'] == 2
+    assert metrics['spilled_orders'] == 3
+    assert len((tmp_path / "spill.jsonl").read_text().splitlines()) == 3
+
+
+def test_spill_is_replayed_in_submission_order(tmp_path):
+    database = FakeDatabase()
+    writer = WriteBehindQueue(database, batch_size=2, max_queue_size=2, flush_interval=0.01,
+                              spill_file=tmp_path / "spill.jsonl")
+    writer.submit(orders('a', 'b', 'c', 'd'))
+    writer.submit(orders('e'))
+    
+    drain(writer)
+    
+    assert database.saved == ['a', 'b', 'c', 'd', 'e']
+    assert not (tmp_path / "spill.jsonl").exists()
+    
+    writer.submit(orders('f'))  # Respaldo vacío: vuelve a usar la cola
+    assert writer.get_metrics()['queue_depth'] == 1
+
+
+def test_stop_without_database_keeps_queue_ahead_of_spill(tmp_path):
+    database = FakeDatabase()
+    database.available = False
+    spill_file = tmp_path / "spill.jsonl"
+    writer = WriteBehindQueue(database, batch_size=10, max_queue_size=2, flush_interval=0.01,
+                              spill_file=spill_file)
+    writer.submit(orders('a', 'b', 'c'))
+    
+    drain(writer)
+    
+    # La cola (más antigua) queda delante de lo que ya estaba en el respaldo
+    database.available = True
+    restarted = WriteBehindQueue(database, flush_interval=0.01, spill_file=spill_file)
+    drain(restarted)
+    assert database.saved == ['a', 'b', 'c']
+
+
+def test_analytics_snapshot_is_taken_on_submit(tmp_path):
+    database = FakeDatabase()
+    analytics = FakeAnalytics()
+    writer = WriteBehindQueue(database, analytics=analytics, flush_interval=0.01)
+    
+    analytics.orders_seen = 1
+    writer.submit(orders('a'))
+    analytics.orders_seen = 2  # El sondeo sigue modificando analytics antes de que escriba el hilo
+    
+    drain(writer)
+    assert database.reports == [{'orders_seen': 1}]
+
+
+def test_data_errors_are_bisected_into_reject_file(tmp_path):
+    database = FakeDatabase()
+    database.invalid = {'c'}
+    writer = WriteBehindQueue(database, batch_size=10, flush_interval=0.01, spill_file=tmp_path / "spill.jsonl")
+    writer.submit(orders('a', 'b', 'c', 'd', 'e'))
+    
+    drain(writer)
+    
+    # La fila rechazada no bloquea la cola ni se reintenta
+    assert database.saved == ['a', 'b', 'd', 'e']
+    rejected = [json.loads(line) for line in (tmp_path / "spill.rejected.jsonl").read_text().splitlines()]
+    assert [record['data']['order_id'] for record in rejected] == ['c']
+    assert 'value too long' in rejected[0]['error']
+    assert writer.get_metrics()['rejected_orders'] == 1
+    assert not (tmp_path / "spill.jsonl").exists()
+
+
+def test_stop_reports_writer_still_saving(tmp_path):
+    database = FakeDatabase()
+    release = threading.Event()
+    original_save = database.save_orders
+    
+    def slow_save(*args, **kwargs):
+        release.wait(5)  # Una escritura que no termina antes del timeout de stop()
+        return original_save(*args, **kwargs)
+    
+    database.save_orders = slow_save
+    writer = WriteBehindQueue(database, flush_interval=0.01)
+    writer.start()
+    writer.submit(orders('a'))
+    time.sleep(0.05)
+    
+    assert writer.stop(timeout=0.05) is False
+    release.set()
+    assert writer.stop(timeout=5) is True
+    assert database.saved == ['a']